@@ -16,12 +16,16 @@ from src.utils.graph_cache import graph_cache
 class MedicalKnowledgeGraphAI:
     """医疗知识图谱AI助手"""
     
-    def __init__(self, knowledge_graph_data: Optional[Dict[str, Any]] = None):
+    # 症状搜索时判定实体为疾病的关键词（索引路径和备用路径共用）
+    SYMPTOM_DISEASE_KEYWORDS = ('感冒', '发烧', '咳嗽', '头痛', '肺炎', '胃炎', '肝炎', '高血压', '糖尿病')
+    
+    def __init__(self, knowledge_graph_data: Optional[Dict[str, Any]] = None, probe_llm: bool = True):
         """
         初始化医疗AI助手
         
         Args:
             knowledge_graph_data: 知识图谱数据，包含nodes和links
+            probe_llm: 是否立即探测LLM服务（后台预热时为False，稍后调用probe_llm）
         """
         if knowledge_graph_data:
             self.knowledge_graph_data = knowledge_graph_data
@@ -37,7 +41,15 @@ class MedicalKnowledgeGraphAI:
         self._use_cache = True
         
         # 初始化LLM
+        if probe_llm:
+            self.llm = self._init_llm()
+        else:
+            self.llm = {"type": AIConfig.MODEL_TYPE.value, "available": False, "probing": True}
+    
+    def probe_llm(self) -> Dict[str, Any]:
+        """探测LLM服务可用性（可能阻塞数秒，由后台预热线程调用）"""
         self.llm = self._init_llm()
+        return self.llm
     
     def _init_llm(self):
         """初始化语言模型"""
@@ -131,10 +143,13 @@ class MedicalKnowledgeGraphAI:
         
         return index
     
-    def search_entities(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def search_entities(self, query: str, limit: int = 10, semantic: bool = True) -> List[Dict[str, Any]]:
         """
         快速搜索实体 - 使用优化的索引算法
         时间复杂度从 O(E×Q×W) 降低到 O(log N)
+        
+        Args:
+            semantic: 没有精确、前缀或词语匹配时，合并语义向量检索的结果（措辞与实体标签不同的问句）
         """
         if not query.strip():
             return []
@@ -144,6 +159,8 @@ class MedicalKnowledgeGraphAI:
         # 优先使用缓存的快速搜索
         if self._use_cache and graph_cache.get_cached_graph():
             results = graph_cache.search_entities_fast(query, limit)
+            if semantic and not any(result['match_score'] >= 60 for result in results):
+                results = self._merge_semantic_results(results, graph_cache.search_semantic(query, limit), limit)
             print(f"[调试] 缓存搜索结果数量: {len(results)}") # 调试信息
             return results
         
@@ -152,6 +169,14 @@ class MedicalKnowledgeGraphAI:
         print(f"[调试] 备用搜索结果数量: {len(results)}") # 调试信息
         return results
     
+    def _merge_semantic_results(self, results: List[Dict[str, Any]], semantic_results: List[Dict[str, Any]],
+                                limit: int) -> List[Dict[str, Any]]:
+        """合并字面匹配和语义检索结果：同一实体保留字面匹配，按匹配分数排序"""
+        seen_ids = {result['id'] for result in results}
+        merged = results + [result for result in semantic_results if result['id'] not in seen_ids]
+        merged.sort(key=lambda x: x['match_score'], reverse=True)
+        return merged[:limit]
+    
     def _search_entities_fallback(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """备用搜索算法 - 当缓存不可用时使用"""
         query_lower = query.lower().strip()
@@ -211,53 +236,34 @@ class MedicalKnowledgeGraphAI:
     
     def get_entity_context(self, entity_id: str, depth: int = 1) -> Dict[str, Any]:
         """获取实体的上下文信息"""
-        # 优先使用缓存的实体信息
-        if self._use_cache and graph_cache.get_cached_graph():
-            cached_graph = graph_cache.get_cached_graph()
-            if not cached_graph:
-                return {}
-                
-            entity = None
-            
-            # 查找实体
-            for node in cached_graph.get('nodes', []):
-                if node.get('id') == entity_id:
-                    entity = node
-                    break
-            
-            if not entity:
+        # 优先使用缓存的紧凑图谱，通过邻接数组直接定位关系
+        graph = graph_cache.get_graph_store() if self._use_cache else None
+        if graph is not None and graph_cache.get_cached_graph():
+            node = graph.node_index.get(entity_id)
+            if node is None:
                 return {}
             
             context = {
-                "entity": entity,
+                "entity": graph.node_dict(node),
                 "relationships": [],
                 "neighbors": []
             }
             
-            # 获取关系
-            for edge in cached_graph.get('edges', []):
-                if edge['source'] == entity_id:
-                    # 查找目标节点
-                    for node in cached_graph.get('nodes', []):
-                        if node.get('id') == edge['target']:
-                            context["relationships"].append({
-                                "relation": edge['relation'],
-                                "direction": "outgoing",
-                                "neighbor": node
-                            })
-                            context["neighbors"].append(node)
-                            break
-                elif edge['target'] == entity_id:
-                    # 查找源节点
-                    for node in cached_graph.get('nodes', []):
-                        if node.get('id') == edge['source']:
-                            context["relationships"].append({
-                                "relation": edge['relation'],
-                                "direction": "incoming",
-                                "neighbor": node
-                            })
-                            context["neighbors"].append(node)
-                            break
+            # 获取关系（出边和入边按原始边顺序合并）
+            for edge in graph.incident_edge_ids(node):
+                if graph.edge_src[edge] == node:
+                    direction = "outgoing"
+                    neighbor = graph.edge_dst[edge]
+                else:
+                    direction = "incoming"
+                    neighbor = graph.edge_src[edge]
+                neighbor_node = graph.node_dict(neighbor)
+                context["relationships"].append({
+                    "relation": graph.relations[graph.edge_rel[edge]],
+                    "direction": direction,
+                    "neighbor": neighbor_node
+                })
+                context["neighbors"].append(neighbor_node)
             
             return context
         
@@ -611,11 +617,11 @@ class MedicalKnowledgeGraphAI:
         # 不再使用entity_index，改用缓存系统
         print(f"[信息] 知识图谱已更新，包含 {len(graph_data.get('nodes', []))} 个节点") 
 
-    def update_knowledge_graph_from_file(self, csv_file_path: str, force_reload: bool = False):
+    def update_knowledge_graph_from_file(self, csv_file_path: str, force_reload: bool = False, progress=None):
         """从CSV文件更新知识图谱，使用缓存优化"""
         try:
             # 使用优化的缓存加载
-            graph_data = graph_cache.load_graph(csv_file_path, force_reload)
+            graph_data = graph_cache.load_graph(csv_file_path, force_reload, progress=progress)
             self.knowledge_graph_data = graph_data
             print(f"[信息] 知识图谱已更新，包含 {len(graph_data.get('nodes', []))} 个节点")
         except Exception as e:
@@ -867,57 +873,12 @@ class MedicalKnowledgeGraphAI:
         results = []
         seen_ids = set()
         
-        # 优先使用缓存
-        if self._use_cache and graph_cache.get_cached_graph():
-            cached_graph = graph_cache.get_cached_graph()
-            
-            # 通过症状关键词搜索相关疾病
-            for symptom in symptoms:
-                # 搜索包含症状关键词的实体
-                for node in cached_graph.get('nodes', []):
-                    node_label = node.get('label', '').lower()
-                    
-                    # 检查是否是疾病实体且包含症状信息
-                    if (symptom in node_label and 
-                        any(disease_keyword in node_label for disease_keyword in ['感冒', '发烧', '咳嗽', '头痛', '肺炎', '胃炎', '肝炎', '高血压', '糖尿病'])):
-                        
-                        if node.get('id') not in seen_ids:
-                            result = {
-                                **node,
-                                "match_type": "symptom_diagnosis",
-                                "match_score": 85,
-                                "matched_symptoms": [symptom],
-                                "search_method": "symptom_disease_match"
-                            }
-                            results.append(result)
-                            seen_ids.add(node.get('id'))
-                            if len(results) >= limit:
-                                break
-                
-                if len(results) >= limit:
-                    break
-            
-            # 如果症状匹配不够，搜索症状相关的实体
-            if len(results) < limit:
-                for symptom in symptoms:
-                    for node in cached_graph.get('nodes', []):
-                        node_label = node.get('label', '').lower()
-                        
-                        if symptom in node_label and node.get('id') not in seen_ids:
-                            result = {
-                                **node,
-                                "match_type": "symptom_entity",
-                                "match_score": 70,
-                                "matched_symptoms": [symptom],
-                                "search_method": "symptom_entity_match"
-                            }
-                            results.append(result)
-                            seen_ids.add(node.get('id'))
-                            if len(results) >= limit:
-                                break
-                    
-                    if len(results) >= limit:
-                        break
+        # 优先使用缓存（结果按图谱版本缓存，未命中时只扫描驻留的标签）
+        generation = graph_cache.get_generation() if self._use_cache else None
+        if generation is not None:
+            results = graph_cache.cached_search(
+                generation, 'symptoms', (tuple(symptoms), limit),
+                lambda: self._search_symptoms_indexed(generation, symptoms, limit))
         else:
             # 备用搜索
             for symptom in symptoms:
@@ -926,7 +887,7 @@ class MedicalKnowledgeGraphAI:
                     
                     if symptom in node_label and node.get('id') not in seen_ids:
                         # 判断是否是疾病实体
-                        is_disease = any(disease_keyword in node_label for disease_keyword in ['感冒', '发烧', '咳嗽', '头痛', '肺炎', '胃炎', '肝炎', '高血压', '糖尿病'])
+                        is_disease = any(disease_keyword in node_label for disease_keyword in self.SYMPTOM_DISEASE_KEYWORDS)
                         
                         result = {
                             **node,
@@ -950,6 +911,62 @@ class MedicalKnowledgeGraphAI:
         results.sort(key=lambda x: x.get('match_score', 0), reverse=True)
         return results[:limit]
     
+    def _search_symptoms_indexed(self, generation, symptoms: List[str], limit: int) -> List[Dict[str, Any]]:
+        """在紧凑图谱的标签上按症状搜索（扫描搜索索引中预先转换的小写标签，命中时才生成节点字典）"""
+        results = []
+        seen_ids = set()
+        graph = generation.store
+        labels_lower = generation.search_index['labels_lower']
+        
+        # 通过症状关键词搜索相关疾病
+        for symptom in symptoms:
+            # 搜索包含症状关键词的实体
+            for node_index, node_label in enumerate(labels_lower):
+                # 检查是否是疾病实体且包含症状信息
+                if (symptom in node_label and 
+                    any(disease_keyword in node_label for disease_keyword in self.SYMPTOM_DISEASE_KEYWORDS)):
+                    
+                    node = graph.node_dict(node_index)
+                    if node.get('id') not in seen_ids:
+                        result = {
+                            **node,
+                            "match_type": "symptom_diagnosis",
+                            "match_score": 85,
+                            "matched_symptoms": [symptom],
+                            "search_method": "symptom_disease_match"
+                        }
+                        results.append(result)
+                        seen_ids.add(node.get('id'))
+                        if len(results) >= limit:
+                            break
+            
+            if len(results) >= limit:
+                break
+        
+        # 如果症状匹配不够，搜索症状相关的实体
+        if len(results) < limit:
+            for symptom in symptoms:
+                for node_index, node_label in enumerate(labels_lower):
+                    if symptom in node_label and graph.node_ids[node_index] not in seen_ids:
+                        node = graph.node_dict(node_index)
+                        result = {
+                            **node,
+                            "match_type": "symptom_entity",
+                            "match_score": 70,
+                            "matched_symptoms": [symptom],
+                            "search_method": "symptom_entity_match"
+                        }
+                        results.append(result)
+                        seen_ids.add(node.get('id'))
+                        if len(results) >= limit:
+                            break
+                
+                if len(results) >= limit:
+                    break
+        
+        results.sort(key=lambda x: x.get('match_score', 0), reverse=True)
+        return results[:limit]
+    
     def _search_concurrent(self, query_intent: Dict[str, Any], limit: int = 8) -> List[Dict[str, Any]]:
         """并发搜索相关实体"""
         # 如果是症状诊断查询，使用症状搜索
@@ -0,0 +1,135 @@
+"""
+知识图谱加载配置
+"""
+import os
+
+
+class GraphConfig:
+    # CSV解析后端: auto / fast / csv / pyarrow / parallel
+    # auto: 大文件且多核时使用parallel，否则使用fast
+    # pyarrow会跳过列数与首行不一致的行，导入结果与其他后端不同，需显式指定
+    INGEST_BACKEND = os.environ.get('KG_INGEST_BACKEND', 'auto')
+
+    # 并行解析的进程数（None 表示使用CPU核数）
+    INGEST_WORKERS = None
+
+    # 文件超过该大小时auto才会选择并行解析
+    PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+    # 解析进度汇报间隔（行）
+    PROGRESS_INTERVAL = 50000
+
+    # 导入时去除重复的(源, 关系, 目标)三元组
+    DEDUPE_EDGES = os.environ.get('KG_DEDUPE_EDGES', '1') != '0'
+
+    # 导入报告中最多列出的重复三元组数量
+    DUPLICATE_REPORT_LIMIT = 100
+
+    # /graph 分页结果的LRU缓存条目数（按 版本, 页码, 每页大小 缓存）
+    PAGE_CACHE_SIZE = 64
+
+    # 实体/关系/症状搜索结果的LRU缓存条目数和有效期（秒），键包含图谱版本
+    SEARCH_CACHE_SIZE = 2048
+    SEARCH_CACHE_TTL = 600
+
+    # /node/khop 的上限：最大深度、最多节点数、每个节点每跳最多展开的邻居数
+    KHOP_MAX_DEPTH = 4
+    KHOP_MAX_NODES = 5000
+    KHOP_MAX_FANOUT = 500
+
+    # /path 的上限：最大路径长度、最多返回路径数、双向BFS最多访问的节点数
+    PATH_MAX_DEPTH = 8
+    PATH_MAX_PATHS = 100
+    PATH_MAX_VISITED = 200000
+
+    # /node/neighbors/batch 单次最多查询的节点数
+    BATCH_MAX_IDS = 200
+
+    # 图谱接口响应：超过该字节数才压缩（gzip / brotli），以及压缩级别
+    COMPRESS_MIN_BYTES = 4096
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+
+    # /graph/export 每次写出的块大小（字节）
+    EXPORT_CHUNK_BYTES = 64 * 1024
+
+    # 后台构建（BM25索引、语义向量、布局）失败后同一版本的重试退避（秒）：首次等待时间，每次失败翻倍，不超过上限
+    BACKGROUND_RETRY_DELAY = 30
+    BACKGROUND_RETRY_MAX_DELAY = 1800
+
+    # 服务端力导向布局：迭代次数、精确计算两两斥力的最大节点数、近似斥力的网格边长上限、向心力系数
+    LAYOUT_ITERATIONS = 50
+    LAYOUT_EXACT_MAX_NODES = 2000
+    LAYOUT_MAX_GRID = 24
+    LAYOUT_GRAVITY = 0.05
+
+    # 布局空间索引每个网格平均节点数
+    LAYOUT_GRID_NODES_PER_CELL = 16
+
+    # /graph/viewport：zoom=0 时全图显示的节点数（每级zoom乘4），单次最多返回的节点数
+    VIEWPORT_BASE_NODES = 200
+    VIEWPORT_MAX_NODES = 2000
+
+    # 节点重要性排序：PageRank阻尼系数、收敛阈值（L1）、最大迭代次数；介数中心性抽样源点数
+    PAGERANK_DAMPING = 0.85
+    PAGERANK_TOL = 1e-6
+    PAGERANK_MAX_ITER = 100
+    BETWEENNESS_SAMPLES = 64
+
+    # 新版本发布后在后台预先计算的排序方式
+    PRECOMPUTE_RANK_METRICS = ('pagerank', 'betweenness')
+
+    # 社区发现（标签传播）：最大迭代轮数、每轮分批数、变化节点比例低于该值时停止
+    CLUSTER_MAX_ITER = 20
+    CLUSTER_BATCHES = 4
+    CLUSTER_MIN_CHANGE = 0.001
+    # 模块度分辨率：越大簇越小
+    CLUSTER_RESOLUTION = 1.0
+
+    # 多层聚类：最多层数、概览层簇数上限、上一层簇数减少不足该比例时停止
+    CLUSTER_MAX_LEVELS = 5
+    CLUSTER_TOP_MAX = 300
+    CLUSTER_MIN_REDUCTION = 0.1
+
+    # /graph/clusters 单次最多返回的超节点数、下钻时最多返回的实体数
+    CLUSTER_MAX_RETURN = 500
+    CLUSTER_MAX_MEMBERS = 2000
+
+    # 输入联想（/suggest）：每个重前缀预存的实体数、区间内直接扫描的最大标签数、单次最多返回数
+    SUGGEST_TOP_K = 20
+    SUGGEST_SCAN_MAX = 256
+    SUGGEST_MAX_LIMIT = 20
+    # 实体搜索前缀匹配的分数为 80 + 前缀长度，前缀长度加分的上限（与原前缀索引的最长前缀一致）
+    PREFIX_MAX_BONUS = 6
+
+    # 容错搜索（删除变体索引）：最大编辑距离、查询不超过该长度时只允许1处错误、
+    # 建索引时每个标签取的前缀长度、单次最多校验的候选数
+    FUZZY_MAX_DISTANCE = 2
+    FUZZY_SHORT_QUERY = 4
+    FUZZY_PREFIX_LENGTH = 6
+    FUZZY_MAX_CANDIDATES = 2000
+
+    # BM25全文检索：k1、b、实体自身标签相对邻居标签和关系类型的权重、长问句最多使用的词项数
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    BM25_LABEL_WEIGHT = 3.0
+    BM25_MAX_QUERY_TERMS = 32
+    # BM25阶段的门槛：查询至少包含的不同词项数、分数占查询满分的最低比例
+    BM25_MIN_QUERY_TERMS = 2
+    BM25_MIN_SCORE_RATIO = 0.3
+    # BM25索引最多的段数：每次追加导入增加一段，达到后下一次在后台全量重建
+    BM25_MAX_SEGMENTS = 8
+
+    # 语义向量检索：向量维数、实体自身标签的权重、参与降维的最多词项数、SVD幂迭代次数；
+    # 节点数达到 VECTOR_IVF_MIN_NODES 时使用IVF（簇数约为 √n × VECTOR_IVF_LIST_FACTOR），
+    # k-means迭代次数与每簇抽样数、查询检查的簇数、语义结果的最低相似度
+    VECTOR_DIM = 64
+    VECTOR_LABEL_WEIGHT = 3.0
+    VECTOR_MAX_TERMS = 65536
+    VECTOR_SVD_POWER_ITER = 2
+    VECTOR_IVF_MIN_NODES = 4096
+    VECTOR_IVF_LIST_FACTOR = 1.0
+    VECTOR_KMEANS_ITER = 10
+    VECTOR_KMEANS_SAMPLE_PER_LIST = 256
+    VECTOR_NPROBE = 48
+    VECTOR_MIN_SIMILARITY = 0.3
@@ -1,14 +1,23 @@
 import os
 import sys
+import time
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+# 记录模块导入耗时，用于跟踪启动性能（详细分析见 profile_startup.py）
+_import_start = time.perf_counter()
+
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.knowledge_graph import knowledge_graph_bp
-from src.routes.ai_assistant import ai_bp
+from src.routes.ai_assistant import ai_bp, warm_up_knowledge_graph, warm_up_llm
+from src.routes.health import health_bp
+from src.utils.warmup import warmup
+
+warmup.record_startup_phase('import_modules', time.perf_counter() - _import_start)
+_app_start = time.perf_counter()
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -19,6 +28,7 @@ CORS(app)
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(knowledge_graph_bp, url_prefix='/api')
 app.register_blueprint(ai_bp, url_prefix='/api')
+app.register_blueprint(health_bp, url_prefix='/api')
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -27,6 +37,13 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+warmup.record_startup_phase('create_app', time.perf_counter() - _app_start)
+
+# 后台预热：加载知识图谱和探测LLM并行执行，完成前相关接口返回503
+warmup.add_task('graph', warm_up_knowledge_graph, '加载知识图谱')
+warmup.add_task('llm', warm_up_llm, '检测语言模型服务')
+warmup.start()
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
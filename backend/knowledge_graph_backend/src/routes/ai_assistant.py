@@ -7,15 +7,35 @@ import json
 import os
 from src.ai.medical_ai import MedicalKnowledgeGraphAI
 from src.utils.graph_cache import graph_cache
+from src.utils.warmup import warmup
 
 ai_bp = Blueprint('ai_assistant', __name__)
 CORS(ai_bp)
 
-# 全局AI实例
-ai_assistant = None
+# 知识图谱CSV路径
+CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'Disease.csv'
+)
+
+# 全局AI实例（图谱加载和LLM探测由后台预热完成，见 warm_up_knowledge_graph / warm_up_llm）
+ai_assistant = MedicalKnowledgeGraphAI(probe_llm=False)
+
+# 预热完成前（状态接口除外）快速返回503
+_require_warmup = warmup.require_ready('graph', 'llm')
+
+@ai_bp.before_request
+def check_warmup():
+    """预热检查"""
+    if request.endpoint == 'ai_assistant.get_ai_status':
+        return None
+    return _require_warmup()
 
 def init_ai_assistant():
-    """初始化AI助手 - 使用优化的缓存系统"""
+    """
+    初始化AI助手 - 使用优化的缓存系统（新实例完整初始化后再替换，期间请求仍由旧实例处理）
+    只重新加载知识图谱；LLM可用性沿用后台预热的探测结果，不在请求线程中阻塞探测
+    """
     global ai_assistant
     
     # 获取知识图谱数据
@@ -27,23 +47,37 @@ def init_ai_assistant():
     try:
         if os.path.exists(csv_path):
             # 使用优化的缓存加载
-            ai_assistant = MedicalKnowledgeGraphAI()
-            ai_assistant.update_knowledge_graph_from_file(csv_path)
+            assistant = MedicalKnowledgeGraphAI(probe_llm=False)
+            assistant.update_knowledge_graph_from_file(csv_path)
             print(f"[信息] AI助手初始化成功（使用缓存优化）")
         else:
             print(f"[警告] CSV文件不存在: {csv_path}")
-            ai_assistant = MedicalKnowledgeGraphAI()
+            assistant = MedicalKnowledgeGraphAI(probe_llm=False)
     except Exception as e:
         print(f"[错误] 初始化AI助手失败: {str(e)}")
-        ai_assistant = MedicalKnowledgeGraphAI()
+        assistant = MedicalKnowledgeGraphAI(probe_llm=False)
+    assistant.llm = ai_assistant.llm
+    ai_assistant = assistant
+
+def warm_up_knowledge_graph(progress=None):
+    """后台预热：加载知识图谱到共享缓存"""
+    if os.path.exists(CSV_PATH):
+        ai_assistant.update_knowledge_graph_from_file(CSV_PATH, progress=progress)
+        print(f"[信息] AI助手知识图谱加载完成（后台预热）")
+    else:
+        print(f"[警告] CSV文件不存在: {CSV_PATH}")
 
-# 初始化AI助手
-init_ai_assistant()
+def warm_up_llm(progress=None):
+    """后台预热：探测LLM服务"""
+    llm = ai_assistant.probe_llm()
+    # 探测期间AI助手可能已被重新初始化（新实例沿用的是探测前的状态），结果同步给当前实例
+    ai_assistant.llm = llm
 
 @ai_bp.route('/ai/cache/clear', methods=['POST'])
 def clear_cache():
     """清除知识图谱缓存"""
     try:
+        # 标记缓存失效并在旁路重建，完成前旧数据继续提供服务
         graph_cache.clear_cache()
         # 重新初始化AI助手
         init_ai_assistant()
@@ -121,6 +155,8 @@ def search_entities():
     try:
         query = request.args.get('q', '').strip()
         limit = int(request.args.get('limit', 10))
+        # semantic=0 时只使用字面匹配
+        semantic = request.args.get('semantic', '1') != '0'
         
         if not query:
             return jsonify({'error': '搜索查询不能为空'}), 400
@@ -128,7 +164,7 @@ def search_entities():
         if ai_assistant is None:
             return jsonify({'error': 'AI助手未初始化'}), 500
         
-        results = ai_assistant.search_entities(query, limit)
+        results = ai_assistant.search_entities(query, limit, semantic=semantic)
         
         return jsonify({
             'success': True,
@@ -235,6 +271,14 @@ def clear_chat_history():
 def get_ai_status():
     """获取AI助手状态"""
     try:
+        if not warmup.is_ready('graph', 'llm'):
+            return jsonify({
+                'success': False,
+                'status': 'warming_up',
+                'message': 'AI助手正在预热',
+                'data': {'warmup': warmup.status()}
+            })
+        
         if ai_assistant is None:
             return jsonify({
                 'success': False,
@@ -269,7 +313,8 @@ def get_ai_status():
                 'graph_stats': graph_stats,
                 'llm_status': llm_status,
                 'chat_history_count': len(ai_assistant.chat_history),
-                'current_sources_count': len(ai_assistant.current_sources)
+                'current_sources_count': len(ai_assistant.current_sources),
+                'search_cache': graph_cache.get_search_cache_stats()
             }
         })
         
@@ -0,0 +1,46 @@
+"""
+服务健康检查路由
+- /api/live:  进程存活探针，始终快速返回
+- /api/ready: 就绪探针，后台预热完成前返回503及加载进度
+"""
+from flask import Blueprint, jsonify
+from flask_cors import CORS
+
+from src.utils.graph_cache import graph_cache
+from src.utils.warmup import warmup
+
+health_bp = Blueprint('health', __name__)
+CORS(health_bp)
+
+@health_bp.route('/live', methods=['GET'])
+def live():
+    """存活探针"""
+    status = warmup.status()
+    return jsonify({
+        'status': 'alive',
+        'pid': status['pid'],
+        'uptime': status['uptime'],
+        'startup_profile': status['startup_profile']
+    })
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """就绪探针（含预热进度）"""
+    status = warmup.status()
+    status['graph'] = {
+        'version': graph_cache.get_version(),
+        # 重复三元组明细见 /api/graph/ingest/report
+        'ingest': {key: value for key, value in (graph_cache.get_ingest_stats() or {}).items()
+                   if key != 'duplicates'} or None,
+        # 搜索索引在图谱发布后于后台构建，未完成时搜索请求会等待
+        'search_index_ready': graph_cache.is_search_index_ready(),
+        'search_cache': graph_cache.get_search_cache_stats()
+    }
+    
+    if status['ready']:
+        return jsonify(status)
+    
+    response = jsonify(status)
+    response.status_code = 503
+    response.headers['Retry-After'] = str(warmup.RETRY_AFTER_SECONDS)
+    return response
@@ -1,129 +1,41 @@
-import csv
 import os
-from flask import Blueprint, jsonify, request
+import json
+from flask import Blueprint, Response, jsonify, request
 from flask_cors import CORS
-from collections import defaultdict
 import math
-import time
-import pickle
+
+from src.config.graph_config import GraphConfig
+from src.utils.graph_cache import graph_cache
+from src.utils.bm25_index import bm25_manager
+from src.utils.graph_community import clustering_available, clustering_error, get_hierarchy, schedule_clustering
+from src.utils.graph_export import EXPORT_FORMATS, RECORD_TYPES, export_csv, export_ndjson
+from src.utils.graph_layout import layout_manager
+from src.utils.graph_rank import available_rank_metrics, schedule_rankings
+from src.utils.graph_query import BoundedBFS, shortest_paths
+from src.utils.http_cache import conditional_get
+from src.utils.lru_cache import LRUCache
+from src.utils.response_encoding import encode_response, encode_stream
+from src.utils.vector_index import vector_manager
+from src.utils.warmup import warmup
 
 knowledge_graph_bp = Blueprint('knowledge_graph', __name__)
 CORS(knowledge_graph_bp)
 
+# 知识图谱预热完成前快速返回503
+knowledge_graph_bp.before_request(warmup.require_ready('graph'))
+
+# 分页结果缓存，键包含图谱版本，新版本发布后旧条目自然淘汰
+_page_cache = LRUCache(GraphConfig.PAGE_CACHE_SIZE)
+
 # 默认CSV文件路径
 DEFAULT_CSV_PATH = os.path.join(
     os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
     'Disease.csv'
 )
 
-# 全局缓存
-_graph_cache = None
-_cache_timestamp = None
-_csv_file_path = DEFAULT_CSV_PATH
-
-def _get_file_mtime(file_path):
-    """获取文件修改时间"""
-    try:
-        return os.path.getmtime(file_path)
-    except OSError:
-        return 0
-
-def _is_cache_valid():
-    """检查缓存是否有效"""
-    global _cache_timestamp
-    if _graph_cache is None or _cache_timestamp is None:
-        return False
-    
-    current_mtime = _get_file_mtime(_csv_file_path)
-    return current_mtime <= _cache_timestamp
-
 def parse_csv_to_full_graph_optimized(csv_file_path):
-    """优化的CSV解析器 - 使用缓存和单次读取"""
-    global _graph_cache, _cache_timestamp, _csv_file_path
-    
-    # 更新文件路径
-    _csv_file_path = csv_file_path
-    
-    # 检查缓存
-    if _is_cache_valid():
-        print(f"[缓存] 使用缓存的知识图谱数据")
-        return _graph_cache
-    
-    print(f"[解析] 开始解析CSV文件: {csv_file_path}")
-    start_time = time.time()
-    
-    nodes = {}
-    edges = []
-    node_connections = defaultdict(int)
-    
-    # 单次读取，同时统计连接数和构建图
-    try:
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            row_count = 0
-            
-            for row in reader:
-                if len(row) >= 3:
-                    source = row[0].strip()
-                    relation = row[1].strip()
-                    target = row[2].strip()
-                    
-                    # 统计连接数
-                    node_connections[source] += 1
-                    node_connections[target] += 1
-                    
-                    # 临时存储边信息
-                    edges.append({
-                        'source': source,
-                        'target': target,
-                        'relation': relation,
-                        'label': relation
-                    })
-                    
-                    row_count += 1
-                    
-                    # 批量进度显示
-                    if row_count % 10000 == 0:
-                        print(f"[解析] 已处理 {row_count} 行")
-        
-        # 构建节点（只需一次循环）
-        for edge in edges:
-            source, target = edge['source'], edge['target']
-            
-            if source not in nodes:
-                nodes[source] = {
-                    'id': source,
-                    'label': source,
-                    'type': 'entity',
-                    'connections': node_connections[source]
-                }
-            
-            if target not in nodes:
-                nodes[target] = {
-                    'id': target,
-                    'label': target,
-                    'type': 'entity',
-                    'connections': node_connections[target]
-                }
-        
-        result = {
-            'nodes': list(nodes.values()),
-            'edges': edges
-        }
-        
-        # 更新缓存
-        _graph_cache = result
-        _cache_timestamp = time.time()
-        
-        end_time = time.time()
-        print(f"[解析] 完成! 耗时 {end_time - start_time:.2f}s, "
-              f"节点: {len(result['nodes'])}, 边: {len(result['edges'])}")
-        
-        return result
-        
-    except Exception as e:
-        print(f"[错误] CSV解析失败: {str(e)}")
-        return {'nodes': [], 'edges': []}
+    """获取完整图谱 - 与AI助手共用graph_cache中的同一份图谱和索引"""
+    return graph_cache.load_graph(csv_file_path)
 
 def parse_csv_to_full_graph(csv_file_path):
     """保持向后兼容的接口"""
@@ -131,62 +43,126 @@ def parse_csv_to_full_graph(csv_file_path):
 
 def invalidate_cache():
     """手动清除缓存"""
-    global _graph_cache, _cache_timestamp
-    _graph_cache = None
-    _cache_timestamp = None
-    print("[缓存] 已清除知识图谱缓存")
-
-def get_paginated_graph(full_graph, page=1, page_size=50):
-    """获取分页的图谱数据"""
-    # 按连接数排序节点
-    sorted_nodes = sorted(full_graph['nodes'], key=lambda x: x['connections'], reverse=True)
+    graph_cache.clear_cache()
+
+def current_generation():
+    """确保图谱为最新（文件变化时触发重新加载）后返回当前一代数据"""
+    if os.path.exists(DEFAULT_CSV_PATH):
+        parse_csv_to_full_graph(DEFAULT_CSV_PATH)
+    return graph_cache.get_generation()
+
+# 读接口的条件请求：图谱版本和请求参数不变时返回304
+versioned = conditional_get(current_generation)
+
+# 每个新发布的图谱版本在后台计算一次布局、重要性排序、聚类、BM25索引和语义向量
+graph_cache.add_publish_listener(layout_manager.schedule)
+graph_cache.add_publish_listener(schedule_rankings)
+graph_cache.add_publish_listener(schedule_clustering)
+graph_cache.add_publish_listener(bm25_manager.schedule)
+graph_cache.add_publish_listener(vector_manager.schedule)
+
+def parse_rank_by():
+    """解析排序方式参数 rank_by（默认按连接数 degree）"""
+    rank_by = request.args.get('rank_by', 'degree')
+    metrics = available_rank_metrics()
+    if rank_by not in metrics:
+        raise ValueError(f"不支持的排序方式: {rank_by}，可选 {' / '.join(metrics)}")
+    return rank_by
+
+def attach_coordinates(graph, layout, nodes):
+    """为节点字典附加布局坐标（返回新字典，不修改缓存中的原数据）"""
+    node_index, x, y = graph.node_index, layout.x, layout.y
+    result = []
+    for node in nodes:
+        i = node_index[node['id']]
+        result.append({**node, 'x': round(float(x[i]), 3), 'y': round(float(y[i]), 3)})
+    return result
+
+def get_paginated_graph(full_graph, page=1, page_size=50, rank_by='degree'):
+    """
+    获取分页的图谱数据
+    排序（连接数 / PageRank / 介数中心性）每个版本只计算一次；页内边通过页内节点的邻接数组获取；
+    最近访问的 (版本, 页码, 每页大小, 排序方式) 结果缓存在LRU中（调用方不得修改返回值）
+    """
+    cache_key = (getattr(full_graph, 'version', None), page, page_size, rank_by)
+    cached = _page_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    graph = full_graph.store
+    # 节点排序由紧凑存储预先计算
+    rank_order, _ = graph.ranking(rank_by)
     
     # 计算分页
-    total_nodes = len(sorted_nodes)
+    total_nodes = graph.node_count
     total_pages = math.ceil(total_nodes / page_size)
     start_idx = (page - 1) * page_size
     end_idx = start_idx + page_size
     
     # 获取当前页的节点
-    current_page_nodes = sorted_nodes[start_idx:end_idx]
-    current_node_ids = {node['id'] for node in current_page_nodes}
+    page_node_indexes = rank_order[start_idx:end_idx]
+    current_page_nodes = [graph.node_dict(node) for node in page_node_indexes]
+    if rank_by != 'degree':
+        scores = graph.centrality(rank_by)
+        for node, node_dict in zip(page_node_indexes, current_page_nodes):
+            node_dict['score'] = float(f'{scores[node]:.6g}')
     
-    # 获取这些节点之间的边
-    current_page_edges = [
-        edge for edge in full_graph['edges']
-        if edge['source'] in current_node_ids and edge['target'] in current_node_ids
-    ]
+    # 获取这些节点之间的边（只遍历页内节点的出边）
+    current_page_edges = [graph.edge_dict(edge) for edge in graph.induced_edge_ids(page_node_indexes)]
     
-    return {
+    result = {
         'nodes': current_page_nodes,
         'edges': current_page_edges,
         'pagination': {
             'current_page': page,
             'total_pages': total_pages,
             'page_size': page_size,
-            'total_nodes': total_nodes
+            'total_nodes': total_nodes,
+            'rank_by': rank_by
         }
     }
+    _page_cache.put(cache_key, result)
+    return result
 
 @knowledge_graph_bp.route('/graph', methods=['GET'])
+@versioned
 def get_graph():
     """获取知识图谱数据（支持分页）"""
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 50))
+        try:
+            rank_by = parse_rank_by()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not os.path.exists(DEFAULT_CSV_PATH):
             return jsonify({'error': 'CSV文件不存在'}), 404
         
         full_graph = parse_csv_to_full_graph(DEFAULT_CSV_PATH)
-        paginated_data = get_paginated_graph(full_graph, page, page_size)
-        
-        return jsonify(paginated_data)
+        paginated_data = get_paginated_graph(full_graph, page, page_size, rank_by)
+        
+        # layout=1 时附加服务端预计算的坐标
+        if request.args.get('layout') == '1':
+            generation = graph_cache.get_generation()
+            layout = layout_manager.get(generation) if generation is not None and generation.graph is full_graph else None
+            if layout is not None:
+                paginated_data = {**paginated_data,
+                                  'nodes': attach_coordinates(full_graph.store, layout, paginated_data['nodes']),
+                                  'layout': 'ready'}
+                return encode_response(paginated_data)
+            # 布局完成后同一请求的响应会变化，不允许缓存
+            response = encode_response({**paginated_data, 'layout': 'pending'})
+            response.cache_control.no_store = True
+            return response
+        
+        return encode_response(paginated_data)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @knowledge_graph_bp.route('/graph/info', methods=['GET'])
+@versioned
 def get_graph_info():
     """获取图谱基本信息"""
     try:
@@ -198,22 +174,299 @@ def get_graph_info():
         if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
             return jsonify({'error': '无法加载知识图谱数据'}), 500
         
-        nodes = full_graph['nodes']
-        edges = full_graph['edges']
+        graph = full_graph.store
+        degree = graph.degree
+        
+        return jsonify({
+            'total_nodes': graph.node_count,
+            'total_edges': graph.edge_count,
+            'max_connections': max(degree) if len(degree) else 0,
+            'min_connections': min(degree) if len(degree) else 0
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@knowledge_graph_bp.route('/graph/ingest/report', methods=['GET'])
+@versioned
+def get_ingest_report():
+    """获取导入报告：关系类型字典（每类边数）和被丢弃的重复三元组"""
+    try:
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+            
+        full_graph = parse_csv_to_full_graph(DEFAULT_CSV_PATH)
+        
+        if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+        
+        # 图谱、导入统计和版本号取自同一代数据
+        generation = graph_cache.get_generation()
+        graph = generation.store
+        stats = generation.ingest_stats or {}
+        relation_counts = graph.relation_counts()
         
         return jsonify({
-            'total_nodes': len(nodes),
-            'total_edges': len(edges),
-            'max_connections': max(node['connections'] for node in nodes) if nodes else 0,
-            'min_connections': min(node['connections'] for node in nodes) if nodes else 0
+            'version': generation.version,
+            'total_nodes': graph.node_count,
+            'total_edges': graph.edge_count,
+            'relation_types': len(relation_counts),
+            'relations': [
+                {'relation': relation, 'count': count}
+                for relation, count in sorted(relation_counts.items(), key=lambda item: item[1], reverse=True)
+            ],
+            'ingest': {key: value for key, value in stats.items() if key != 'duplicates'},
+            'duplicate_edges': stats.get('duplicate_edges', 0),
+            'duplicates': stats.get('duplicates', [])
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@knowledge_graph_bp.route('/graph/export', methods=['GET'])
+@versioned
+def export_graph():
+    """
+    流式导出整个图谱（或按关系过滤后的子图）
+    参数:
+    - format: ndjson（默认）/ csv
+    - type: 导出的记录类型 node / edge，可重复或用逗号分隔；ndjson默认两者，csv只能选一种（默认edge）
+    - relation: 关系类型，可重复或用逗号分隔；过滤后只导出这些关系的边及其端点
+    """
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'不支持的导出格式: {export_format}，可选 ndjson / csv'}), 400
+        
+        types = [name.strip() for value in request.args.getlist('type') for name in value.split(',')]
+        types = [name for name in types if name] or (list(RECORD_TYPES) if export_format == 'ndjson' else ['edge'])
+        if any(name not in RECORD_TYPES for name in types):
+            return jsonify({'error': '不支持的记录类型，可选 node / edge'}), 400
+        if export_format == 'csv' and len(set(types)) > 1:
+            return jsonify({'error': 'CSV导出只能指定一种记录类型（node 或 edge）'}), 400
+        
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+            
+        full_graph = parse_csv_to_full_graph(DEFAULT_CSV_PATH)
+        
+        if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+        
+        # 导出期间始终读取这一份图谱，期间发布的新版本不影响本次导出
+        graph = full_graph.store
+        _, relations = parse_adjacency_filters(graph)
+        chunk_bytes = GraphConfig.EXPORT_CHUNK_BYTES
+        
+        if export_format == 'csv':
+            filename = f'graph_{types[0]}s_v{full_graph.version}.csv'
+            return encode_stream(export_csv(graph, types[0], relations, chunk_bytes), 'text/csv',
+                                 headers={'Content-Disposition': f'attachment; filename={filename}'})
+        
+        meta = {
+            'version': full_graph.version,
+            'total_nodes': graph.node_count,
+            'total_edges': graph.edge_count,
+            'types': types,
+            'relations': sorted(graph.relations[r] for r in relations) if relations is not None else None
+        }
+        return encode_stream(export_ndjson(graph, types, relations, meta, chunk_bytes), 'application/x-ndjson')
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@knowledge_graph_bp.route('/graph/viewport', methods=['GET'])
+@versioned
+def get_graph_viewport():
+    """
+    视口查询：返回布局坐标落在矩形范围内的节点及其之间的边
+    参数:
+    - min_x, min_y, max_x, max_y: 矩形范围（布局坐标）
+    - zoom: 缩放级别（默认0），该级别全图可见 VIEWPORT_BASE_NODES * 4^zoom 个连接数最多的节点
+    - max_nodes: 本次最多返回的节点数（按连接数优先）
+    布局尚未计算完成时返回202，计算失败（重试退避期内）时返回500
+    """
+    try:
+        try:
+            min_x, min_y, max_x, max_y = (float(request.args[name]) for name in ('min_x', 'min_y', 'max_x', 'max_y'))
+            zoom = min(max(float(request.args.get('zoom', 0)), 0.0), 16.0)
+            max_nodes = parse_bounded_int('max_nodes', 500, GraphConfig.VIEWPORT_MAX_NODES)
+        except KeyError as e:
+            return jsonify({'error': f'缺少参数: {e.args[0]}'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+        
+        generation = current_generation()
+        if generation is None:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+        if not layout_manager.available:
+            return jsonify({'error': '服务端布局需要numpy'}), 501
+        
+        layout = layout_manager.get(generation)
+        if layout is None:
+            layout_manager.schedule(generation)
+            status = layout_manager.status(generation)
+            if status['state'] == 'failed':
+                return jsonify({'error': f"布局计算失败: {status['error']}", 'layout': status}), 500
+            response = jsonify({'error': '布局计算中，请稍后重试', 'layout': status})
+            response.status_code = 202
+            response.headers['Retry-After'] = '2'
+            return response
+        
+        graph = generation.store
+        # 当前缩放级别可见的节点：全局连接数排名在阈值之内
+        view_nodes, stats = layout.viewport(graph, (min_x, min_y, max_x, max_y),
+                                            GraphConfig.VIEWPORT_BASE_NODES * 4 ** zoom, max_nodes)
+        
+        x, y = layout.x, layout.y
+        return encode_response({
+            'nodes': [{**graph.node_dict(node), 'x': round(float(x[node]), 3), 'y': round(float(y[node]), 3)}
+                      for node in view_nodes],
+            'edges': [graph.edge_dict(edge) for edge in graph.induced_edge_ids(view_nodes)],
+            'bbox': {'min_x': min_x, 'min_y': min_y, 'max_x': max_x, 'max_y': max_y},
+            'zoom': zoom,
+            **stats,
+            'bounds': layout.bounds(),
+            'version': generation.version
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def get_cluster_hierarchy():
+    """
+    当前图谱的多层聚类
+    
+    Returns:
+        (generation, hierarchy, 错误响应)；聚类尚未完成时返回202响应，计算失败时返回500
+    """
+    if not os.path.exists(DEFAULT_CSV_PATH):
+        return None, None, (jsonify({'error': 'CSV文件不存在'}), 404)
+    generation = current_generation()
+    if generation is None:
+        return None, None, (jsonify({'error': '无法加载知识图谱数据'}), 500)
+    if not clustering_available():
+        return None, None, (jsonify({'error': '聚类视图需要numpy'}), 501)
+    hierarchy = get_hierarchy(generation.store, compute=False)
+    if hierarchy is None:
+        schedule_clustering(generation)
+        error = clustering_error(generation.store)
+        if error is not None:
+            return generation, None, (jsonify({'error': f'聚类计算失败: {error}'}), 500)
+        response = jsonify({'error': '聚类计算中，请稍后重试'})
+        response.status_code = 202
+        response.headers['Retry-After'] = '2'
+        return generation, None, response
+    return generation, hierarchy, None
+
+@knowledge_graph_bp.route('/graph/clusters', methods=['GET'])
+@versioned
+def get_graph_clusters():
+    """
+    聚类概览：某一层（默认最上层）的超节点和超边
+    参数: level（0为最细的一层）, max_clusters（按簇大小优先）
+    """
+    try:
+        generation, hierarchy, error = get_cluster_hierarchy()
+        if error is not None:
+            return error
+        
+        try:
+            level_index = int(request.args.get('level', hierarchy.top_level))
+            max_clusters = parse_bounded_int('max_clusters', GraphConfig.CLUSTER_TOP_MAX, GraphConfig.CLUSTER_MAX_RETURN)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 0 <= level_index <= hierarchy.top_level:
+            return jsonify({'error': f'层级超出范围: 0 ~ {hierarchy.top_level}'}), 400
+        
+        level = hierarchy.levels[level_index]
+        clusters = sorted(range(level.cluster_count), key=lambda cluster: -level.sizes[cluster])[:max_clusters]
+        nodes, edges = hierarchy.super_view(level_index, clusters)
+        return encode_response({
+            'level': level_index,
+            'levels': hierarchy.summary(),
+            'nodes': nodes,
+            'edges': edges,
+            'total_clusters': level.cluster_count,
+            'truncated': level.cluster_count > len(clusters),
+            'version': generation.version
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@knowledge_graph_bp.route('/graph/clusters/<cluster_id>', methods=['GET'])
+@versioned
+def get_graph_cluster_members(cluster_id):
+    """
+    下钻到一个簇：上层簇返回下一层的子簇（超节点+超边），第0层簇返回其中的实体及实体之间的边
+    参数: max_nodes（子簇按大小、实体按连接数优先）
+    """
+    try:
+        generation, hierarchy, error = get_cluster_hierarchy()
+        if error is not None:
+            return error
+        
+        try:
+            level_index, cluster = hierarchy.parse_cluster_id(cluster_id)
+            max_nodes = parse_bounded_int('max_nodes', 500, GraphConfig.CLUSTER_MAX_MEMBERS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        level = hierarchy.levels[level_index]
+        children = level.children(cluster)
+        selected = children[:max_nodes].tolist()
+        if level_index > 0:
+            nodes, edges = hierarchy.super_view(level_index - 1, selected)
+        else:
+            graph = generation.store
+            nodes = [graph.node_dict(node) for node in selected]
+            edges = [graph.edge_dict(edge) for edge in graph.induced_edge_ids(selected)]
+        
+        parent = None
+        if level_index < hierarchy.top_level:
+            parent = f'{level_index + 1}:{int(hierarchy.levels[level_index + 1].parent_of_children[cluster])}'
+        return encode_response({
+            'cluster': hierarchy.cluster_dict(level_index, cluster),
+            'parent': parent,
+            'child_level': level_index - 1 if level_index > 0 else None,
+            'nodes': nodes,
+            'edges': edges,
+            'total_children': len(children),
+            'truncated': len(children) > len(selected),
+            'version': generation.version
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_adjacency_filters(graph):
+    """
+    解析邻接查询的过滤参数
+    - direction: out / in / both（默认both）
+    - relation: 关系类型，可重复或用逗号分隔，缺省表示不过滤
+    
+    Returns:
+        (direction, 关系整数ID集合或None)
+    """
+    direction = request.args.get('direction', 'both')
+    if direction not in ('out', 'in', 'both'):
+        raise ValueError(f'不支持的方向: {direction}，可选 out / in / both')
+    
+    names = [name.strip() for value in request.args.getlist('relation') for name in value.split(',')]
+    names = [name for name in names if name]
+    if not names:
+        return direction, None
+    # 不存在的关系类型不会匹配任何边
+    return direction, {graph.relation_index[name] for name in names if name in graph.relation_index}
+
 @knowledge_graph_bp.route('/node/expand', methods=['GET'])
+@versioned
 def expand_node():
-    """展开指定节点的相关节点"""
+    """展开指定节点的相关节点（基于CSR邻接，代价O(度数)）"""
     try:
         node_id = request.args.get('id')
         if not node_id:
@@ -227,22 +480,26 @@ def expand_node():
         if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
             return jsonify({'error': '无法加载知识图谱数据'}), 500
         
-        # 找出与指定节点直接相连的所有节点和边
-        related_node_ids = {node_id}
+        graph = full_graph.store
+        try:
+            direction, relations = parse_adjacency_filters(graph)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        center = graph.node_index.get(node_id)
+        
+        # 通过邻接数组找出与指定节点直接相连的节点和边
+        related_nodes_set = set() if center is None else {center}
         related_edges = []
         
-        for edge in full_graph['edges']:
-            if edge['source'] == node_id or edge['target'] == node_id:
-                related_edges.append(edge)
-                related_node_ids.add(edge['source'])
-                related_node_ids.add(edge['target'])
+        if center is not None:
+            for edge in graph.incident_edge_ids(center, direction, relations):
+                related_edges.append(graph.edge_dict(edge))
+                related_nodes_set.add(graph.edge_src[edge])
+                related_nodes_set.add(graph.edge_dst[edge])
         
-        related_nodes = [
-            node for node in full_graph['nodes']
-            if node['id'] in related_node_ids
-        ]
+        related_nodes = [graph.node_dict(node) for node in sorted(related_nodes_set)]
         
-        return jsonify({
+        return encode_response({
             'nodes': related_nodes,
             'edges': related_edges
         })
@@ -251,8 +508,9 @@ def expand_node():
         return jsonify({'error': str(e)}), 500
 
 @knowledge_graph_bp.route('/node/neighbors', methods=['GET'])
+@versioned
 def get_node_neighbors():
-    """获取指定节点及其直接邻居节点"""
+    """获取指定节点及其直接邻居节点（基于CSR邻接，代价O(度数)）"""
     try:
         node_id = request.args.get('id')
         if not node_id:
@@ -266,26 +524,27 @@ def get_node_neighbors():
         if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
             return jsonify({'error': '无法加载知识图谱数据'}), 500
         
-        # 找出与指定节点直接相连的所有节点和边
-        neighbor_node_ids = {node_id}  # 包含目标节点本身
+        graph = full_graph.store
+        try:
+            direction, relations = parse_adjacency_filters(graph)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        center = graph.node_index.get(node_id)
+        
+        # 通过邻接数组找出与指定节点直接相连的节点和边
+        neighbor_nodes_set = set() if center is None else {center}  # 包含目标节点本身
         neighbor_edges = []
         
-        # 查找所有相关的边
-        for edge in full_graph['edges']:
-            if edge['source'] == node_id:
-                neighbor_edges.append(edge)
-                neighbor_node_ids.add(edge['target'])
-            elif edge['target'] == node_id:
-                neighbor_edges.append(edge)
-                neighbor_node_ids.add(edge['source'])
-        
-        # 获取所有相关节点
-        neighbor_nodes = [
-            node for node in full_graph['nodes']
-            if node['id'] in neighbor_node_ids
-        ]
+        if center is not None:
+            for edge in graph.incident_edge_ids(center, direction, relations):
+                source, target = graph.edge_src[edge], graph.edge_dst[edge]
+                neighbor_edges.append(graph.edge_dict(edge))
+                neighbor_nodes_set.add(target if source == center else source)
         
-        return jsonify({
+        # 获取所有相关节点（保持节点原有顺序）
+        neighbor_nodes = [graph.node_dict(node) for node in sorted(neighbor_nodes_set)]
+        
+        return encode_response({
             'nodes': neighbor_nodes,
             'edges': neighbor_edges,
             'center_node': node_id,
@@ -295,6 +554,225 @@ def get_node_neighbors():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@knowledge_graph_bp.route('/node/neighbors/batch', methods=['GET', 'POST'])
+@versioned
+def get_node_neighbors_batch():
+    """
+    批量获取多个节点的邻居，合并去重后一次返回
+    POST JSON {"ids": [...]} 或 GET ?id=a&id=b；direction/relation 过滤参数同 /node/neighbors
+    每个节点和边只序列化一次，membership 按请求的ID给出其邻域在 nodes/edges 中的下标
+    """
+    try:
+        if request.method == 'POST':
+            node_ids = (request.get_json(silent=True) or {}).get('ids') or []
+        else:
+            node_ids = request.args.getlist('id')
+        if not isinstance(node_ids, list) or not node_ids:
+            return jsonify({'error': '未指定节点ID'}), 400
+        node_ids = list(dict.fromkeys(str(node_id) for node_id in node_ids))
+        if len(node_ids) > GraphConfig.BATCH_MAX_IDS:
+            return jsonify({'error': f'一次最多查询 {GraphConfig.BATCH_MAX_IDS} 个节点'}), 400
+            
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+            
+        full_graph = parse_csv_to_full_graph(DEFAULT_CSV_PATH)
+        
+        if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+        
+        graph = full_graph.store
+        try:
+            direction, relations = parse_adjacency_filters(graph)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 逐个中心节点通过邻接数组收集邻域
+        neighborhoods = {}
+        missing = []
+        for node_id in node_ids:
+            center = graph.node_index.get(node_id)
+            if center is None:
+                missing.append(node_id)
+                continue
+            nodes = {center}
+            edges = graph.incident_edge_ids(center, direction, relations)
+            for edge in edges:
+                source, target = graph.edge_src[edge], graph.edge_dst[edge]
+                nodes.add(target if source == center else source)
+            neighborhoods[node_id] = (nodes, edges)
+        
+        # 合并去重，节点和边按原有顺序各序列化一次
+        all_nodes = sorted(set().union(*(nodes for nodes, _ in neighborhoods.values())))
+        all_edges = sorted(set().union(*(edges for _, edges in neighborhoods.values())))
+        node_positions = {node: i for i, node in enumerate(all_nodes)}
+        edge_positions = {edge: i for i, edge in enumerate(all_edges)}
+        
+        membership = {
+            node_id: {
+                'nodes': sorted(node_positions[node] for node in nodes),
+                'edges': [edge_positions[edge] for edge in edges],
+                'neighbor_count': len(nodes) - 1
+            }
+            for node_id, (nodes, edges) in neighborhoods.items()
+        }
+        
+        return encode_response({
+            'nodes': [graph.node_dict(node) for node in all_nodes],
+            'edges': [graph.edge_dict(edge) for edge in all_edges],
+            'membership': membership,
+            'center_nodes': list(neighborhoods),
+            'missing': missing
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_bounded_int(name, default, upper):
+    """解析正整数参数并限制在 [1, upper] 范围内"""
+    return min(max(int(request.args.get(name, default)), 1), upper)
+
+@knowledge_graph_bp.route('/node/khop', methods=['GET'])
+@versioned
+def get_node_khop():
+    """
+    有界k跳邻域（基于邻接数组的BFS）
+    参数: id, depth, max_nodes, fanout, direction, relation, format
+    默认以NDJSON逐层流式返回：meta行、每层一行（nodes/edges）、done行；
+    format=json 时一次性返回 nodes/edges
+    """
+    try:
+        node_id = request.args.get('id')
+        if not node_id:
+            return jsonify({'error': '未指定节点ID'}), 400
+            
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+            
+        full_graph = parse_csv_to_full_graph(DEFAULT_CSV_PATH)
+        
+        if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+        
+        graph = full_graph.store
+        try:
+            direction, relations = parse_adjacency_filters(graph)
+            depth = parse_bounded_int('depth', 2, GraphConfig.KHOP_MAX_DEPTH)
+            max_nodes = parse_bounded_int('max_nodes', 500, GraphConfig.KHOP_MAX_NODES)
+            fanout = parse_bounded_int('fanout', 50, GraphConfig.KHOP_MAX_FANOUT)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        center = graph.node_index.get(node_id)
+        if center is None:
+            return jsonify({'error': '节点不存在'}), 404
+        
+        bfs = BoundedBFS(graph, center, depth, max_nodes, fanout, direction, relations)
+        meta = {
+            'center_node': node_id,
+            'depth': depth,
+            'max_nodes': max_nodes,
+            'fanout': fanout,
+            'version': full_graph.version
+        }
+        
+        def layer_payload(hop, layer_nodes, layer_edges):
+            return {
+                'hop': hop,
+                'nodes': [{**graph.node_dict(node), 'hop': hop} for node in layer_nodes],
+                'edges': [graph.edge_dict(edge) for edge in layer_edges]
+            }
+        
+        def summary():
+            return {'total_nodes': bfs.node_count, 'total_edges': bfs.edge_count, 'truncated': bfs.truncated}
+        
+        if request.args.get('format') == 'json':
+            nodes, edges = [], []
+            for hop, layer_nodes, layer_edges in bfs.layers():
+                layer = layer_payload(hop, layer_nodes, layer_edges)
+                nodes.extend(layer['nodes'])
+                edges.extend(layer['edges'])
+            return encode_response({**meta, 'nodes': nodes, 'edges': edges, **summary()})
+        
+        def generate():
+            yield json.dumps({'type': 'meta', **meta}, ensure_ascii=False) + '\n'
+            try:
+                for hop, layer_nodes, layer_edges in bfs.layers():
+                    yield json.dumps({'type': 'layer', **layer_payload(hop, layer_nodes, layer_edges)},
+                                     ensure_ascii=False) + '\n'
+                yield json.dumps({'type': 'done', **summary()}, ensure_ascii=False) + '\n'
+            except Exception as e:
+                yield json.dumps({'type': 'error', 'error': str(e)}, ensure_ascii=False) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@knowledge_graph_bp.route('/path', methods=['GET'])
+@versioned
+def find_paths():
+    """
+    两个实体之间的最短路径（双向BFS）
+    参数: source, target, max_depth, max_paths, direction, relation（关系白名单）
+    返回连接子图（与分页接口相同的nodes/edges结构）和逐条路径
+    """
+    try:
+        source_id = request.args.get('source')
+        target_id = request.args.get('target')
+        if not source_id or not target_id:
+            return jsonify({'error': '未指定起点或终点'}), 400
+            
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+            
+        full_graph = parse_csv_to_full_graph(DEFAULT_CSV_PATH)
+        
+        if not full_graph or 'nodes' not in full_graph or 'edges' not in full_graph:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+        
+        graph = full_graph.store
+        try:
+            direction, relations = parse_adjacency_filters(graph)
+            max_depth = parse_bounded_int('max_depth', 6, GraphConfig.PATH_MAX_DEPTH)
+            max_paths = parse_bounded_int('max_paths', 10, GraphConfig.PATH_MAX_PATHS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        source = graph.node_index.get(source_id)
+        target = graph.node_index.get(target_id)
+        if source is None or target is None:
+            return jsonify({'error': '节点不存在'}), 404
+        
+        paths, truncated = shortest_paths(graph, source, target, max_depth, max_paths,
+                                          direction, relations, GraphConfig.PATH_MAX_VISITED)
+        
+        # 合并所有路径为连接子图（按首次出现的顺序）
+        path_nodes = list(dict.fromkeys(node for nodes, _ in paths for node in nodes))
+        path_edges = list(dict.fromkeys(edge for _, edges in paths for edge in edges))
+        
+        return encode_response({
+            'nodes': [graph.node_dict(node) for node in path_nodes],
+            'edges': [graph.edge_dict(edge) for edge in path_edges],
+            'paths': [
+                {
+                    'nodes': [graph.node_ids[node] for node in nodes],
+                    'relations': [graph.relations[graph.edge_rel[edge]] for edge in edges],
+                    'length': len(edges)
+                }
+                for nodes, edges in paths
+            ],
+            'source': source_id,
+            'target': target_id,
+            'found': bool(paths),
+            'length': len(paths[0][1]) if paths else None,
+            'total_paths': len(paths),
+            'truncated': truncated
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @knowledge_graph_bp.route('/upload', methods=['POST'])
 def upload_csv():
     """上传CSV文件"""
@@ -324,12 +802,46 @@ def upload_csv():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@knowledge_graph_bp.route('/suggest', methods=['GET'])
+@versioned
+def suggest_entities():
+    """输入联想：标签以q开头的实体（不区分大小写），按连接数排名，并给出所在页"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(int(request.args.get('limit', 10)), GraphConfig.SUGGEST_MAX_LIMIT)
+        page_size = int(request.args.get('page_size', 50))
+
+        if not query:
+            return jsonify({'query': query, 'suggestions': []})
+
+        if not os.path.exists(DEFAULT_CSV_PATH):
+            return jsonify({'error': 'CSV文件不存在'}), 404
+
+        graph, nodes = graph_cache.suggest(query, limit)
+        if graph is None:
+            return jsonify({'error': '无法加载知识图谱数据'}), 500
+
+        positions = graph.rank_positions
+        suggestions = [
+            {**graph.node_dict(node), 'page': positions[node] // page_size + 1}
+            for node in nodes
+        ]
+        return encode_response({'query': query, 'suggestions': suggestions})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @knowledge_graph_bp.route('/search', methods=['GET'])
+@versioned
 def search_entities():
     """搜索实体（支持跨页搜索）"""
     try:
         query = request.args.get('q', '').strip()
         page_size = int(request.args.get('page_size', 50))
+        try:
+            rank_by = parse_rank_by()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not query:
             return jsonify({'entities': [], 'pages': []})
@@ -342,30 +854,27 @@ def search_entities():
         if not full_graph or 'nodes' not in full_graph:
             return jsonify({'error': '无法加载知识图谱数据'}), 500
         
-        # 搜索匹配的实体
-        matching_entities = []
-        for node in full_graph['nodes']:
-            if query.lower() in node['label'].lower():
-                matching_entities.append(node)
+        # 搜索匹配的实体（字符n-gram倒排索引）
+        graph, matching_nodes = graph_cache.search_substring(query)
         
-        # 按连接数排序（与分页逻辑保持一致）
-        sorted_nodes = sorted(full_graph['nodes'], key=lambda x: x['connections'], reverse=True)
+        # 在所选排序中的位置（与分页逻辑保持一致，每个版本只计算一次）
+        _, positions = graph.ranking(rank_by)
+        # 显式指定rank_by时按重要性排列匹配结果，否则保持原有顺序
+        if 'rank_by' in request.args:
+            matching_nodes = sorted(matching_nodes, key=positions.__getitem__)
+        matching_entities = [graph.node_dict(node) for node in matching_nodes]
         
         # 计算每个匹配实体在哪一页
         entity_pages = []
-        for entity in matching_entities:
-            # 找到该实体在排序列表中的位置
-            for idx, node in enumerate(sorted_nodes):
-                if node['id'] == entity['id']:
-                    page_number = (idx // page_size) + 1
-                    entity_pages.append({
-                        'entity': entity,
-                        'page': page_number,
-                        'position': idx + 1
-                    })
-                    break
-        
-        return jsonify({
+        for node, entity in zip(matching_nodes, matching_entities):
+            idx = positions[node]
+            entity_pages.append({
+                'entity': entity,
+                'page': (idx // page_size) + 1,
+                'position': idx + 1
+            })
+        
+        return encode_response({
             'entities': matching_entities,
             'entity_pages': entity_pages,
             'total_matches': len(matching_entities)
@@ -375,12 +884,17 @@ def search_entities():
         return jsonify({'error': str(e)}), 500
 
 @knowledge_graph_bp.route('/search/navigate', methods=['GET'])
+@versioned
 def search_and_navigate():
     """搜索并导航到包含实体的页面"""
     try:
         query = request.args.get('q', '').strip()
         page_size = int(request.args.get('page_size', 50))
         entity_index = int(request.args.get('entity_index', 0))  # 选择第几个匹配的实体
+        try:
+            rank_by = parse_rank_by()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not query:
             return jsonify({'error': '搜索查询不能为空'}), 400
@@ -393,52 +907,46 @@ def search_and_navigate():
         if not full_graph or 'nodes' not in full_graph:
             return jsonify({'error': '无法加载知识图谱数据'}), 500
         
-        # 搜索匹配的实体
-        matching_entities = []
-        for node in full_graph['nodes']:
-            if query.lower() in node['label'].lower():
-                matching_entities.append(node)
+        # 搜索匹配的实体（字符n-gram倒排索引）
+        graph, matching_nodes = graph_cache.search_substring(query)
         
-        if not matching_entities:
+        if not matching_nodes:
             return jsonify({'error': '未找到匹配的实体'}), 404
             
-        if entity_index >= len(matching_entities):
+        if entity_index >= len(matching_nodes):
             return jsonify({'error': '实体索引超出范围'}), 400
         
-        target_entity = matching_entities[entity_index]
-        
-        # 按连接数排序（与分页逻辑保持一致）
-        sorted_nodes = sorted(full_graph['nodes'], key=lambda x: x['connections'], reverse=True)
+        # 与 /search 一致：显式指定rank_by时匹配结果按重要性排列
+        _, positions = graph.ranking(rank_by)
+        if 'rank_by' in request.args:
+            matching_nodes = sorted(matching_nodes, key=positions.__getitem__)
         
-        # 找到目标实体在排序列表中的位置
-        target_position = None
-        for idx, node in enumerate(sorted_nodes):
-            if node['id'] == target_entity['id']:
-                target_position = idx
-                break
+        target_node = matching_nodes[entity_index]
+        target_entity = graph.node_dict(target_node)
         
-        if target_position is None:
-            return jsonify({'error': '无法定位目标实体'}), 404
+        # 找到目标实体在所选排序中的位置（与分页逻辑保持一致）
+        target_position = positions[target_node]
         
         # 计算目标页码
         target_page = (target_position // page_size) + 1
         
         # 获取该页的数据
-        paginated_data = get_paginated_graph(full_graph, target_page, page_size)
+        paginated_data = get_paginated_graph(full_graph, target_page, page_size, rank_by)
         
-        # 标记搜索结果
-        for node in paginated_data['nodes']:
-            if node['id'] == target_entity['id']:
-                node['is_search_result'] = True
-                break
+        # 标记搜索结果（分页数据来自缓存，标记在副本上）
+        nodes = [
+            {**node, 'is_search_result': True} if node['id'] == target_entity['id'] else node
+            for node in paginated_data['nodes']
+        ]
         
-        return jsonify({
+        return encode_response({
             **paginated_data,
+            'nodes': nodes,
             'search_result': {
                 'entity': target_entity,
                 'page': target_page,
                 'position': target_position + 1,
-                'total_matches': len(matching_entities)
+                'total_matches': len(matching_nodes)
             }
         })
     
@@ -0,0 +1,102 @@
+"""
+按图谱版本在后台构建的派生结构（BM25索引、语义向量、布局）的公共调度逻辑
+- 每个版本同时只有一个构建任务，任务串行执行；等待期间又有更新的版本时跳过旧版本
+- 只保留最近一次构建完成的结果（结果对象带 version_id，新版本可从旧结果增量构建）
+- 构建失败的版本记录错误和失败次数，退避时间（GraphConfig.BACKGROUND_RETRY_DELAY 起每次翻倍，
+  不超过 GraphConfig.BACKGROUND_RETRY_MAX_DELAY）内不再重试，新版本发布后照常构建
+"""
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+from src.config.graph_config import GraphConfig
+
+# report(进度, 说明, **附加字段)：更新任务状态
+ProgressReporter = Callable[..., None]
+
+
+class BackgroundBuilder:
+    """子类实现 _compute，并设置日志标签和线程名"""
+
+    log_tag = '后台'
+    thread_name = 'graph-build'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._result: Optional[Any] = None
+        self._latest_version_id: Optional[str] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def get(self, generation) -> Optional[Any]:
+        """当前版本的结果，尚未构建完成时返回None"""
+        result = self._result
+        return result if result is not None and generation is not None and \
+            result.version_id == generation.version_id else None
+
+    def status(self, generation) -> Dict[str, Any]:
+        with self._lock:
+            job = self._jobs.get(generation.version_id)
+            return dict(job) if job else {'state': 'missing' if self.available else 'unavailable'}
+
+    def schedule(self, generation) -> None:
+        """为图谱版本启动后台构建（已完成、进行中或失败后尚在退避期内时忽略）"""
+        if not self.available or generation is None:
+            return
+        version_id = generation.version_id
+        with self._lock:
+            self._latest_version_id = version_id
+            job = self._jobs.get(version_id)
+            if job is not None and (job['state'] != 'failed' or time.time() < job['retry_at']):
+                return
+            failures = job['failures'] if job is not None else 0
+            self._jobs = {key: job for key, job in self._jobs.items() if job['state'] == 'running'}
+            self._jobs[version_id] = {'state': 'pending', 'progress': 0.0, 'message': None,
+                                      'started_at': None, 'duration': None, 'error': None,
+                                      'failures': failures, 'retry_at': None}
+        threading.Thread(target=self._run, args=(generation,), name=self.thread_name, daemon=True).start()
+
+    def _run(self, generation) -> None:
+        version_id = generation.version_id
+        with self._compute_lock:
+            with self._lock:
+                job = self._jobs.get(version_id)
+                if job is None or version_id != self._latest_version_id:
+                    self._jobs.pop(version_id, None)
+                    return
+                job.update(state='running', started_at=time.time())
+
+            def report(fraction: Optional[float] = None, message: Optional[str] = None, **fields) -> None:
+                with self._lock:
+                    if fraction is not None:
+                        job['progress'] = round(min(float(fraction), 1.0), 4)
+                    if message is not None:
+                        job['message'] = message
+                    job.update(fields)
+
+            try:
+                self._result = self._compute(generation, report)
+                state, error = 'done', None
+            except Exception as e:
+                traceback.print_exc()
+                state, error = 'failed', str(e) or type(e).__name__
+            with self._lock:
+                job.update(state=state, error=error, duration=round(time.time() - job['started_at'], 3))
+                if state == 'done':
+                    job['progress'] = 1.0
+                else:
+                    job['failures'] += 1
+                    delay = min(GraphConfig.BACKGROUND_RETRY_DELAY * 2 ** (job['failures'] - 1),
+                                GraphConfig.BACKGROUND_RETRY_MAX_DELAY)
+                    job['retry_at'] = time.time() + delay
+            print(f"[{self.log_tag}] {'完成' if state == 'done' else '失败'}: 版本 {generation.version}, "
+                  f"耗时 {job['duration']}s")
+
+    def _compute(self, generation, report: ProgressReporter) -> Any:
+        """构建 generation 的结果（带 version_id 属性）；self._result 为上一次构建完成的结果"""
+        raise NotImplementedError
@@ -0,0 +1,431 @@
+"""
+BM25全文检索
+每个实体的文档由三部分组成：自身标签（按 GraphConfig.BM25_LABEL_WEIGHT 加权）、
+所有邻居的标签、相连边的关系类型。中文不切词，按字二元组切分（空白和标点处断开，
+单字片段保留单字），与n-gram索引的编码一致
+
+倒排表按段存放：全量构建得到一个段，追加导入时只为受影响的文档（新实体、新边的两端）
+重新切分并写入新段，这些文档在旧段中的记录随之失效（owner[文档] 为持有其有效记录的段号）。
+段内按词项分组、组内按节点升序（CSR数组），保存原始词频以及每个词项的最大词频和最短文档长度；
+idf、文档长度归一化在查询时只对涉及的记录计算，因此追加时只需更新受影响文档的长度、
+总长度和相关词项的文档频率，不必重算整个索引。
+
+查询按各词项得分贡献的上界从高到低逐个累加（MaxScore）：当前第k名的分数超过剩余词项上界之和后，
+剩余词项只更新已有候选，不再引入新文档，并随时淘汰不可能进入前k的候选。
+长问句中"什么""应该"这类高频二元组因此只在少量候选上计算
+
+BM25Manager 按图谱版本在后台构建索引（见 background_build），构建完成前实体搜索跳过BM25阶段
+需要numpy
+"""
+import math
+import re
+from collections import Counter
+from typing import Any, List, Optional, Sequence, Tuple
+
+from src.config.graph_config import GraphConfig
+from src.utils.background_build import BackgroundBuilder
+from src.utils.ngram_index import _gram_key
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时不提供BM25检索
+    np = None
+
+# 切分片段的分隔符：空白和常见中英文标点
+_SEPARATORS = ' \t\n\r\x0b\x0c　，。？！、；：,.?!;:'
+_SEPARATOR_PATTERN = re.compile('[' + re.escape(_SEPARATORS) + ']+')
+
+def tokenize(text: str, unigrams: bool = False) -> List[int]:
+    """
+    文本 -> 词项编码列表（保留重复）：各片段的相邻二元组，单字片段为该字；
+    unigrams=True 时每个字也作为词项
+    """
+    keys = []
+    for run in _SEPARATOR_PATTERN.split(text.lower()):
+        if unigrams or len(run) == 1:
+            keys.extend(_gram_key(char) for char in run)
+        keys.extend(_gram_key(run[i:i + 2]) for i in range(len(run) - 1))
+    return keys
+
+
+def _tokenize_all(texts: Sequence[str], unigrams: bool = False):
+    """
+    批量切分（与 tokenize 结果一致），返回CSR：offsets[i]:offsets[i+1] 为第i个文本的词项编码
+    """
+    count = len(texts)
+    if not count:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    lowered = [text.lower() for text in texts]
+    lengths = np.fromiter(map(len, lowered), dtype=np.int64, count=count)
+    codes = np.frombuffer('\x00'.join(lowered).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    owner = np.repeat(np.arange(count, dtype=np.int64), lengths + 1)[:len(codes)]
+    separator = np.isin(codes, [ord(char) for char in _SEPARATORS])
+    boundary = np.zeros(len(codes) + 1, dtype=bool)
+    boundary[np.cumsum(lengths + 1) - 1] = True
+    separator |= boundary[:len(codes)]
+
+    # 前后都是分隔符的字为单字片段
+    padded = np.concatenate([[True], separator, [True]])
+    single = ~separator if unigrams else ~separator & padded[:-2] & padded[2:]
+    bigram = ~(separator[:-1] | separator[1:])
+    keys = np.concatenate([codes[single], ((codes[:-1][bigram] + 1) << 21) | codes[1:][bigram]])
+    owners = np.concatenate([owner[single], owner[:-1][bigram]])
+    order = np.argsort(owners, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=count))])
+    return offsets, keys[order]
+
+
+def _expand(offsets, items):
+    """CSR中一组条目的全部元素下标，以及每个元素属于第几个条目"""
+    starts, counts = offsets[items], offsets[items + 1] - offsets[items]
+    total = int(counts.sum())
+    which = np.repeat(np.arange(len(items)), counts)
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return positions, which
+
+
+def document_terms(graph, label_weight: float, unigrams: bool = False, docs=None, edge_limit: Optional[int] = None):
+    """
+    实体文档的词项（保留重复）：自身标签（权重label_weight）、边另一端的标签、边的关系类型
+
+    Args:
+        docs: 只生成这些文档（节点整数ID数组），默认全部实体
+        edge_limit: 只计入编号小于该值的边（还原追加导入之前的文档），默认全部边
+
+    Returns:
+        (文档即节点整数ID, 词项编码, 权重) 三个等长numpy数组
+    """
+    if docs is not None or edge_limit is not None:
+        return _partial_document_terms(graph, label_weight, unigrams, docs, edge_limit)
+    n = graph.node_count
+    label_offsets, label_keys = _tokenize_all(graph.node_ids, unigrams)
+    relation_offsets, relation_keys = _tokenize_all(graph.relations, unigrams)
+    src = np.frombuffer(graph.edge_src, dtype=np.int32).astype(np.int64)
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int32).astype(np.int64)
+    rel = np.frombuffer(graph.edge_rel, dtype=np.int32).astype(np.int64)
+
+    parts_doc = [np.repeat(np.arange(n, dtype=np.int64), np.diff(label_offsets))]
+    parts_key = [label_keys]
+    parts_weight = [np.full(len(label_keys), float(label_weight))]
+    for doc, other in ((src, dst), (dst, src)):
+        positions, which = _expand(label_offsets, other)
+        parts_doc.append(doc[which])
+        parts_key.append(label_keys[positions])
+        parts_weight.append(np.ones(len(positions)))
+        positions, which = _expand(relation_offsets, rel)
+        parts_doc.append(doc[which])
+        parts_key.append(relation_keys[positions])
+        parts_weight.append(np.ones(len(positions)))
+    return np.concatenate(parts_doc), np.concatenate(parts_key), np.concatenate(parts_weight)
+
+
+def _partial_document_terms(graph, label_weight: float, unigrams: bool, docs, edge_limit: Optional[int]):
+    """document_terms 的部分文档版本：沿CSR邻接只访问这些文档的边，只切分涉及的标签"""
+    docs = np.arange(graph.node_count, dtype=np.int64) if docs is None else np.asarray(docs, dtype=np.int64)
+    src = np.frombuffer(graph.edge_src, dtype=np.int32)
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int32)
+    rel = np.frombuffer(graph.edge_rel, dtype=np.int32)
+
+    # 出边的另一端是目标，入边的另一端是源（自环两个方向各计一次，与全量版本一致）
+    edge_docs, edge_others, edge_rels = [], [], []
+    for offsets, edges, other in ((graph.out_offsets, graph.out_edges, dst),
+                                  (graph.in_offsets, graph.in_edges, src)):
+        positions, which = _expand(np.frombuffer(offsets, dtype=np.int64), docs)
+        edge_ids = np.frombuffer(edges, dtype=np.int32)[positions].astype(np.int64)
+        if edge_limit is not None:
+            kept = edge_ids < edge_limit
+            edge_ids, which = edge_ids[kept], which[kept]
+        edge_docs.append(docs[which])
+        edge_others.append(other[edge_ids].astype(np.int64))
+        edge_rels.append(rel[edge_ids].astype(np.int64))
+    edge_docs = np.concatenate(edge_docs)
+    edge_others = np.concatenate(edge_others)
+    edge_rels = np.concatenate(edge_rels)
+
+    labelled = np.unique(np.concatenate([docs, edge_others]))
+    node_ids = graph.node_ids
+    label_offsets, label_keys = _tokenize_all([node_ids[node] for node in labelled.tolist()], unigrams)
+    relation_offsets, relation_keys = _tokenize_all(graph.relations, unigrams)
+
+    positions, which = _expand(label_offsets, np.searchsorted(labelled, docs))
+    parts_doc, parts_key = [docs[which]], [label_keys[positions]]
+    parts_weight = [np.full(len(positions), float(label_weight))]
+    positions, which = _expand(label_offsets, np.searchsorted(labelled, edge_others))
+    parts_doc.append(edge_docs[which])
+    parts_key.append(label_keys[positions])
+    parts_weight.append(np.ones(len(positions)))
+    positions, which = _expand(relation_offsets, edge_rels)
+    parts_doc.append(edge_docs[which])
+    parts_key.append(relation_keys[positions])
+    parts_weight.append(np.ones(len(positions)))
+    return np.concatenate(parts_doc), np.concatenate(parts_key), np.concatenate(parts_weight)
+
+
+class _Segment:
+    """一段倒排表：词项编码升序，每个词项的记录按文档升序"""
+
+    __slots__ = ('term_keys', 'offsets', 'docs', 'tfs', 'tf_max', 'length_min')
+
+    def __init__(self, docs, keys, weights, doc_length):
+        """由 (文档, 词项编码, 权重) 构建；doc_length 为全部文档的长度，用于记录每个词项的最短文档长度"""
+        n = max(len(doc_length), 1)
+        self.term_keys, terms = np.unique(keys, return_inverse=True)
+        # 按 (词项, 文档) 合并词频，结果按词项分组、组内文档升序
+        pairs, inverse = np.unique(terms.astype(np.int64) * n + docs, return_inverse=True)
+        self.tfs = np.bincount(inverse, weights=weights, minlength=len(pairs)).astype(np.float32)
+        self.docs = (pairs % n).astype(np.int32)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(pairs // n, minlength=len(self.term_keys)))])
+        if len(pairs):
+            self.tf_max = np.maximum.reduceat(self.tfs, self.offsets[:-1])
+            self.length_min = np.minimum.reduceat(doc_length[self.docs], self.offsets[:-1])
+        else:
+            self.tf_max = np.zeros(0, dtype=np.float32)
+            self.length_min = np.zeros(0, dtype=np.float64)
+
+    def find(self, key: int) -> int:
+        """词项在本段中的下标，不存在时返回-1"""
+        position = int(np.searchsorted(self.term_keys, key))
+        if position < len(self.term_keys) and self.term_keys[position] == key:
+            return position
+        return -1
+
+
+class BM25Index:
+    """
+    实体文档的BM25倒排索引
+    build() 全量构建，extend() 在追加导入后生成新索引（共享未变化的段，本对象不变）
+    """
+
+    def __init__(self, segments: List[_Segment], owner, doc_length, total_length: float, term_keys, df,
+                 version_id: Optional[str] = None, k1: float = None, b: float = None, label_weight: float = None):
+        self.segments = segments
+        self.owner = owner
+        self.doc_length = doc_length
+        self.total_length = total_length
+        # 全部词项编码（升序）及其文档频率
+        self.term_keys = term_keys
+        self.df = df
+        self.version_id = version_id
+        self.k1 = GraphConfig.BM25_K1 if k1 is None else k1
+        self.b = GraphConfig.BM25_B if b is None else b
+        self.label_weight = GraphConfig.BM25_LABEL_WEIGHT if label_weight is None else label_weight
+
+    @classmethod
+    def build(cls, graph, version_id: Optional[str] = None, k1: float = None, b: float = None,
+              label_weight: float = None) -> 'BM25Index':
+        """由整个图谱构建单段索引"""
+        label_weight = GraphConfig.BM25_LABEL_WEIGHT if label_weight is None else label_weight
+        docs, keys, weights = document_terms(graph, label_weight)
+        doc_length = np.bincount(docs, weights=weights, minlength=graph.node_count)
+        segment = _Segment(docs, keys, weights, doc_length)
+        return cls([segment], np.zeros(graph.node_count, dtype=np.int8), doc_length, float(doc_length.sum()),
+                   segment.term_keys, np.diff(segment.offsets), version_id, k1, b, label_weight)
+
+    def extend(self, graph, node_start: int, edge_start: int, version_id: Optional[str] = None) -> 'BM25Index':
+        """
+        追加导入后的新索引：只重新切分受影响的文档（编号不小于node_start的新实体、
+        编号不小于edge_start的新边的两端），写入新段，并更新文档长度、总长度和文档频率
+
+        Args:
+            graph: 追加后的图谱（前node_start个实体、前edge_start条边与本索引对应的图谱相同）
+        """
+        n = graph.node_count
+        new_edges = np.concatenate([np.frombuffer(graph.edge_src, dtype=np.int32)[edge_start:],
+                                    np.frombuffer(graph.edge_dst, dtype=np.int32)[edge_start:]])
+        touched = np.unique(np.concatenate([np.arange(node_start, n, dtype=np.int64), new_edges.astype(np.int64)]))
+        previous = touched[touched < self.document_count]
+
+        docs, keys, weights = document_terms(graph, self.label_weight, docs=touched)
+        doc_length = np.zeros(n, dtype=np.float64)
+        doc_length[:self.document_count] = self.doc_length
+        total_length = self.total_length - float(self.doc_length[previous].sum())
+        doc_length[touched] = np.bincount(docs, weights=weights, minlength=n)[touched]
+        total_length += float(doc_length[touched].sum())
+        segment = _Segment(docs, keys, weights, doc_length)
+
+        # 文档频率：扣除受影响的旧文档在追加前包含的词项，再加上新段中的词项（新词项按序插入）
+        positions = np.searchsorted(self.term_keys, segment.term_keys)
+        known = positions < len(self.term_keys)
+        known[known] = self.term_keys[positions[known]] == segment.term_keys[known]
+        term_keys = np.insert(self.term_keys, positions[~known], segment.term_keys[~known])
+        df = np.insert(self.df, positions[~known], 0)
+        df[np.searchsorted(term_keys, segment.term_keys)] += np.diff(segment.offsets)
+        if len(previous):
+            old_docs, old_keys, _ = document_terms(graph, self.label_weight, docs=previous, edge_limit=edge_start)
+            old_terms = np.searchsorted(term_keys, old_keys)
+            pairs = np.unique(old_terms * max(n, 1) + old_docs)
+            df -= np.bincount(pairs // max(n, 1), minlength=len(term_keys))
+
+        owner = np.zeros(n, dtype=np.int8)
+        owner[:self.document_count] = self.owner
+        owner[touched] = len(self.segments)
+        return BM25Index(self.segments + [segment], owner, doc_length, total_length, term_keys, df,
+                         version_id, self.k1, self.b, self.label_weight)
+
+    @property
+    def document_count(self) -> int:
+        return len(self.doc_length)
+
+    @property
+    def term_count(self) -> int:
+        return int(np.count_nonzero(self.df))
+
+    @property
+    def posting_count(self) -> int:
+        """倒排记录数（含旧段中已失效的记录）"""
+        return sum(len(segment.docs) for segment in self.segments)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.segments)
+
+    def _postings(self, key: int) -> List[Tuple[int, Any, Any]]:
+        """
+        词项在各段中的记录 [(段号, 文档, 词频)]，每段内文档升序
+        除最新一段外可能含已失效的记录，使用前需按 owner 过滤
+        """
+        parts = []
+        for index, segment in enumerate(self.segments):
+            position = segment.find(key)
+            if position >= 0:
+                start, end = segment.offsets[position], segment.offsets[position + 1]
+                parts.append((index, segment.docs[start:end], segment.tfs[start:end]))
+        return parts
+
+    def _impacts(self, docs, tfs, scale: float, average_length: float):
+        """记录的得分贡献 scale × tf(k1+1) / (tf + k1(1-b+b·dl/avgdl))，scale 为 idf × 查询中出现次数"""
+        tfs = tfs.astype(np.float64)
+        norm = self.k1 * (1.0 - self.b + self.b * self.doc_length[docs] / average_length)
+        return scale * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+    def _query_terms(self, query: str, max_terms: int, average_length: float) -> List[Tuple[int, float, float]]:
+        """
+        查询 -> [(词项编码, idf × 查询中出现次数, 得分贡献上界)]，按上界从高到低；
+        未出现在索引中的词项忽略，过长的问句只保留上界最高的max_terms个
+        """
+        counts = Counter(tokenize(query))
+        if not counts or not len(self.term_keys):
+            return []
+        keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        positions = np.minimum(np.searchsorted(self.term_keys, keys), len(self.term_keys) - 1)
+        found = (self.term_keys[positions] == keys) & (self.df[positions] > 0)
+        n = self.document_count
+        terms = []
+        for key, df in zip(keys[found].tolist(), self.df[positions[found]].tolist()):
+            scale = math.log(1.0 + (n - df + 0.5) / (df + 0.5)) * counts[key]
+            # 得分贡献随词频增大、随文档长度减小，段内最大词频和最短文档长度给出上界
+            bound = 0.0
+            for segment in self.segments:
+                position = segment.find(key)
+                if position >= 0:
+                    tf, length = float(segment.tf_max[position]), float(segment.length_min[position])
+                    norm = self.k1 * (1.0 - self.b + self.b * length / average_length)
+                    bound = max(bound, scale * tf * (self.k1 + 1.0) / (tf + norm))
+            terms.append((key, scale, bound))
+        terms.sort(key=lambda item: -item[2])
+        return terms[:max_terms]
+
+    def search(self, query: str, limit: int = 10, rank_positions: Optional[Sequence[int]] = None,
+               max_terms: int = None, min_terms: int = 1, min_score_ratio: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        BM25前k个文档
+
+        Args:
+            rank_positions: 分数相同时按该排名（越小越靠前），默认按节点ID
+            max_terms: 最多使用的查询词项数，默认 GraphConfig.BM25_MAX_QUERY_TERMS
+            min_terms: 查询中至少有这么多个不同词项出现在索引中，否则不返回结果
+                （只有一个二元组的短查询匹配到的多是碰巧含该二元组的邻居，区分不出相关实体）
+            min_score_ratio: 分数至少为查询满分的该比例，满分为每个词项 idf × 出现次数 × (k1+1) 之和，
+                即文档包含全部查询词项且词频足够大时的得分
+
+        Returns:
+            [(节点整数ID, 分数)]，分数从高到低
+        """
+        average_length = max(self.total_length / max(self.document_count, 1), 1e-9)
+        terms = self._query_terms(query, max_terms or GraphConfig.BM25_MAX_QUERY_TERMS, average_length)
+        if not terms or len(terms) < min_terms or limit <= 0:
+            return []
+        min_score = min_score_ratio * sum(scale for _, scale, _ in terms) * (self.k1 + 1.0)
+        remaining = sum(bound for _, _, bound in terms)
+        candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float64)
+        threshold = 0.0
+
+        for key, scale, bound in terms:
+            # 浮点累减可能略小于0，会把恰好等于第k名分数的候选淘汰
+            remaining = max(remaining - bound, 0.0)
+            parts = self._postings(key)
+            if not parts:
+                continue
+            last = len(self.segments) - 1
+            if len(candidates) < limit or remaining + bound >= threshold:
+                # 仍可能出现新的前k文档：合并全部有效记录（最新一段的记录都有效）
+                live_parts = []
+                for index, docs, tfs in parts:
+                    if index < last:
+                        live = self.owner[docs] == index
+                        docs, tfs = docs[live], tfs[live]
+                    live_parts.append((docs, tfs))
+                docs = np.concatenate([docs for docs, _ in live_parts])
+                impacts = self._impacts(docs, np.concatenate([tfs for _, tfs in live_parts]), scale,
+                                        average_length)
+                merged, inverse = np.unique(np.concatenate([candidates, docs]), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate([scores, impacts]), minlength=len(merged))
+                candidates = merged
+            else:
+                # 只更新已有候选（段内记录按文档升序，二分定位；只对命中的候选检查记录是否有效）
+                for index, docs, tfs in parts:
+                    positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                    hit = docs[positions] == candidates
+                    if index < last:
+                        hit &= self.owner[candidates] == index
+                    if hit.any():
+                        scores[hit] += self._impacts(docs[positions[hit]], tfs[positions[hit]], scale,
+                                                     average_length)
+            if len(candidates) >= limit:
+                threshold = float(np.partition(scores, len(scores) - limit)[len(scores) - limit])
+                # 加上剩余词项的上界也达不到第k名的候选不再保留
+                if remaining < threshold:
+                    keep = scores + remaining >= threshold
+                    candidates, scores = candidates[keep], scores[keep]
+
+        if rank_positions is not None:
+            ranks = np.fromiter((rank_positions[node] for node in candidates.tolist()), dtype=np.int64,
+                                count=len(candidates))
+        else:
+            ranks = candidates
+        order = np.lexsort((ranks, -scores))[:limit]
+        return [(int(node), float(score)) for node, score in zip(candidates[order], scores[order])
+                if score >= min_score]
+
+
+class BM25Manager(BackgroundBuilder):
+    """
+    按图谱版本在后台构建并缓存BM25索引
+    追加导入产生的版本在已有索引上增量更新（只处理受影响的文档），段数达到
+    GraphConfig.BM25_MAX_SEGMENTS 或找不到可续接的索引时全量重建
+    """
+
+    log_tag = 'BM25'
+    thread_name = 'graph-bm25'
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def _compute(self, generation, report) -> BM25Index:
+        """job['mode'] 记录构建方式：'extend' 或 'full'"""
+        graph = generation.store
+        base = self._result
+        if base is not None and base.segment_count < GraphConfig.BM25_MAX_SEGMENTS:
+            # 追加链上最近的、已有索引的版本
+            for version_id, node_start, edge_start in reversed(generation.append_lineage):
+                if version_id == base.version_id:
+                    report(mode='extend')
+                    return base.extend(graph, node_start, edge_start, generation.version_id)
+        report(mode='full')
+        return BM25Index.build(graph, generation.version_id)
+
+
+# 全局BM25索引管理器
+bm25_manager = BM25Manager()
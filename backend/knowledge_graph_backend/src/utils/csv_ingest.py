@@ -0,0 +1,457 @@
+"""
+CSV导入引擎
+三元组CSV（源实体,关系,目标实体）的可插拔解析后端：
+- fast:     逐行split，仅对含引号的行回退到csv模块
+- csv:      标准库csv.reader（行为基准）
+- pyarrow:  安装pyarrow时使用其C++多线程CSV读取器（需显式指定，auto不会选择）
+- parallel: 按行边界切分文件，多进程解析后合并驻留表和局部度数
+
+每次导入都会统计行数与吞吐(行/秒)，便于在大文件上比较各后端；
+重复的(源, 关系, 目标)三元组只保留首次出现，被丢弃的重复项记录在导入统计中
+
+命令行用法（在 backend/knowledge_graph_backend 目录下执行）:
+    python -m src.utils.csv_ingest Disease.csv --backends fast,csv,parallel
+"""
+import argparse
+import concurrent.futures
+import csv
+import io
+import os
+import sys
+import time
+from array import array
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from src.config.graph_config import GraphConfig
+from src.utils.graph_store import CompactGraph, GraphBuilder
+
+try:
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pa_compute
+except ImportError:  # pyarrow为可选依赖
+    pa_csv = None
+    pa_compute = None
+
+# 进度回调: (已读行数, 已读字节数, 文件总字节数)
+ProgressCallback = Callable[[int, int, int], None]
+
+_BACKENDS: Dict[str, Callable[..., int]] = {}
+
+# 快速路径每次读取的块大小
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def register_backend(name: str):
+    """
+    注册解析后端；后端签名为 (csv_file_path, builder, progress, limit) -> 读取的行数
+    limit 为最多读取的字节数（ingest_csv 传入开始解析时记录的文件大小），None表示读到文件末尾
+    """
+    def decorator(func):
+        _BACKENDS[name] = func
+        return func
+    return decorator
+
+
+def available_backends() -> List[str]:
+    """当前环境可用的解析后端"""
+    return [name for name in _BACKENDS if name != 'pyarrow' or pa_csv is not None]
+
+
+class _BoundedReader(io.RawIOBase):
+    """只暴露底层二进制文件前limit字节的原始流，供文本模式和pyarrow读取器使用"""
+
+    def __init__(self, file, limit: int):
+        self._file = file
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer).cast('B')[:self._remaining]
+        count = self._file.readinto(view) or 0
+        self._remaining -= count
+        return count
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+
+def _byte_limit(csv_file_path: str, limit: Optional[int]) -> int:
+    """本次解析最多读取的字节数"""
+    return os.path.getsize(csv_file_path) if limit is None else limit
+
+
+def _add_row(builder: GraphBuilder, row: List[str]) -> bool:
+    """将一行加入图谱，返回是否为有效三元组"""
+    if len(row) < 3:
+        return False
+    source = row[0].strip()
+    target = row[2].strip()
+    if not source or not target:  # 跳过空值
+        return False
+    builder.add_edge(source, row[1].strip(), target)
+    return True
+
+
+def _parse_stream(file, builder: GraphBuilder, progress: Optional[ProgressCallback] = None,
+                  total_bytes: int = 0, limit: Optional[int] = None) -> int:
+    """
+    快速路径：按块读取并按行切分，不含引号的行直接按逗号切分；
+    含引号的行（可能跨行）收集完整后交给csv模块解析
+
+    Args:
+        file: 以二进制模式打开的文件对象
+        limit: 最多读取的字节数（文件在解析期间仍被追加时，保证只消费记录下的部分）
+    """
+    rows = 0
+    bytes_read = 0
+    tail = b''
+    pending: List[str] = []
+    add_edge = builder.add_edge
+
+    while True:
+        block = file.read(_BLOCK_SIZE if limit is None else min(_BLOCK_SIZE, limit - bytes_read))
+        bytes_read += len(block)
+        if block:
+            block = tail + block
+            # 只处理到最后一个换行符，保证不截断行和多字节字符
+            cut = block.rfind(b'\n') + 1
+            if cut == 0:
+                tail = block
+                continue
+            tail = block[cut:]
+            lines = block[:cut].decode('utf-8').split('\n')
+            lines.pop()
+        else:
+            if not tail and not pending:
+                break
+            lines = [tail.decode('utf-8')] if tail else []
+            tail = b''
+
+        for line in lines:
+            if pending or '"' in line:
+                pending.append(line)
+                text = '\n'.join(pending)
+                # 引号未闭合说明字段内含换行，继续读取下一行
+                if text.count('"') % 2:
+                    continue
+                for row in csv.reader(io.StringIO(text)):
+                    _add_row(builder, row)
+                pending = []
+            else:
+                parts = line.split(',', 3)
+                if len(parts) >= 3:
+                    source = parts[0].strip()
+                    target = parts[2].strip()
+                    if source and target:
+                        add_edge(source, parts[1].strip(), target)
+            rows += 1
+
+        if not block:
+            if pending:
+                for row in csv.reader(io.StringIO('\n'.join(pending))):
+                    _add_row(builder, row)
+                rows += 1
+            break
+        if progress is not None:
+            progress(rows, bytes_read, total_bytes)
+
+    return rows
+
+
+@register_backend('fast')
+def _ingest_fast(csv_file_path: str, builder: GraphBuilder, progress: Optional[ProgressCallback] = None,
+                 limit: Optional[int] = None) -> int:
+    """单线程快速路径解析"""
+    total_bytes = _byte_limit(csv_file_path, limit)
+    with open(csv_file_path, 'rb') as file:
+        return _parse_stream(file, builder, progress, total_bytes, limit=total_bytes)
+
+
+@register_backend('csv')
+def _ingest_csv(csv_file_path: str, builder: GraphBuilder, progress: Optional[ProgressCallback] = None,
+                limit: Optional[int] = None) -> int:
+    """标准库csv.reader解析"""
+    total_bytes = _byte_limit(csv_file_path, limit)
+    interval = GraphConfig.PROGRESS_INTERVAL
+    rows = 0
+    with open(csv_file_path, 'rb') as raw, \
+            io.TextIOWrapper(io.BufferedReader(_BoundedReader(raw, total_bytes)), encoding='utf-8') as file:
+        for row in csv.reader(file):
+            _add_row(builder, row)
+            rows += 1
+            if progress is not None and rows % interval == 0:
+                progress(rows, file.buffer.tell(), total_bytes)
+    return rows
+
+
+@register_backend('pyarrow')
+def _ingest_pyarrow(csv_file_path: str, builder: GraphBuilder, progress: Optional[ProgressCallback] = None,
+                    limit: Optional[int] = None) -> int:
+    """
+    pyarrow C++ CSV读取器（流式按批读取）
+    注意：列数与首行不一致的行会被跳过，行数统计也与其他后端不同，因此只在显式指定时使用
+    """
+    if pa_csv is None:
+        raise RuntimeError('未安装pyarrow，无法使用pyarrow解析后端')
+
+    total_bytes = _byte_limit(csv_file_path, limit)
+    read_options = pa_csv.ReadOptions(autogenerate_column_names=True, block_size=16 * 1024 * 1024)
+    parse_options = pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=lambda row: 'skip')
+    convert_options = pa_csv.ConvertOptions(column_types={'f0': 'string', 'f1': 'string', 'f2': 'string'},
+                                            strings_can_be_null=False)
+    rows = 0
+    bytes_read = 0
+    with open(csv_file_path, 'rb') as raw:
+        reader = pa_csv.open_csv(io.BufferedReader(_BoundedReader(raw, total_bytes)), read_options=read_options,
+                                 parse_options=parse_options, convert_options=convert_options)
+        for batch in reader:
+            if batch.num_columns < 3:
+                rows += batch.num_rows
+                continue
+            columns = [pa_compute.utf8_trim_whitespace(batch.column(i)).to_pylist() for i in range(3)]
+            for source, relation, target in zip(*columns):
+                if source and target:
+                    builder.add_edge(source, relation or '', target)
+            rows += batch.num_rows
+            # 批次内存大小近似于已读取的原始字节数
+            bytes_read = min(total_bytes, bytes_read + batch.nbytes)
+            if progress is not None:
+                progress(rows, bytes_read, total_bytes)
+    return rows
+
+
+def _split_line_ranges(csv_file_path: str, parts: int, total_bytes: int) -> List[Tuple[int, int]]:
+    """按行边界将文件前total_bytes字节切分为若干字节区间"""
+    boundaries = [0]
+    with open(csv_file_path, 'rb') as file:
+        for i in range(1, parts):
+            position = max(total_bytes * i // parts, boundaries[-1])
+            file.seek(position)
+            if position > 0:
+                file.readline()  # 跳到下一行行首
+            boundaries.append(min(file.tell(), total_bytes))
+    boundaries.append(total_bytes)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def _parse_chunk(csv_file_path: str, start: int, end: int) -> Dict[str, Any]:
+    """子进程：解析一个字节区间，返回局部驻留表、边数组和局部度数"""
+    builder = GraphBuilder()
+    with open(csv_file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    rows = _parse_stream(io.BytesIO(data), builder)
+
+    degree = array('i', bytes(4 * len(builder.node_ids)))
+    for node in builder.edge_src:
+        degree[node] += 1
+    for node in builder.edge_dst:
+        degree[node] += 1
+
+    return {
+        'rows': rows,
+        'node_ids': builder.node_ids,
+        'relations': builder.relations,
+        'edge_src': builder.edge_src.tobytes(),
+        'edge_rel': builder.edge_rel.tobytes(),
+        'edge_dst': builder.edge_dst.tobytes(),
+        'degree': degree.tobytes(),
+    }
+
+
+@register_backend('parallel')
+def _ingest_parallel(csv_file_path: str, builder: GraphBuilder, progress: Optional[ProgressCallback] = None,
+                     limit: Optional[int] = None) -> int:
+    """
+    多进程分块解析
+    按行边界切分，要求字段内不含换行（三元组CSV满足该条件）
+    各块按文件顺序合并，节点编号与单线程解析完全一致
+    """
+    workers = GraphConfig.INGEST_WORKERS or os.cpu_count() or 1
+    total_bytes = _byte_limit(csv_file_path, limit)
+    ranges = _split_line_ranges(csv_file_path, workers * 2, total_bytes)
+
+    rows = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_parse_chunk, csv_file_path, start, end) for start, end in ranges]
+        # 按提交顺序合并，保证节点首次出现顺序不变
+        for (start, end), future in zip(ranges, futures):
+            chunk = future.result()
+            builder.merge_chunk(chunk)
+            rows += chunk['rows']
+            if progress is not None:
+                progress(rows, end, total_bytes)
+    return rows
+
+
+def _select_backend(csv_file_path: str, backend: Optional[str]) -> str:
+    """根据配置和文件大小选择后端（auto只在结果一致的fast和parallel之间选择）"""
+    backend = backend or GraphConfig.INGEST_BACKEND
+    if backend != 'auto':
+        if backend not in available_backends():
+            raise ValueError(f"不支持的解析后端: {backend}，可用: {', '.join(available_backends())}")
+        return backend
+    if (os.path.getsize(csv_file_path) >= GraphConfig.PARALLEL_MIN_BYTES and
+            (GraphConfig.INGEST_WORKERS or os.cpu_count() or 1) > 1):
+        return 'parallel'
+    return 'fast'
+
+
+def _drop_duplicates(builder: GraphBuilder) -> Tuple[int, List[Dict[str, Any]]]:
+    """按配置去除重复三元组，返回 (丢弃的边数, 重复项报告)"""
+    if not GraphConfig.DEDUPE_EDGES:
+        return 0, []
+    return builder.drop_duplicates(GraphConfig.DUPLICATE_REPORT_LIMIT)
+
+
+def ingest_csv(csv_file_path: str, backend: Optional[str] = None,
+               progress: Optional[ProgressCallback] = None) -> Tuple[CompactGraph, Dict[str, Any]]:
+    """
+    解析三元组CSV为紧凑图谱
+
+    Args:
+        csv_file_path: CSV文件路径
+        backend: 解析后端名称，默认取 GraphConfig.INGEST_BACKEND
+        progress: 进度回调
+
+    Returns:
+        (图谱, 导入统计)
+    """
+    backend = _select_backend(csv_file_path, backend)
+    start_time = time.time()
+    # 解析开始时的文件大小即本次消费到的偏移量（供追加导入续读）
+    total_bytes = os.path.getsize(csv_file_path)
+
+    builder = GraphBuilder()
+    # 各后端都只读取到该偏移，解析期间追加的行留给下一次追加导入
+    rows = _BACKENDS[backend](csv_file_path, builder, progress, total_bytes)
+    parse_time = time.time() - start_time
+    parsed_edges = len(builder)
+    duplicate_edges, duplicates = _drop_duplicates(builder)
+    graph = builder.build()
+    total_time = time.time() - start_time
+
+    stats = {
+        'backend': backend,
+        'rows': rows,
+        'edges': graph.edge_count,
+        'nodes': graph.node_count,
+        'skipped_rows': rows - parsed_edges,
+        'duplicate_edges': duplicate_edges,
+        'duplicates': duplicates,
+        'bytes': total_bytes,
+        'parse_seconds': round(parse_time, 3),
+        'total_seconds': round(total_time, 3),
+        'rows_per_sec': int(rows / parse_time) if parse_time > 0 else 0,
+    }
+    print(f"[解析] 后端 {backend}: {rows} 行, 解析 {parse_time:.2f}s "
+          f"({stats['rows_per_sec']} 行/秒), 构建邻接 {total_time - parse_time:.2f}s")
+    if duplicate_edges:
+        print(f"[解析] 丢弃重复三元组 {duplicate_edges} 条")
+    return graph, stats
+
+
+def ingest_csv_tail(csv_file_path: str, base_graph: CompactGraph, offset: int,
+                    progress: Optional[ProgressCallback] = None) -> Tuple[CompactGraph, Dict[str, Any]]:
+    """
+    追加导入：只解析offset之后新增的行，沿用原图谱的驻留表并累加度数；
+    去重和邻接数组只处理新增的边，代价与追加的行数相当（另有边数组的整段复制）
+    offset必须位于行首（原文件以换行结尾），由调用方保证之前的内容未被改写
+
+    Returns:
+        (包含新旧全部边的新图谱, 导入统计)，原图谱不被修改
+    """
+    start_time = time.time()
+    total_bytes = os.path.getsize(csv_file_path)
+    builder = GraphBuilder.from_graph(base_graph)
+    with open(csv_file_path, 'rb') as file:
+        file.seek(offset)
+        rows = _parse_stream(file, builder, progress, total_bytes - offset, limit=total_bytes - offset)
+    parse_time = time.time() - start_time
+    parsed_edges = len(builder) - base_graph.edge_count
+    # 原图谱已去重，只对新增的行查重（对照原图谱的边键集合），邻接数组在原图谱的基础上合并
+    duplicate_edges, duplicates = _drop_duplicates(builder)
+    graph = builder.build()
+    total_time = time.time() - start_time
+
+    new_edges = graph.edge_count - base_graph.edge_count
+    stats = {
+        'backend': 'append',
+        'rows': rows,
+        'edges': graph.edge_count,
+        'nodes': graph.node_count,
+        'new_edges': new_edges,
+        'new_nodes': graph.node_count - base_graph.node_count,
+        'skipped_rows': rows - parsed_edges,
+        'duplicate_edges': duplicate_edges,
+        'duplicates': duplicates,
+        'offset': offset,
+        'bytes': total_bytes,
+        'parse_seconds': round(parse_time, 3),
+        'total_seconds': round(total_time, 3),
+        'rows_per_sec': int(rows / parse_time) if parse_time > 0 else 0,
+    }
+    print(f"[解析] 追加导入: 从偏移 {offset} 读取 {total_bytes - offset} 字节, {rows} 行, "
+          f"新增节点 {stats['new_nodes']}, 新增边 {new_edges}, 耗时 {total_time:.2f}s")
+    return graph, stats
+
+
+def merge_ingest_stats(base: Optional[Dict[str, Any]], tail: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将追加导入的统计并入上一代的导入统计：行数和重复数累加，重复项报告按三元组合并，
+    边数、节点数和已消费字节数取追加后的值；最近一次追加的明细记录在 last_append
+
+    Returns:
+        新的统计字典，两个输入均不被修改
+    """
+    base = base or {}
+    merged = dict(base)
+    merged.update(
+        rows=base.get('rows', 0) + tail['rows'],
+        edges=tail['edges'],
+        nodes=tail['nodes'],
+        skipped_rows=base.get('skipped_rows', 0) + tail['skipped_rows'],
+        duplicate_edges=base.get('duplicate_edges', 0) + tail['duplicate_edges'],
+        bytes=tail['bytes'],
+        appends=base.get('appends', 0) + 1,
+        last_append={key: value for key, value in tail.items() if key != 'duplicates'},
+    )
+    merged.setdefault('backend', tail['backend'])
+
+    # 同一三元组在已导入部分和追加部分都有重复时合并计数，报告保持首次出现的顺序
+    report: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for item in list(base.get('duplicates') or []) + list(tail.get('duplicates') or []):
+        key = (item['source'], item['relation'], item['target'])
+        if key in report:
+            report[key]['duplicates'] += item['duplicates']
+        elif len(report) < GraphConfig.DUPLICATE_REPORT_LIMIT:
+            report[key] = dict(item)
+    merged['duplicates'] = list(report.values())
+    return merged
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='比较CSV解析后端的吞吐')
+    parser.add_argument('csv_file', help='三元组CSV文件')
+    parser.add_argument('--backends', default=','.join(available_backends()),
+                        help='逗号分隔的后端列表')
+    args = parser.parse_args(argv)
+
+    results = []
+    for backend in args.backends.split(','):
+        graph, stats = ingest_csv(args.csv_file, backend.strip())
+        results.append(stats)
+
+    print(f"\n{'后端':<10}{'行数':>12}{'边数':>12}{'重复':>10}{'解析(s)':>10}{'行/秒':>12}")
+    for stats in results:
+        print(f"{stats['backend']:<10}{stats['rows']:>12}{stats['edges']:>12}{stats['duplicate_edges']:>10}"
+              f"{stats['parse_seconds']:>10}{stats['rows_per_sec']:>12}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
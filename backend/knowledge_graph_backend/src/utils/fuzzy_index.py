@@ -0,0 +1,275 @@
+"""
+容错（模糊）实体搜索：SymSpell式删除索引
+加载时为每个标签（小写、只取前 prefix_length 个字）生成删除至多 max_distance 个字后的
+所有变体并建立倒排表；查询时生成查询的删除变体，取倒排表的并集作为候选，
+再按长度差过滤，用有界编辑距离（含相邻交换）逐个校验。
+不需要对全部标签计算编辑距离，候选数只与相近标签的数量有关
+
+有numpy时变体以64位多项式哈希为键，存为CSR数组（有序键 + 偏移 + 节点数组），构建过程向量化；
+否则使用 变体字符串 -> array('i') 字典。哈希冲突只会多出候选，由编辑距离校验排除
+"""
+from array import array
+from collections import defaultdict
+from itertools import combinations
+from typing import List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时使用字典倒排表
+    np = None
+
+# 追加导入产生的分段超过该数量时合并重建
+_MAX_SEGMENTS = 8
+
+_HASH_MUL = 0x100000001B3
+_HASH_MASK = (1 << 64) - 1
+
+
+def _variant_key(text: str) -> int:
+    """变体字符串的64位哈希（与 _ArraySegment 中的向量化计算一致）"""
+    key = 0
+    for char in text:
+        key = (key * _HASH_MUL + ord(char) + 1) & _HASH_MASK
+    return key
+
+
+def _deletes(text: str, max_distance: int) -> Set[str]:
+    """删除至多max_distance个字后的所有非空变体（含原串）"""
+    variants = set()
+    for level in _deletes_by_count(text, max_distance):
+        variants |= level
+    return variants
+
+
+def _deletes_by_count(text: str, max_distance: int) -> List[Set[str]]:
+    """按删除字数分组的变体：第k组为恰好删除k个字得到、且删除更少字时得不到的变体"""
+    levels = [{text}]
+    seen = {text}
+    for _ in range(max_distance):
+        frontier = {word[:i] + word[i + 1:] for word in levels[-1] if len(word) > 1 for i in range(len(word))}
+        frontier -= seen
+        seen |= frontier
+        levels.append(frontier)
+    return levels
+
+
+def bounded_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    编辑距离（插入、删除、替换、相邻交换各计1），超过max_distance时提前返回max_distance + 1
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def _batch_distances(query: str, texts: List[str], max_distance: int):
+    """
+    查询与一组字符串的编辑距离（与 bounded_distance 相同的定义，numpy按查询逐行向量化）
+    每行先算替换、删除、交换，插入项由 cur[j] = j + min(tmp[k] - k, k <= j) 的累计最小值得到
+
+    Returns:
+        numpy数组，超过max_distance的位置为 max_distance + 1
+    """
+    width = max(map(len, texts)) if texts else 0
+    # 补齐位置编码为0，不会与查询中的字相等
+    codes = np.frombuffer(''.join(text.ljust(width, '\x00') for text in texts).encode('utf-32-le'),
+                          dtype=np.uint32).reshape(len(texts), width).astype(np.int64)
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    columns = np.arange(width + 1)
+    previous2 = None
+    previous = np.broadcast_to(columns, (len(texts), width + 1)).copy()
+    for i, char in enumerate(query, 1):
+        mismatch = codes != ord(char)
+        row = np.empty_like(previous)
+        row[:, 0] = i
+        row[:, 1:] = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + mismatch)
+        if previous2 is not None and width > 1:
+            swap = (codes[:, :-1] == ord(char)) & (codes[:, 1:] == ord(query[i - 2]))
+            row[:, 2:] = np.where(swap, np.minimum(row[:, 2:], previous2[:, :-2] + 1), row[:, 2:])
+        row = columns + np.minimum.accumulate(row - columns, axis=1)
+        previous2, previous = previous, row
+    distances = previous[np.arange(len(texts)), lengths]
+    return np.minimum(distances, max_distance + 1)
+
+
+class _ArraySegment:
+    """numpy CSR删除变体倒排表，覆盖节点区间 [start, end)"""
+
+    def __init__(self, labels: Sequence[str], start: int, max_distance: int, prefix_length: int):
+        count = len(labels) - start
+        prefixes = [labels[node].lower()[:prefix_length] for node in range(start, len(labels))]
+        lengths = np.fromiter(map(len, prefixes), dtype=np.int64, count=count)
+        # 前缀补齐到相同长度后按列处理；补齐位置的编码为0，计算哈希时跳过
+        padded = ''.join(prefix.ljust(prefix_length, '\x00') for prefix in prefixes)
+        codes = np.frombuffer(padded.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        codes = codes.reshape(count, prefix_length) if count else np.zeros((0, prefix_length), dtype=np.uint64)
+        codes = (codes + np.uint64(1)) * (np.arange(prefix_length) < lengths[:, None])
+        nodes = np.arange(start, len(labels), dtype=np.int32)
+
+        all_keys, all_nodes, all_removed = [], [], []
+        multiplier = np.uint64(_HASH_MUL)
+        for removed in range(max_distance + 1):
+            for columns in combinations(range(prefix_length), removed):
+                keys = np.zeros(count, dtype=np.uint64)
+                for column in range(prefix_length):
+                    if column not in columns:
+                        value = codes[:, column]
+                        keys = np.where(value > 0, keys * multiplier + value, keys)
+                # 实际删除的字数（删除位置落在补齐部分时与删除更少字的变体相同）；不保留空变体
+                deleted = (np.asarray(columns, dtype=np.int64)[None, :] < lengths[:, None]).sum(axis=1) \
+                    if columns else np.zeros(count, dtype=np.int64)
+                keep = lengths > deleted
+                all_keys.append(keys[keep])
+                all_nodes.append(nodes[keep])
+                all_removed.append(deleted[keep].astype(np.uint8))
+
+        keys = np.concatenate(all_keys) if all_keys else np.zeros(0, dtype=np.uint64)
+        nodes = np.concatenate(all_nodes) if all_nodes else np.zeros(0, dtype=np.int32)
+        removed = np.concatenate(all_removed) if all_removed else np.zeros(0, dtype=np.uint8)
+        # 同一标签的同一变体只保留删除字数最少的一条
+        order = np.lexsort((removed, nodes, keys))
+        keys, nodes, removed = keys[order], nodes[order], removed[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (nodes[1:] != nodes[:-1])
+        keys, self.nodes, self.removed = keys[distinct], nodes[distinct], removed[distinct]
+
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else \
+            np.zeros(0, dtype=np.int64)
+        self.keys = keys[starts]
+        self.offsets = np.append(starts, len(keys))
+        # 完整标签长度，用于按长度差过滤候选
+        self.start = start
+        self.lengths = np.fromiter((len(labels[node]) for node in range(start, len(labels))),
+                                   dtype=np.int32, count=count)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def candidates(self, variants: Set[str], query_length: int, max_distance: int) -> List[int]:
+        keys = np.array([_variant_key(variant) for variant in variants], dtype=np.uint64)
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+        entries = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in positions])
+        # 标签一侧删除的字数也不能超过允许的距离
+        nodes = np.unique(self.nodes[entries[self.removed[entries] <= max_distance]])
+        close = np.abs(self.lengths[nodes - self.start] - query_length) <= max_distance
+        return nodes[close].tolist()
+
+
+class _DictSegment:
+    """纯Python删除变体倒排表，覆盖节点区间 [start, end)"""
+
+    def __init__(self, labels: Sequence[str], start: int, max_distance: int, prefix_length: int):
+        # 每个删除字数一张倒排表，查询时只用不超过允许距离的几张
+        postings = [defaultdict(list) for _ in range(max_distance + 1)]
+        for node in range(start, len(labels)):
+            for removed, variants in enumerate(_deletes_by_count(labels[node].lower()[:prefix_length], max_distance)):
+                for variant in variants:
+                    postings[removed][variant].append(node)
+        self._postings = [{variant: array('i', nodes) for variant, nodes in level.items()} for level in postings]
+        self._labels = labels
+
+    def __len__(self) -> int:
+        return sum(len(level) for level in self._postings)
+
+    def candidates(self, variants: Set[str], query_length: int, max_distance: int) -> List[int]:
+        nodes = set()
+        for level in self._postings[:max_distance + 1]:
+            for variant in variants:
+                nodes.update(level.get(variant, ()))
+        labels = self._labels
+        return [node for node in nodes if abs(len(labels[node]) - query_length) <= max_distance]
+
+
+class FuzzyIndex:
+    """
+    不可变的删除变体索引
+    追加节点时为新节点单独建立一个分段并返回新索引（原索引保持不变）
+    """
+
+    def __init__(self, segments: List, size: int, max_distance: int, prefix_length: int):
+        self._segments = segments
+        self.size = size
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+
+    @classmethod
+    def build(cls, labels: Sequence[str], max_distance: int = 2, prefix_length: int = 6) -> 'FuzzyIndex':
+        """为全部标签建立索引，下标即节点整数ID"""
+        return cls([cls._segment(labels, 0, max_distance, prefix_length)], len(labels),
+                   max_distance, prefix_length)
+
+    @staticmethod
+    def _segment(labels: Sequence[str], start: int, max_distance: int, prefix_length: int):
+        segment_class = _ArraySegment if np is not None else _DictSegment
+        return segment_class(labels, start, max_distance, prefix_length)
+
+    def extend(self, labels: Sequence[str]) -> 'FuzzyIndex':
+        """加入编号不小于 self.size 的新标签"""
+        if len(labels) <= self.size:
+            return self
+        if len(self._segments) >= _MAX_SEGMENTS:
+            return FuzzyIndex.build(labels, self.max_distance, self.prefix_length)
+        segment = self._segment(labels, self.size, self.max_distance, self.prefix_length)
+        return FuzzyIndex(self._segments + [segment], len(labels), self.max_distance, self.prefix_length)
+
+    @property
+    def variant_count(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def search(self, query: str, labels: Sequence[str], rank_positions: Sequence[int],
+               limit: int = 10, max_distance: Optional[int] = None,
+               max_candidates: int = 2000) -> List[Tuple[int, int]]:
+        """
+        与查询的编辑距离不超过max_distance的标签（不区分大小写）
+
+        Args:
+            labels: 节点标签表（用于校验候选）
+            rank_positions: 节点的排名位置，距离相同时排名靠前的优先；候选过多时只校验排名靠前的
+            max_distance: 允许的编辑距离，默认为建索引时的距离（不能超过它）
+            max_candidates: 最多校验的候选数
+
+        Returns:
+            [(节点整数ID, 编辑距离)]，按距离、排名排列
+        """
+        query = query.lower()
+        distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if not query or distance <= 0:
+            return []
+        variants = _deletes(query[:self.prefix_length], distance)
+
+        candidates = []
+        for segment in self._segments:
+            candidates.extend(segment.candidates(variants, len(query), distance))
+        if len(candidates) > max_candidates:
+            candidates.sort(key=rank_positions.__getitem__)
+            candidates = candidates[:max_candidates]
+
+        if np is not None and candidates:
+            distances = _batch_distances(query, [labels[node].lower() for node in candidates], distance).tolist()
+        else:
+            distances = [bounded_distance(query, labels[node].lower(), distance) for node in candidates]
+        matches = sorted((node_distance, rank_positions[node], node)
+                         for node, node_distance in zip(candidates, distances) if node_distance <= distance)
+        return [(node, node_distance) for node_distance, _, node in matches[:limit]]
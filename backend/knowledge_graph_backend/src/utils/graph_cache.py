@@ -2,23 +2,124 @@
 知识图谱缓存和优化模块
 解决性能瓶颈，大幅提升加载和搜索速度
 """
-import csv
 import os
 import time
 import json
 import hashlib
+import threading
 from collections import defaultdict
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+from src.config.graph_config import GraphConfig
+from src.utils.bm25_index import bm25_manager
+from src.utils.csv_ingest import ingest_csv, ingest_csv_tail, merge_ingest_stats
+from src.utils.graph_snapshot import get_snapshot_path, load_snapshot
+from src.utils.fuzzy_index import FuzzyIndex
+from src.utils.graph_store import CompactGraph, GraphBuilder
+from src.utils.lru_cache import LRUCache
+from src.utils.ngram_index import NgramIndex
+from src.utils.suggest_index import SuggestIndex
+from src.utils.vector_index import vector_manager
+
+class GraphGeneration:
+    """
+    一代图谱数据：紧凑图谱、兼容字典和来源信息在旁路一起构建，
+    通过一次引用替换整体发布；发布后不再修改，读者取得引用后无需加锁
+    
+    搜索索引在发布后由后台线程构建（快照启动时图谱立即可用），
+    首次读取 search_index 时若尚未构建完成则等待
+    """
+    
+    __slots__ = ('store', 'graph', '_search_index', '_index_ready', '_index_error', 'version', 'version_id',
+                 'csv_file_path', 'file_hash', 'consumed_bytes', 'content_fingerprint', 'ingest_stats',
+                 'append_lineage', 'timestamp')
+    
+    # append_lineage 最多保留的祖先代数
+    APPEND_LINEAGE_LIMIT = 8
+    
+    def __init__(self, store: CompactGraph, search_index: Optional[Dict[str, Any]], version: int,
+                 csv_file_path: str, file_hash: str, consumed_bytes: int,
+                 content_fingerprint: str, ingest_stats: Optional[Dict[str, Any]],
+                 append_lineage: Tuple[Tuple[str, int, int], ...] = ()):
+        self.store = store
+        self.graph = store.to_graph_data(version)
+        self._search_index = search_index
+        self._index_ready = threading.Event()
+        self._index_error: Optional[str] = None
+        if search_index is not None:
+            self._index_ready.set()
+        self.version = version
+        self.csv_file_path = csv_file_path
+        self.file_hash = file_hash
+        # 已消费的CSV字节数及该前缀的内容指纹，用于判断文件是否只是被追加
+        self.consumed_bytes = consumed_bytes
+        self.content_fingerprint = content_fingerprint
+        self.ingest_stats = ingest_stats
+        # 本代由哪些更早的代只追加行得到：[(版本ID, 节点数, 边数)]，越近越靠后；
+        # 这些代的实体和边是本代的前缀，派生索引可据此增量更新
+        self.append_lineage = append_lineage
+        self.timestamp = time.time()
+        # 与进程无关的版本标识：由来源内容和导入配置决定，重启后相同数据得到相同标识（用于ETag）
+        self.version_id = hashlib.blake2b(
+            f"{file_hash}:{content_fingerprint}:{consumed_bytes}:{store.node_count}:{store.edge_count}:"
+            f"{GraphConfig.DEDUPE_EDGES}".encode('utf-8'),
+            digest_size=8
+        ).hexdigest()
+    
+    def build_search_index(self, build: Callable[[], Dict[str, Any]]) -> None:
+        """在后台线程中构建搜索索引（须在发布前调用一次）"""
+        def run():
+            try:
+                self._search_index = build()
+            except Exception as e:
+                self._index_error = str(e)
+                print(f"[错误] 构建搜索索引失败: 版本 {self.version}, {str(e)}")
+            finally:
+                self._index_ready.set()
+        threading.Thread(target=run, name='graph-search-index', daemon=True).start()
+    
+    @property
+    def search_index_ready(self) -> bool:
+        return self._index_ready.is_set()
+    
+    @property
+    def search_index(self) -> Dict[str, Any]:
+        """搜索索引，后台构建尚未完成时等待"""
+        self._index_ready.wait()
+        if self._index_error is not None:
+            raise RuntimeError(f"搜索索引构建失败: {self._index_error}")
+        return self._search_index
+
 
 class KnowledgeGraphCache:
-    """知识图谱缓存管理器"""
+    """
+    知识图谱缓存管理器
+
+    进程内唯一的图谱存储：图谱路由和AI助手共用同一份解析结果、
+    同一套索引和同一个版本号。重新加载时新一代在旁路构建完成后
+    原子替换（RCU），重建期间读者始终能拿到上一代完整数据
+    """
+    
+    # 计算内容指纹时每次读取的块大小
+    FINGERPRINT_CHUNK = 1024 * 1024
+    # 快照启动时的抽样校验：均匀分布（含首尾）的块数和每块字节数
+    SAMPLE_BLOCKS = 16
+    SAMPLE_BLOCK_SIZE = 64 * 1024
     
     def __init__(self):
-        self._graph_cache: Optional[Dict[str, Any]] = None
-        self._search_index: Optional[Dict[str, Any]] = None
-        self._cache_timestamp: Optional[float] = None
-        self._file_hash: Optional[str] = None
-        self._csv_file_path: Optional[str] = None
+        # 当前发布的一代数据，只通过整体替换更新
+        self._generation: Optional[GraphGeneration] = None
+        # 最近一次校验通过的文件修改时间和大小（仅用于跳过重复校验）
+        self._file_stat: Optional[Tuple[float, int]] = None
+        self._version: int = 0
+        # clear_cache() 之后下一次加载强制全量重建
+        self._reload_requested = False
+        # 防止多个蓝图并发触发重复解析
+        self._load_lock = threading.RLock()
+        # 新一代数据发布后的回调（如后台布局计算），参数为新发布的GraphGeneration
+        self._publish_listeners: List[Callable[[GraphGeneration], None]] = []
+        # 搜索结果缓存，键包含图谱版本ID；新一代数据发布时整体清空
+        self._search_cache = LRUCache(GraphConfig.SEARCH_CACHE_SIZE, GraphConfig.SEARCH_CACHE_TTL)
         
     def _get_file_hash(self, file_path: str) -> str:
         """获取文件哈希值，用于检测文件变化"""
@@ -32,277 +133,678 @@ class KnowledgeGraphCache:
         except Exception:
             return ""
     
+    def _hash_prefix(self, file_path: str, length: int):
+        """
+        文件前length字节的blake2b哈希对象（读取全部前缀），文件短于length时返回None
+        返回的哈希对象可继续update追加部分，得到更长前缀的指纹而无需重读
+        """
+        try:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(file_path, 'rb') as f:
+                remaining = length
+                while remaining > 0:
+                    data = f.read(min(self.FINGERPRINT_CHUNK, remaining))
+                    if not data:  # 文件已被截断
+                        return None
+                    hasher.update(data)
+                    remaining -= len(data)
+            return hasher
+        except OSError:
+            return None
+    
+    def _get_content_fingerprint(self, file_path: str, length: int) -> str:
+        """文件前length字节的内容指纹，用于判断已导入部分是否被改写（同长度改写同样能发现）"""
+        hasher = self._hash_prefix(file_path, length)
+        return hasher.hexdigest() if hasher is not None else ""
+    
+    def _extend_fingerprint(self, hasher, file_path: str, start: int, end: int) -> str:
+        """在已校验前缀的哈希状态上追加 [start, end) 字节，得到前end字节的内容指纹"""
+        try:
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = f.read(min(self.FINGERPRINT_CHUNK, remaining))
+                    if not data:
+                        return ""
+                    hasher.update(data)
+                    remaining -= len(data)
+            return hasher.hexdigest()
+        except OSError:
+            return ""
+    
+    def _get_file_stat(self, file_path: str) -> Optional[Tuple[float, int]]:
+        """获取文件修改时间和大小"""
+        try:
+            stat = os.stat(file_path)
+            return (stat.st_mtime, stat.st_size)
+        except OSError:
+            return None
+    
+    def _get_sample_fingerprint(self, file_path: str, size: int) -> str:
+        """文件大小和均匀分布的若干块内容（含首尾）的哈希，读取量与文件大小无关"""
+        try:
+            hasher = hashlib.blake2b(str(size).encode('utf-8'), digest_size=16)
+            block = self.SAMPLE_BLOCK_SIZE
+            count = self.SAMPLE_BLOCKS
+            with open(file_path, 'rb') as f:
+                if size <= block * count:
+                    hasher.update(f.read(size))
+                else:
+                    for i in range(count):
+                        f.seek((size - block) * i // (count - 1))
+                        hasher.update(f.read(block))
+            return hasher.hexdigest()
+        except OSError:
+            return ""
+    
+    def _get_source_info(self, file_path: str) -> Dict[str, Any]:
+        """
+        获取CSV文件的快速指纹（大小、修改时间和抽样块哈希），用于启动时校验快照是否由该文件生成；
+        全部内容的指纹由快照记录，启动后在后台核对（见 _verify_snapshot_source）
+        """
+        stat = self._get_file_stat(file_path)
+        mtime, size = stat if stat else (None, -1)
+        return {
+            'path': os.path.abspath(file_path),
+            'size': size,
+            'mtime': mtime,
+            'hash': self._get_file_hash(file_path),
+            'sample': self._get_sample_fingerprint(file_path, size) if size >= 0 else "",
+            'dedupe': GraphConfig.DEDUPE_EDGES
+        }
+    
     def _is_cache_valid(self, file_path: str) -> bool:
         """检查缓存是否有效"""
-        if (self._graph_cache is None or 
-            self._file_hash is None or 
-            self._csv_file_path != file_path):
+        generation = self._generation
+        if (generation is None or 
+            self._reload_requested or 
+            generation.csv_file_path != file_path):
+            return False
+        
+        # 修改时间和大小未变化时无需重新计算指纹（每个请求都会调用）
+        current_stat = self._get_file_stat(file_path)
+        if current_stat is not None and current_stat == self._file_stat:
+            return True
+        
+        # 大小变化（如追加了新行）一定需要重新加载
+        if current_stat is None or current_stat[1] != generation.consumed_bytes:
             return False
         
-        current_hash = self._get_file_hash(file_path)
-        return current_hash == self._file_hash
+        # 只是修改时间变化（如touch）时比较内容指纹
+        if self._get_content_fingerprint(file_path, generation.consumed_bytes) == generation.content_fingerprint:
+            self._file_stat = current_stat
+            return True
+        return False
+    
+    def _can_load_appended(self, file_path: str):
+        """
+        文件是否只是在已消费部分之后追加了新行（此时只需解析新增的尾部）
+        
+        Returns:
+            已校验前缀的哈希对象（供增量加载继续计算新指纹）；不能增量加载时返回None
+        """
+        generation = self._generation
+        if (generation is None or
+                generation.csv_file_path != file_path or
+                not generation.consumed_bytes or
+                not generation.content_fingerprint):
+            return None
+        
+        current_stat = self._get_file_stat(file_path)
+        if current_stat is None or current_stat[1] <= generation.consumed_bytes:
+            return None
+        
+        try:
+            # 上次消费的部分必须以换行结尾，否则最后一行可能被续写
+            with open(file_path, 'rb') as f:
+                f.seek(generation.consumed_bytes - 1)
+                if f.read(1) != b'\n':
+                    print("[加载] 上次读取的末行不完整，执行全量重建")
+                    return None
+        except OSError:
+            return None
+        
+        hasher = self._hash_prefix(file_path, generation.consumed_bytes)
+        if hasher is None or hasher.hexdigest() != generation.content_fingerprint:
+            print("[加载] 已导入部分的内容发生变化，执行全量重建")
+            return None
+        return hasher
     
-    def load_graph(self, csv_file_path: str, force_reload: bool = False) -> Dict[str, Any]:
+    def load_graph(self, csv_file_path: str, force_reload: bool = False,
+                   progress: Optional[Callable[[float, Optional[str]], None]] = None) -> Dict[str, Any]:
         """
         加载知识图谱，使用智能缓存
         
         Args:
             csv_file_path: CSV文件路径
             force_reload: 是否强制重新加载
+            progress: 进度回调 progress(0~1, 阶段说明)，用于后台预热
             
         Returns:
             包含nodes和edges的字典
         """
         # 检查缓存
         if not force_reload and self._is_cache_valid(csv_file_path):
-            print(f"[缓存] 使用缓存的知识图谱数据")
-            return self._graph_cache
+            return self._generation.graph
         
+        with self._load_lock:
+            # 等待锁期间可能已由其他线程加载完成
+            if not force_reload and self._is_cache_valid(csv_file_path):
+                return self._generation.graph
+            if not force_reload and not self._reload_requested:
+                hasher = self._can_load_appended(csv_file_path)
+                if hasher is not None:
+                    return self._load_appended_locked(csv_file_path, hasher, progress)
+            return self._load_graph_locked(csv_file_path, progress)
+    
+    def _publish(self, generation: GraphGeneration) -> None:
+        """发布新一代数据：单次引用赋值，读者要么看到旧代要么看到新代"""
+        stat = self._get_file_stat(generation.csv_file_path)
+        self._generation = generation
+        self._version = generation.version
+        self._reload_requested = False
+        self._search_cache.clear()
+        # 解析期间文件又被追加时不记录stat，下次请求会触发增量加载
+        self._file_stat = stat if stat is not None and stat[1] == generation.consumed_bytes else None
+        for listener in list(self._publish_listeners):
+            try:
+                listener(generation)
+            except Exception as e:
+                print(f"[警告] 发布回调执行失败: {e}")
+    
+    def add_publish_listener(self, listener: Callable[[GraphGeneration], None]) -> None:
+        """注册新一代数据发布后的回调；已有数据时立即以当前一代调用一次"""
+        self._publish_listeners.append(listener)
+        if self._generation is not None:
+            listener(self._generation)
+    
+    def _load_graph_locked(self, csv_file_path: str,
+                           progress: Optional[Callable[[float, Optional[str]], None]] = None,
+                           use_snapshot: bool = True) -> Dict[str, Any]:
+        """在持有加载锁的情况下读取快照或解析CSV（旁路构建，完成后发布；搜索索引随后在后台构建）"""
         print(f"[加载] 开始加载知识图谱: {csv_file_path}")
         start_time = time.time()
+        report = progress or (lambda fraction, message=None: None)
         
         try:
-            # 快速解析CSV
-            graph_data = self._parse_csv_optimized(csv_file_path)
-            
-            # 构建搜索索引
-            self._build_search_index(graph_data)
+            # 优先使用有效的二进制快照，否则解析CSV（解析占加载进度的95%）
+            report(0.0, '读取快照')
+            source_info = self._get_source_info(csv_file_path)
+            graph, stats, fingerprint = None, None, None
+            if use_snapshot:
+                graph, stats, fingerprint = self._load_from_snapshot(csv_file_path, source_info)
+            from_snapshot = graph is not None
+            if from_snapshot:
+                # 快照记录的全部内容指纹，发布后在后台核对
+                consumed_bytes = source_info['size']
+            else:
+                graph, stats = self._parse_csv_optimized(
+                    csv_file_path,
+                    progress=lambda rows, done, total: report(0.95 * done / total if total else 0.0,
+                                                              f'解析CSV: {rows} 行')
+                )
+                consumed_bytes = stats['bytes']
+                fingerprint = self._get_content_fingerprint(csv_file_path, consumed_bytes)
             
-            # 更新缓存
-            self._graph_cache = graph_data
-            self._csv_file_path = csv_file_path
-            self._file_hash = self._get_file_hash(csv_file_path)
-            self._cache_timestamp = time.time()
+            # 发布新一代缓存，搜索索引在后台构建，图谱读取无需等待
+            generation = GraphGeneration(
+                graph, None, self._version + 1, csv_file_path, source_info['hash'],
+                consumed_bytes, fingerprint, stats
+            )
+            generation.build_search_index(lambda: self._build_search_index(graph))
+            self._publish(generation)
+            if from_snapshot:
+                self._verify_snapshot_source(generation)
             
             end_time = time.time()
             print(f"[加载] 完成! 耗时 {end_time - start_time:.2f}s, "
-                  f"节点: {len(graph_data['nodes'])}, 边: {len(graph_data['edges'])}")
+                  f"节点: {graph.node_count}, 边: {graph.edge_count}, "
+                  f"版本: {self._version}")
+            report(1.0, '加载完成')
             
-            return graph_data
+            return self._generation.graph
             
         except Exception as e:
             print(f"[错误] 加载知识图谱失败: {str(e)}")
-            return {'nodes': [], 'edges': []}
+            # 重建失败时继续提供上一代数据
+            generation = self._generation
+            return generation.graph if generation is not None else CompactGraph.empty().to_graph_data()
     
-    def _parse_csv_optimized(self, csv_file_path: str) -> Dict[str, Any]:
+    def _load_appended_locked(self, csv_file_path: str, hasher,
+                              progress: Optional[Callable[[float, Optional[str]], None]] = None) -> Dict[str, Any]:
         """
-        优化的CSV解析器
-        - 单次读取
-        - 批量处理
-        - 内存优化
+        增量加载：只解析追加的尾部，并入度数和搜索索引；失败时回退到全量重建
+        hasher 为已校验前缀的哈希状态，新指纹只需再读入追加的部分
         """
-        nodes_dict = {}
-        edges = []
-        node_connections = defaultdict(int)
-        
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            row_count = 0
+        report = progress or (lambda fraction, message=None: None)
+        base = self._generation
+        base_graph = base.store
+        try:
+            start_time = time.time()
+            graph, stats = ingest_csv_tail(
+                csv_file_path, base_graph, base.consumed_bytes,
+                progress=lambda rows, done, total: report(0.95 * done / total if total else 0.0,
+                                                          f'解析追加行: {rows} 行')
+            )
             
-            for row in reader:
-                if len(row) >= 3:
-                    source = row[0].strip()
-                    relation = row[1].strip()
-                    target = row[2].strip()
-                    
-                    if not source or not target:  # 跳过空值
-                        continue
-                    
-                    # 统计连接数
-                    node_connections[source] += 1
-                    node_connections[target] += 1
-                    
-                    # 存储边信息
-                    edges.append({
-                        'source': source,
-                        'target': target,
-                        'relation': relation,
-                        'label': relation
-                    })
-                    
-                    row_count += 1
-                    
-                    # 进度显示
-                    if row_count % 50000 == 0:
-                        print(f"[解析] 已处理 {row_count} 行")
-        
-        # 构建节点字典
-        for edge in edges:
-            source, target = edge['source'], edge['target']
+            generation = GraphGeneration(
+                graph, None, self._version + 1, csv_file_path, base.file_hash,
+                stats['bytes'], self._extend_fingerprint(hasher, csv_file_path, base.consumed_bytes, stats['bytes']),
+                merge_ingest_stats(base.ingest_stats, stats),
+                (base.append_lineage + ((base.version_id, base_graph.node_count, base_graph.edge_count),)
+                 )[-GraphGeneration.APPEND_LINEAGE_LIMIT:]
+            )
             
-            if source not in nodes_dict:
-                nodes_dict[source] = {
-                    'id': source,
-                    'label': source,
-                    'type': 'entity',
-                    'connections': node_connections[source]
-                }
+            def build_index() -> Dict[str, Any]:
+                # 在上一代索引的基础上增量更新（上一代索引仍在构建时先等待其完成）
+                try:
+                    return self._extend_search_index(base.search_index, graph,
+                                                     base_graph.node_count, base_graph.edge_count)
+                except Exception as e:
+                    print(f"[错误] 增量更新搜索索引失败，按新图谱重建: {str(e)}")
+                    return self._build_search_index(graph)
             
-            if target not in nodes_dict:
-                nodes_dict[target] = {
-                    'id': target,
-                    'label': target,
-                    'type': 'entity',
-                    'connections': node_connections[target]
-                }
+            generation.build_search_index(build_index)
+            self._publish(generation)
+            
+            print(f"[加载] 增量加载完成! 耗时 {time.time() - start_time:.2f}s, "
+                  f"节点: {graph.node_count}, 边: {graph.edge_count}, "
+                  f"版本: {self._version}")
+            report(1.0, '加载完成')
+            return self._generation.graph
         
-        return {
-            'nodes': list(nodes_dict.values()),
-            'edges': edges
-        }
+        except Exception as e:
+            print(f"[错误] 增量加载失败，执行全量重建: {str(e)}")
+            return self._load_graph_locked(csv_file_path, progress)
     
-    def _build_search_index(self, graph_data: Dict[str, Any]) -> None:
-        """构建搜索索引"""
+    def _load_from_snapshot(self, csv_file_path: str, source_info: Dict[str, Any]
+                            ) -> Tuple[Optional[CompactGraph], Optional[Dict[str, Any]], Optional[str]]:
+        """
+        从与CSV匹配的二进制快照加载图谱、导入统计和快照记录的内容指纹，
+        快照不存在或已过期时返回(None, None, None)
+        """
+        snapshot_path = get_snapshot_path(csv_file_path)
+        snapshot = load_snapshot(snapshot_path, source_info)
+        if snapshot is None:
+            return None, None, None
+        
         start_time = time.time()
-        print(f"[索引] 开始构建搜索索引...")
+        graph = snapshot.to_compact_graph()
+        print(f"[快照] 已从快照加载: {snapshot_path}, 耗时 {time.time() - start_time:.3f}s")
+        return graph, snapshot.header.get('ingest') or None, snapshot.header['source']['fingerprint']
+    
+    def _verify_snapshot_source(self, generation: GraphGeneration) -> None:
+        """
+        快照只按大小、修改时间和抽样块校验后即被使用；在后台计算CSV全部内容的指纹，
+        与快照记录的不一致时（抽样未覆盖的位置被改写）不再使用快照，重新解析CSV
+        """
+        def run():
+            fingerprint = self._get_content_fingerprint(generation.csv_file_path, generation.consumed_bytes)
+            if fingerprint == generation.content_fingerprint:
+                return
+            print(f"[快照] 快照与CSV内容不一致，重新解析CSV（请重新生成快照）: {generation.csv_file_path}")
+            with self._load_lock:
+                if self._generation is generation:
+                    self._load_graph_locked(generation.csv_file_path, use_snapshot=False)
+        threading.Thread(target=run, name='graph-snapshot-verify', daemon=True).start()
+    
+    def _parse_csv_optimized(self, csv_file_path: str, progress=None) -> Tuple[CompactGraph, Dict[str, Any]]:
+        """
+        优化的CSV解析器
+        - 可插拔解析后端（快速路径 / pyarrow / 多进程分块），见 csv_ingest
+        - 节点ID和关系类型驻留为整数
+        - 边和邻接保存为紧凑数组，不再为每条边创建字典
         
-        # 初始化索引结构
-        self._search_index = {
-            'entities': {},      # 实体ID -> 实体信息
+        Returns:
+            (图谱, 导入统计)
+        """
+        return ingest_csv(csv_file_path, progress=progress)
+    
+    # 医疗同义词映射
+    MEDICAL_SYNONYMS = {
+        '感冒': ['感冒', '普通感冒', '上呼吸道感染'],
+        '发烧': ['发热', '发烧', '体温升高'],
+        '咳嗽': ['咳嗽', '咳痰', '干咳'],
+        '头痛': ['头痛', '头疼', '偏头痛']
+    }
+    DISEASE_KEYWORDS = ['感冒', '发烧', '咳嗽', '头痛', '高血压', '糖尿病']
+    
+    @staticmethod
+    def _new_search_index() -> Dict[str, Any]:
+        """空的搜索索引结构"""
+        return {
             'exact': {},         # 精确匹配
-            'prefix': defaultdict(list),  # 前缀索引
             'token': defaultdict(list),   # 词语索引
-            'relations': defaultdict(list),  # 关系索引: 疾病ID -> [(关系, 目标ID)]
             'disease_relations': defaultdict(list),  # 疾病名称 -> [(关系, 目标ID)]
-            'relation_targets': defaultdict(list),   # 关系类型 -> [(疾病ID, 目标ID)]
         }
+    
+    def _build_search_index(self, graph: CompactGraph) -> Dict[str, Any]:
+        """构建搜索索引（实体信息和关系邻接直接取自紧凑存储，不再复制）"""
+        start_time = time.time()
+        print(f"[索引] 开始构建搜索索引...")
         
-        # 医疗同义词映射
-        medical_synonyms = {
-            '感冒': ['感冒', '普通感冒', '上呼吸道感染'],
-            '发烧': ['发热', '发烧', '体温升高'],
-            '咳嗽': ['咳嗽', '咳痰', '干咳'],
-            '头痛': ['头痛', '头疼', '偏头痛']
-        }
+        search_index = self._new_search_index()
+        self._index_nodes(search_index, graph, 0)
+        # 小写标签表（与节点整数ID对齐），供按标签逐个扫描的搜索共用，不必每次查询重新转换
+        search_index['labels_lower'] = [label.lower() for label in graph.node_ids]
+        # 子串搜索使用的字符n-gram倒排索引
+        search_index['ngram'] = NgramIndex.build(graph.node_ids)
+        # 前缀补全使用的有序标签数组（重前缀预存排名最高的实体）
+        search_index['suggest'] = SuggestIndex.build(graph.node_ids, graph.rank_positions,
+                                                     GraphConfig.SUGGEST_TOP_K, GraphConfig.SUGGEST_SCAN_MAX)
+        # 容错搜索使用的删除变体索引
+        search_index['fuzzy'] = FuzzyIndex.build(graph.node_ids, GraphConfig.FUZZY_MAX_DISTANCE,
+                                                 GraphConfig.FUZZY_PREFIX_LENGTH)
+        
+        end_time = time.time()
+        print(f"[索引] 索引构建完成, 耗时 {end_time - start_time:.2f}s")
+        print(f"[索引] 实体数量: {graph.node_count}")
+        print(f"[索引] 关系类型数量: {len(graph.relations)}")
+        print(f"[索引] 疾病关系数量: {len(search_index['disease_relations'])}")
+        print(f"[索引] n-gram数量: {search_index['ngram'].gram_count}")
+        print(f"[索引] 重前缀数量: {search_index['suggest'].heavy_prefix_count}")
+        print(f"[索引] 删除变体数量: {search_index['fuzzy'].variant_count}")
+        return search_index
+    
+    def _extend_search_index(self, base_index: Dict[str, Any], graph: CompactGraph,
+                             node_start: int, edge_start: int) -> Dict[str, Any]:
+        """
+        追加导入后生成新一代搜索索引（写时复制，上一代索引保持不变）
+        新节点按全量构建的规则加入；已有疾病节点只补充新增的出边
+        """
+        start_time = time.time()
+        delta = self._new_search_index()
+        self._index_nodes(delta, graph, node_start)
+        
+        relations = graph.relations
+        node_ids = graph.node_ids
+        for edge in range(edge_start, graph.edge_count):
+            source = graph.edge_src[edge]
+            if source >= node_start:  # 新节点的出边已在上面处理
+                continue
+            label = node_ids[source].lower()
+            relation = relations[graph.edge_rel[edge]]
+            if relation and any(disease in label for disease in self.DISEASE_KEYWORDS):
+                delta['disease_relations'][label].append((relation, node_ids[graph.edge_dst[edge]]))
+        
+        # 只复制外层字典和被新增条目触及的列表
+        search_index = {'exact': {**base_index['exact'], **delta['exact']}}
+        for name in ('token', 'disease_relations'):
+            merged = defaultdict(list, base_index[name])
+            for key, values in delta[name].items():
+                merged[key] = merged.get(key, []) + values
+            search_index[name] = merged
+        search_index['labels_lower'] = base_index['labels_lower'] + [
+            node_ids[node].lower() for node in range(node_start, graph.node_count)
+        ]
+        search_index['ngram'] = base_index['ngram'].extend(graph.node_ids)
+        search_index['suggest'] = base_index['suggest'].extend(graph.node_ids, node_start, graph.rank_positions)
+        search_index['fuzzy'] = base_index['fuzzy'].extend(graph.node_ids)
+        
+        print(f"[索引] 增量更新完成: 新增实体 {graph.node_count - node_start}, "
+              f"新增边 {graph.edge_count - edge_start}, 耗时 {time.time() - start_time:.3f}s")
+        return search_index
+    
+    def _index_nodes(self, search_index: Dict[str, Any], graph: CompactGraph, node_start: int) -> None:
+        """将编号不小于node_start的实体加入搜索索引"""
+        relations = graph.relations
+        node_ids = graph.node_ids
+        edge_rel = graph.edge_rel
+        edge_dst = graph.edge_dst
+        exact = search_index['exact']
+        token_index = search_index['token']
+        disease_relations = search_index['disease_relations']
         
         # 构建实体索引
-        for node in graph_data['nodes']:
-            entity_id = node['id']
-            label = node['label'].lower()
-            
-            # 存储实体信息
-            self._search_index['entities'][entity_id] = node
+        for node in range(node_start, graph.node_count):
+            entity_id = node_ids[node]
+            label = entity_id.lower()
             
             # 精确匹配索引
-            self._search_index['exact'][label] = entity_id
-            
-            # 前缀索引（前3-6个字符）
-            for i in range(2, min(len(label) + 1, 7)):
-                prefix = label[:i]
-                self._search_index['prefix'][prefix].append(entity_id)
+            exact[label] = entity_id
             
             # 词语分割索引
-            tokens = label.split()
-            for token in tokens:
+            for token in label.split():
                 if len(token) > 1:
-                    self._search_index['token'][token].append(entity_id)
+                    token_index[token].append(entity_id)
             
             # 同义词索引
-            for term, synonyms in medical_synonyms.items():
+            for term, synonyms in self.MEDICAL_SYNONYMS.items():
                 if term in label:
                     for synonym in synonyms:
-                        self._search_index['exact'][synonym.lower()] = entity_id
-        
-        # 构建关系索引
-        print(f"[索引] 构建关系索引...")
-        for edge in graph_data['edges']:
-            source_id = edge.get('source')
-            target_id = edge.get('target')
-            relation = edge.get('relation', '')
+                        exact[synonym.lower()] = entity_id
             
-            if source_id and target_id and relation:
-                # 关系索引
-                self._search_index['relations'][source_id].append((relation, target_id))
-                
-                # 关系目标索引
-                self._search_index['relation_targets'][relation].append((source_id, target_id))
-                
-                # 疾病关系索引（通过实体标签）
-                source_entity = self._search_index['entities'].get(source_id)
-                if source_entity:
-                    source_label = source_entity.get('label', '').lower()
-                    # 检查是否是疾病实体
-                    if any(disease in source_label for disease in ['感冒', '发烧', '咳嗽', '头痛', '高血压', '糖尿病']):
-                        self._search_index['disease_relations'][source_label].append((relation, target_id))
+            # 疾病关系索引（通过实体标签）
+            if any(disease in label for disease in self.DISEASE_KEYWORDS):
+                for edge in graph.out_edge_ids(node):
+                    relation = relations[edge_rel[edge]]
+                    if relation:
+                        disease_relations[label].append((relation, node_ids[edge_dst[edge]]))
+    
+    def cached_search(self, generation: GraphGeneration, kind: str, params: Tuple,
+                      compute: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        按 (图谱版本ID, 搜索类型, 规范化参数) 缓存搜索结果，空结果同样缓存
+        返回结果的浅拷贝，调用方修改结果字典不影响缓存
         
-        end_time = time.time()
-        print(f"[索引] 索引构建完成, 耗时 {end_time - start_time:.2f}s")
-        print(f"[索引] 实体数量: {len(self._search_index['entities'])}")
-        print(f"[索引] 关系数量: {len(self._search_index['relations'])}")
-        print(f"[索引] 疾病关系数量: {len(self._search_index['disease_relations'])}")
+        Args:
+            generation: 计算结果所用的那一代数据
+            compute: 未命中时计算结果
+        """
+        key = (generation.version_id, kind) + tuple(params)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            return [dict(result) for result in cached]
+        results = compute()
+        self._search_cache.put(key, [dict(result) for result in results])
+        return results
+    
+    def get_search_cache_stats(self) -> Dict[str, Any]:
+        """搜索结果缓存的命中统计"""
+        return self._search_cache.stats()
     
-    def search_entities_fast(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def search_entities_fast(self, query: str, limit: int = 10, rank_by: str = 'degree') -> List[Dict[str, Any]]:
         """
-        快速实体搜索
+        快速实体搜索（结果按图谱版本缓存）
         时间复杂度从 O(E×Q×W) 降低到 O(log N)
-        """
-        if not query.strip() or not self._search_index:
-            return []
         
+        Args:
+            rank_by: 匹配分数相同时的排序依据 degree / pagerank / betweenness（均为预先计算）
+        """
+        generation = self._generation
         query_lower = query.lower().strip()
+        if not query_lower or generation is None:
+            return []
+        # BM25索引在后台构建，完成前跳过该阶段；是否启用计入缓存键，索引就绪后不会命中缺少该阶段的结果
+        bm25 = bm25_manager.get(generation)
+        if bm25 is None:
+            bm25_manager.schedule(generation)
+        return self.cached_search(generation, 'entities', (query_lower, limit, rank_by, bm25 is not None),
+                                  lambda: self._search_entities(generation, query_lower, limit, rank_by, bm25))
+    
+    def _search_entities(self, generation: GraphGeneration, query_lower: str, limit: int,
+                         rank_by: str, bm25=None) -> List[Dict[str, Any]]:
+        """实体搜索的各匹配阶段，query_lower 已转小写并去除首尾空白；bm25 为当前版本的BM25索引（未就绪时为None）"""
+        graph = generation.store
+        search_index = generation.search_index
         results = []
         seen_ids = set()
         
         # 1. 精确匹配 (最高优先级)
-        if query_lower in self._search_index['exact']:
-            entity_id = self._search_index['exact'][query_lower]
-            if entity_id in self._search_index['entities']:
-                entity = self._search_index['entities'][entity_id].copy()
+        if query_lower in search_index['exact']:
+            entity_id = search_index['exact'][query_lower]
+            entity = graph.get_node(entity_id)
+            if entity:
                 entity['match_type'] = 'exact'
                 entity['match_score'] = 100
                 results.append(entity)
                 seen_ids.add(entity_id)
         
-        # 2. 前缀匹配
+        # 2. 前缀匹配（前缀补全索引直接给出排名最高的实体，不再遍历整个前缀列表）
+        suggest = search_index['suggest']
+        node_ids = graph.node_ids
         for prefix_len in range(len(query_lower), 1, -1):
-            prefix = query_lower[:prefix_len]
-            if prefix in self._search_index['prefix']:
-                for entity_id in self._search_index['prefix'][prefix]:
-                    if entity_id not in seen_ids and len(results) < limit:
-                        entity = self._search_index['entities'][entity_id].copy()
-                        entity['match_type'] = 'prefix'
-                        entity['match_score'] = 80 + prefix_len  # 前缀越长分数越高
-                        results.append(entity)
-                        seen_ids.add(entity_id)
+            if len(results) >= limit:
+                break
+            # 更短前缀的匹配包含已加入的结果，多取这部分数量
+            for node in suggest.complete(query_lower[:prefix_len], limit + len(seen_ids)):
+                entity_id = node_ids[node]
+                if entity_id not in seen_ids and len(results) < limit:
+                    entity = graph.node_dict(node)
+                    entity['match_type'] = 'prefix'
+                    # 前缀越长分数越高，加分有上限，长查询的前缀匹配不会高于精确匹配
+                    entity['match_score'] = 80 + min(prefix_len, GraphConfig.PREFIX_MAX_BONUS)
+                    results.append(entity)
+                    seen_ids.add(entity_id)
         
         # 3. 词语匹配
         tokens = query_lower.split()
         for token in tokens:
-            if token in self._search_index['token']:
-                for entity_id in self._search_index['token'][token]:
+            if token in search_index['token']:
+                for entity_id in search_index['token'][token]:
                     if entity_id not in seen_ids and len(results) < limit:
-                        entity = self._search_index['entities'][entity_id].copy()
+                        entity = graph.get_node(entity_id)
                         entity['match_type'] = 'token'
                         entity['match_score'] = 60
                         results.append(entity)
                         seen_ids.add(entity_id)
         
-        # 按分数和连接数排序
-        results.sort(key=lambda x: (x['match_score'], x.get('connections', 0)), reverse=True)
+        # 4. 容错匹配：前面各阶段不足limit个时，查找编辑距离很小的标签（输错、漏字、多字、颠倒）
+        if len(results) < limit and len(query_lower) > 1:
+            if len(query_lower) <= GraphConfig.FUZZY_SHORT_QUERY:
+                max_distance = 1
+            else:
+                max_distance = GraphConfig.FUZZY_MAX_DISTANCE
+            matches = search_index['fuzzy'].search(query_lower, graph.node_ids, graph.rank_positions,
+                                                   limit + len(seen_ids), max_distance,
+                                                   GraphConfig.FUZZY_MAX_CANDIDATES)
+            for node, distance in matches:
+                entity_id = graph.node_ids[node]
+                if entity_id not in seen_ids and len(results) < limit:
+                    entity = graph.node_dict(node)
+                    entity['match_type'] = 'fuzzy'
+                    entity['match_score'] = 50 - 10 * distance  # 编辑距离越小分数越高
+                    entity['edit_distance'] = distance
+                    results.append(entity)
+                    seen_ids.add(entity_id)
+        
+        # 5. BM25全文检索：按标签、邻居标签和关系类型的字二元组相关度补足结果（适合长问句）
+        #    已有精确或前缀匹配时不再补充；只用于多词项查询，且分数须达到查询满分的一定比例
+        if (len(results) < limit and bm25 is not None and
+                not any(result['match_type'] in ('exact', 'prefix') for result in results)):
+            matches = bm25.search(query_lower, limit + len(seen_ids), graph.rank_positions,
+                                  min_terms=GraphConfig.BM25_MIN_QUERY_TERMS,
+                                  min_score_ratio=GraphConfig.BM25_MIN_SCORE_RATIO)
+            best_score = matches[0][1] if matches else 0.0
+            for node, score in matches:
+                entity_id = graph.node_ids[node]
+                if entity_id not in seen_ids and len(results) < limit:
+                    entity = graph.node_dict(node)
+                    entity['match_type'] = 'bm25'
+                    entity['match_score'] = round(25 * score / best_score, 2)  # 低于其他匹配方式
+                    entity['bm25_score'] = round(score, 4)
+                    results.append(entity)
+                    seen_ids.add(entity_id)
+        
+        # 按分数和重要性（默认连接数）排序
+        if rank_by == 'degree':
+            results.sort(key=lambda x: (x['match_score'], x.get('connections', 0)), reverse=True)
+        else:
+            scores, node_index = graph.centrality(rank_by), graph.node_index
+            results.sort(key=lambda x: (x['match_score'], scores[node_index[x['id']]]), reverse=True)
         
         return results[:limit]
     
+    def search_semantic(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        语义检索：查询文本与实体向量的余弦相似度（IVF近似最近邻），只返回相似度不低于
+        GraphConfig.VECTOR_MIN_SIMILARITY 的实体；当前版本的向量尚未算好时返回空列表
+        """
+        generation = self._generation
+        if not query.strip() or generation is None:
+            return []
+        index = vector_manager.get(generation)
+        if index is None:
+            vector_manager.schedule(generation)
+            return []
+        
+        graph = generation.store
+        results = []
+        for node, similarity in index.search(query.lower().strip(), limit):
+            if similarity < GraphConfig.VECTOR_MIN_SIMILARITY:
+                break
+            entity = graph.node_dict(node)
+            entity['match_type'] = 'semantic'
+            entity['match_score'] = round(25 * similarity, 2)  # 与BM25处于同一区间
+            entity['similarity'] = round(similarity, 4)
+            results.append(entity)
+        return results
+    
+    def suggest(self, prefix: str, limit: int = 10) -> Tuple[Optional[CompactGraph], List[int]]:
+        """
+        输入联想：标签以prefix开头（不区分大小写）的实体，按连接数排名取前limit个
+
+        Returns:
+            (图谱, 节点整数ID按排名排列)，图谱与结果来自同一代数据
+        """
+        generation = self._generation
+        if generation is None:
+            return None, []
+        return generation.store, generation.search_index['suggest'].complete(prefix.strip(), limit)
+
+    def search_substring(self, query: str, limit: Optional[int] = None
+                         ) -> Tuple[Optional[CompactGraph], List[int]]:
+        """
+        子串搜索（不区分大小写），结果与逐个标签 `query in label` 一致
+
+        Returns:
+            (图谱, 匹配节点整数ID升序)，图谱与结果来自同一代数据
+        """
+        generation = self._generation
+        if generation is None:
+            return None, []
+        graph = generation.store
+        return graph, generation.search_index['ngram'].search(query, graph.node_ids, limit)
+    
     def search_by_relation_fast(self, disease: str, relation: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        快速关系搜索
+        快速关系搜索（结果按图谱版本缓存）
         时间复杂度: O(1) 到 O(log N)
         """
-        if not disease or not relation or not self._search_index:
+        generation = self._generation
+        # 疾病名按小写匹配，先规范化再作缓存键，大小写或首尾空白不同的同一查询共用一个缓存条目
+        query = (disease or '').strip().lower()
+        relation = (relation or '').strip()
+        if not query or not relation or generation is None:
             return []
-        
+        results = self.cached_search(generation, 'relation', (query, relation, limit),
+                                     lambda: self._search_by_relation(generation, query, relation, limit))
+        # 疾病关系索引命中的结果以调用方传入的疾病名作为来源，缓存中只保存规范化后的名称
+        for result in results:
+            if result['search_method'] == 'disease_relations_index':
+                result['source_disease'] = disease
+        return results
+    
+    def _search_by_relation(self, generation: GraphGeneration, disease: str, relation: str,
+                            limit: int) -> List[Dict[str, Any]]:
+        """关系搜索的各查找阶段，disease 已转小写并去除首尾空白"""
         print(f"[快速关系搜索] 疾病={disease}, 关系={relation}")
         start_time = time.time()
         
+        graph = generation.store
+        search_index = generation.search_index
+        node_ids = graph.node_ids
+        relations = graph.relations
         results = []
         seen_ids = set()
         
         # 1. 通过疾病关系索引快速查找
-        disease_lower = disease.lower()
-        if disease_lower in self._search_index['disease_relations']:
-            relations = self._search_index['disease_relations'][disease_lower]
-            for rel, target_id in relations:
+        if disease in search_index['disease_relations']:
+            disease_relations = search_index['disease_relations'][disease]
+            for rel, target_id in disease_relations:
                 if relation in rel and target_id not in seen_ids:
-                    target_entity = self._search_index['entities'].get(target_id)
+                    target_entity = graph.get_node(target_id)
                     if target_entity:
                         result = {
                             **target_entity,
@@ -317,22 +819,22 @@ class KnowledgeGraphCache:
                         if len(results) >= limit:
                             break
         
-        # 2. 通过关系目标索引查找
-        if len(results) < limit and relation in self._search_index['relation_targets']:
-            relation_pairs = self._search_index['relation_targets'][relation]
-            for source_id, target_id in relation_pairs:
+        # 2. 通过关系类型的邻接数组查找
+        relation_id = graph.relation_index.get(relation)
+        if len(results) < limit and relation_id is not None:
+            for edge in graph.relation_edge_ids(relation_id):
+                target = graph.edge_dst[edge]
+                target_id = node_ids[target]
                 if target_id not in seen_ids:
-                    source_entity = self._search_index['entities'].get(source_id)
-                    target_entity = self._search_index['entities'].get(target_id)
+                    source_label = node_ids[graph.edge_src[edge]]
                     
-                    if (source_entity and target_entity and 
-                        disease in source_entity.get('label', '').lower()):
+                    if disease in source_label.lower():
                         result = {
-                            **target_entity,
+                            **graph.node_dict(target),
                             "match_type": "relation",
                             "match_score": 90,
                             "relation": relation,
-                            "source_disease": source_entity.get('label'),
+                            "source_disease": source_label,
                             "search_method": "relation_targets_index"
                         }
                         results.append(result)
@@ -340,27 +842,27 @@ class KnowledgeGraphCache:
                         if len(results) >= limit:
                             break
         
-        # 3. 通过实体ID查找疾病实体，然后查找关系
+        # 3. 通过实体ID查找疾病实体，然后查找出边
         if len(results) < limit:
-            for entity_id, entity in self._search_index['entities'].items():
-                if disease in entity.get('label', '').lower():
-                    relations = self._search_index['relations'].get(entity_id, [])
-                    for rel, target_id in relations:
-                        if relation in rel and target_id not in seen_ids:
-                            target_entity = self._search_index['entities'].get(target_id)
-                            if target_entity:
-                                result = {
-                                    **target_entity,
-                                    "match_type": "relation",
-                                    "match_score": 85,
-                                    "relation": rel,
-                                    "source_disease": entity.get('label'),
-                                    "search_method": "entity_relations_index"
-                                }
-                                results.append(result)
-                                seen_ids.add(target_id)
-                                if len(results) >= limit:
-                                    break
+            for node, entity_id in enumerate(node_ids):
+                if disease in entity_id.lower():
+                    for edge in graph.out_edge_ids(node):
+                        rel = relations[graph.edge_rel[edge]]
+                        target = graph.edge_dst[edge]
+                        target_id = node_ids[target]
+                        if rel and relation in rel and target_id not in seen_ids:
+                            result = {
+                                **graph.node_dict(target),
+                                "match_type": "relation",
+                                "match_score": 85,
+                                "relation": rel,
+                                "source_disease": entity_id,
+                                "search_method": "entity_relations_index"
+                            }
+                            results.append(result)
+                            seen_ids.add(target_id)
+                            if len(results) >= limit:
+                                break
                     if len(results) >= limit:
                         break
         
@@ -373,16 +875,45 @@ class KnowledgeGraphCache:
     
     def get_cached_graph(self) -> Optional[Dict[str, Any]]:
         """获取缓存的图谱数据"""
-        return self._graph_cache
+        generation = self._generation
+        return generation.graph if generation is not None else None
+    
+    def get_graph_store(self) -> Optional[CompactGraph]:
+        """获取底层紧凑图谱存储（整数ID、CSR邻接）"""
+        generation = self._generation
+        return generation.store if generation is not None else None
+    
+    def get_generation(self) -> Optional[GraphGeneration]:
+        """获取当前一代数据；需要同时使用图谱、索引和版本号时应只取一次，保证彼此一致"""
+        return self._generation
+    
+    def is_search_index_ready(self) -> bool:
+        """当前一代的搜索索引是否已构建完成（未完成时搜索请求会等待）"""
+        generation = self._generation
+        return generation is not None and generation.search_index_ready
+    
+    def get_ingest_stats(self) -> Optional[Dict[str, Any]]:
+        """获取最近一次CSV导入的统计（后端、行数、行/秒）"""
+        generation = self._generation
+        return generation.ingest_stats if generation is not None else None
+    
+    def get_version(self) -> int:
+        """获取当前图谱版本号（每次重新加载递增）"""
+        return self._version
+    
+    def get_csv_file_path(self) -> Optional[str]:
+        """获取当前图谱对应的CSV文件路径"""
+        generation = self._generation
+        return generation.csv_file_path if generation is not None else None
     
     def clear_cache(self) -> None:
-        """清除缓存"""
-        self._graph_cache = None
-        self._search_index = None
-        self._cache_timestamp = None
-        self._file_hash = None
-        self._csv_file_path = None
-        print("[缓存] 知识图谱缓存已清除")
+        """
+        清除缓存：标记当前数据失效，下一次加载强制全量重建
+        重建完成前继续提供当前一代数据，get_cached_graph() 不会返回None
+        """
+        self._reload_requested = True
+        self._file_stat = None
+        print("[缓存] 知识图谱缓存已标记失效，将在下次加载时重建")
 
 # 全局缓存实例
 graph_cache = KnowledgeGraphCache() 
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""
+社区发现与多层聚类
+- label_propagation: 模块度约束的加权标签传播（半同步：每轮把节点随机分成几批，每批同时更新），numpy向量化
+- ClusterHierarchy: 第0层在实体图上做标签传播，之后在上一层的聚合图（超节点 + 带权超边）上重复，
+  直到簇数不超过 GraphConfig.CLUSTER_TOP_MAX 或不再明显减少；
+  每层保存节点所属簇、簇大小、代表节点、超边和子成员，供概览与逐层下钻
+每个图谱只计算一次（新版本发布后后台预计算），需要numpy
+"""
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.graph_config import GraphConfig
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时不提供聚类视图
+    np = None
+
+
+def _aggregate_edges(src, dst, weights, item_count: int):
+    """合并同一对端点之间的边（无向，去自环）：返回 (src, dst, weight)，src < dst，按(src, dst)排序"""
+    keep = src != dst
+    low, high = np.minimum(src[keep], dst[keep]), np.maximum(src[keep], dst[keep])
+    keys, inverse = np.unique(low * item_count + high, return_inverse=True)
+    merged = np.bincount(inverse, weights=weights[keep], minlength=len(keys))
+    return keys // item_count, keys % item_count, merged
+
+
+def _symmetric_edges(src, dst, weights):
+    """无向边 -> 两个方向的 (heads, tails, weights)"""
+    return np.concatenate([src, dst]), np.concatenate([dst, src]), np.concatenate([weights, weights])
+
+
+def label_propagation(src, dst, weights, item_count: int, item_degree, max_iter: int = None, seed: int = 0):
+    """
+    模块度约束的加权标签传播（LPAm）：每个节点在当前标签和邻居标签中选择
+    w(i, l) - γ·k_i·vol(l) / 2m 最大的标签（与Louvain移动节点的模块度增益一致），
+    避免普通标签传播在聚合图上把所有节点合并为一个簇
+
+    Args:
+        src/dst/weights: 无向带权边（不含自环）
+        item_degree: 每个节点的加权度数（包含已合并到节点内部的边）
+
+    Returns:
+        每个节点的簇编号（0..k-1，按首次出现的顺序编号）
+    """
+    max_iter = max_iter or GraphConfig.CLUSTER_MAX_ITER
+    rng = np.random.default_rng(seed)
+    heads, tails, edge_weights = _symmetric_edges(src, dst, weights)
+    total_weight = float(item_degree.sum())
+    if total_weight <= 0:
+        return np.arange(item_count, dtype=np.int64)
+    penalty = GraphConfig.CLUSTER_RESOLUTION * item_degree / total_weight
+    labels = np.arange(item_count, dtype=np.int64)
+    in_batch = np.zeros(item_count, dtype=bool)
+    for _ in range(max_iter):
+        changed = 0
+        for batch in np.array_split(rng.permutation(item_count), GraphConfig.CLUSTER_BATCHES):
+            in_batch[:] = False
+            in_batch[batch] = True
+            selected = in_batch[heads]
+            volume = np.bincount(labels, weights=item_degree, minlength=item_count)
+            # 候选：邻居的标签（按边权累计）和当前标签（权重0，保证可以不移动）
+            cand_heads = np.concatenate([heads[selected], batch])
+            cand_labels = np.concatenate([labels[tails[selected]], labels[batch]])
+            cand_weights = np.concatenate([edge_weights[selected], np.zeros(len(batch))])
+            keys, inverse = np.unique(cand_heads * item_count + cand_labels, return_inverse=True)
+            scores = np.bincount(inverse, weights=cand_weights, minlength=len(keys))
+            key_heads, key_labels = keys // item_count, keys % item_count
+            current = key_labels == labels[key_heads]
+            # 计算当前标签的体积时去掉节点自身
+            scores -= penalty[key_heads] * (volume[key_labels] - current * item_degree[key_heads])
+            # 平局时优先保留当前标签，其余随机
+            scores += current * 1e-9 + rng.random(len(keys)) * 1e-12
+            order = np.lexsort((-scores, key_heads))
+            _, first = np.unique(key_heads[order], return_index=True)
+            winners_heads, winners = key_heads[order][first], key_labels[order][first]
+            changed += int((labels[winners_heads] != winners).sum())
+            labels[winners_heads] = winners
+        if changed <= item_count * GraphConfig.CLUSTER_MIN_CHANGE:
+            break
+    _, first_seen, compact = np.unique(labels, return_index=True, return_inverse=True)
+    # 按首次出现的位置编号
+    remap = np.empty(len(first_seen), dtype=np.int64)
+    remap[np.argsort(first_seen, kind='stable')] = np.arange(len(first_seen))
+    return remap[compact]
+
+
+class ClusterLevel:
+    """一层聚类"""
+
+    def __init__(self, node_cluster, parent_of_children, cluster_count: int,
+                 edge_src, edge_dst, edge_weight, leaders, sizes):
+        self.node_cluster = node_cluster            # 节点整数ID -> 本层簇编号
+        self.parent_of_children = parent_of_children  # 下一层（更细）簇/节点编号 -> 本层簇编号
+        self.cluster_count = cluster_count
+        self.edge_src = edge_src                    # 本层超边（src < dst）与权重（原始边数）
+        self.edge_dst = edge_dst
+        self.edge_weight = edge_weight
+        self.leaders = leaders                      # 每个簇中连接数排名最高的节点
+        self.sizes = sizes                          # 每个簇包含的实体数
+        # 子成员CSR：按簇编号分组，组内按大小（第0层按连接数排名）排列
+        self.child_order = None
+        self.child_offsets = None
+
+    def children(self, cluster: int):
+        return self.child_order[self.child_offsets[cluster]:self.child_offsets[cluster + 1]]
+
+
+class ClusterHierarchy:
+    """多层聚类：levels[0] 为最细的一层（成员为实体），levels[-1] 为概览层"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.levels: List[ClusterLevel] = []
+        n = graph.node_count
+        rank_positions = np.frombuffer(graph.rank_positions, dtype=np.int32)
+        rank_order = np.frombuffer(graph.rank_order, dtype=np.int32)
+
+        src = np.frombuffer(graph.edge_src, dtype=np.int32).astype(np.int64)
+        dst = np.frombuffer(graph.edge_dst, dtype=np.int32).astype(np.int64)
+        item_src, item_dst, item_weight = _aggregate_edges(src, dst, np.ones(len(src)), max(n, 1))
+        item_degree = np.bincount(item_src, weights=item_weight, minlength=n) + \
+            np.bincount(item_dst, weights=item_weight, minlength=n)
+        node_cluster = np.arange(n, dtype=np.int64)
+        item_count = n
+        # 下一层成员的排序依据：第0层为节点的连接数排名（越小越靠前），之后为簇大小（越大越靠前）
+        child_sort_key = rank_positions.astype(np.int64)
+
+        while item_count and len(self.levels) < GraphConfig.CLUSTER_MAX_LEVELS:
+            parent = label_propagation(item_src, item_dst, item_weight, item_count, item_degree,
+                                       seed=len(self.levels))
+            cluster_count = int(parent.max()) + 1
+            if self.levels and cluster_count > item_count * (1 - GraphConfig.CLUSTER_MIN_REDUCTION):
+                break
+            node_cluster = parent[node_cluster]
+            edge_src, edge_dst, edge_weight = _aggregate_edges(parent[item_src], parent[item_dst],
+                                                               item_weight, cluster_count)
+            sizes = np.bincount(node_cluster, minlength=cluster_count)
+            _, first = np.unique(node_cluster[rank_order], return_index=True)
+            leaders = rank_order[first]
+
+            level = ClusterLevel(node_cluster, parent, cluster_count, edge_src, edge_dst, edge_weight,
+                                 leaders, sizes)
+            level.child_order = np.lexsort((child_sort_key, parent)).astype(np.int64)
+            level.child_offsets = np.searchsorted(parent[level.child_order], np.arange(cluster_count + 1))
+            self.levels.append(level)
+
+            item_src, item_dst, item_weight, item_count = edge_src, edge_dst, edge_weight, cluster_count
+            item_degree = np.bincount(parent, weights=item_degree, minlength=cluster_count)
+            child_sort_key = -sizes.astype(np.int64)
+            if cluster_count <= GraphConfig.CLUSTER_TOP_MAX:
+                break
+
+    @property
+    def top_level(self) -> int:
+        return len(self.levels) - 1
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return [{'level': i, 'clusters': level.cluster_count, 'super_edges': len(level.edge_src),
+                 'largest': int(level.sizes.max()) if level.cluster_count else 0}
+                for i, level in enumerate(self.levels)]
+
+    def cluster_dict(self, level_index: int, cluster: int) -> Dict[str, Any]:
+        level = self.levels[level_index]
+        leader = self.graph.node_ids[int(level.leaders[cluster])]
+        return {
+            'id': f'{level_index}:{cluster}',
+            'label': leader,
+            'level': level_index,
+            'size': int(level.sizes[cluster]),
+            'children': int(level.child_offsets[cluster + 1] - level.child_offsets[cluster]),
+            'leader': leader,
+            'type': 'cluster'
+        }
+
+    def parse_cluster_id(self, cluster_id: str) -> Tuple[int, int]:
+        """'层:编号' -> (层, 编号)，不存在时抛出ValueError"""
+        try:
+            level_index, cluster = (int(part) for part in cluster_id.split(':'))
+        except ValueError:
+            raise ValueError(f'无效的簇ID: {cluster_id}')
+        if not 0 <= level_index < len(self.levels) or not 0 <= cluster < self.levels[level_index].cluster_count:
+            raise ValueError(f'簇不存在: {cluster_id}')
+        return level_index, cluster
+
+    def super_view(self, level_index: int, clusters) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """指定层中一组簇的超节点及它们之间的超边"""
+        level = self.levels[level_index]
+        clusters = np.asarray(clusters, dtype=np.int64)
+        member = np.zeros(level.cluster_count, dtype=bool)
+        member[clusters] = True
+        inside = member[level.edge_src] & member[level.edge_dst]
+        nodes = [self.cluster_dict(level_index, int(cluster)) for cluster in clusters]
+        edges = [
+            {'source': f'{level_index}:{a}', 'target': f'{level_index}:{b}', 'weight': int(w), 'label': str(int(w))}
+            for a, b, w in zip(level.edge_src[inside].tolist(), level.edge_dst[inside].tolist(),
+                               level.edge_weight[inside].tolist())
+        ]
+        return nodes, edges
+
+
+_hierarchies: 'weakref.WeakKeyDictionary[Any, ClusterHierarchy]' = weakref.WeakKeyDictionary()
+_hierarchy_lock = threading.Lock()
+# 已安排后台计算的图谱，避免重复启动线程
+_scheduled: 'weakref.WeakSet[Any]' = weakref.WeakSet()
+# 计算失败的图谱 -> 错误信息；同一图谱不再重试（新版本发布后重新计算）
+_failures: 'weakref.WeakKeyDictionary[Any, str]' = weakref.WeakKeyDictionary()
+
+
+def clustering_available() -> bool:
+    return np is not None
+
+
+def get_hierarchy(graph, compute: bool = True) -> Optional[ClusterHierarchy]:
+    """图谱的多层聚类（每个图谱只计算一次）；compute=False 时未计算完成返回None"""
+    hierarchy = _hierarchies.get(graph)
+    if hierarchy is not None or not compute:
+        return hierarchy
+    with _hierarchy_lock:
+        hierarchy = _hierarchies.get(graph)
+        if hierarchy is None:
+            start = time.time()
+            hierarchy = ClusterHierarchy(graph)
+            _hierarchies[graph] = hierarchy
+            levels = ', '.join(str(level.cluster_count) for level in hierarchy.levels)
+            print(f"[聚类] 完成: {graph.node_count} 节点 -> 各层簇数 [{levels}], 耗时 {time.time() - start:.2f}s")
+    return hierarchy
+
+
+def clustering_error(graph) -> Optional[str]:
+    """图谱的聚类计算失败时返回错误信息"""
+    return _failures.get(graph)
+
+
+def schedule_clustering(generation) -> None:
+    """新版本发布后在后台线程预先计算聚类（已完成、进行中或已失败时忽略）"""
+    if generation is None or not clustering_available():
+        return
+    graph = generation.store
+    with _hierarchy_lock:
+        if graph in _scheduled or graph in _hierarchies or graph in _failures:
+            return
+        _scheduled.add(graph)
+
+    def run():
+        try:
+            get_hierarchy(graph)
+        except Exception as e:
+            print(f"[警告] 聚类计算失败: {e}")
+            with _hierarchy_lock:
+                _failures[graph] = str(e) or type(e).__name__
+        finally:
+            _scheduled.discard(graph)
+
+    threading.Thread(target=run, name='graph-clustering', daemon=True).start()
@@ -0,0 +1,120 @@
+"""
+图谱流式导出
+直接遍历紧凑存储的数组逐条生成记录，按块输出NDJSON或CSV；
+除可选的节点标记位图（每节点1字节）外不随图谱规模占用额外内存
+"""
+import csv
+import io
+from typing import Iterable, Iterator, Optional, Set
+
+from src.utils.graph_store import CompactGraph
+from src.utils.response_encoding import dumps_json
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+RECORD_TYPES = ('node', 'edge')
+
+
+def iter_export_edges(graph: CompactGraph, relations: Optional[Set[int]] = None) -> Iterator[int]:
+    """按原始顺序遍历边ID，relations不为None时只保留这些关系的边"""
+    if relations is None:
+        yield from range(graph.edge_count)
+        return
+    edge_rel = graph.edge_rel
+    for edge in range(graph.edge_count):
+        if edge_rel[edge] in relations:
+            yield edge
+
+
+def iter_export_nodes(graph: CompactGraph, relations: Optional[Set[int]] = None) -> Iterator[int]:
+    """遍历节点ID；有关系过滤时只保留与过滤后的边相连的节点"""
+    if relations is None:
+        yield from range(graph.node_count)
+        return
+    marked = bytearray(graph.node_count)
+    edge_src, edge_dst = graph.edge_src, graph.edge_dst
+    for relation in relations:
+        for edge in graph.relation_edge_ids(relation):
+            marked[edge_src[edge]] = 1
+            marked[edge_dst[edge]] = 1
+    for node, flag in enumerate(marked):
+        if flag:
+            yield node
+
+
+def _chunked(records: Iterable[bytes], chunk_bytes: int) -> Iterator[bytes]:
+    """把逐条记录合并为约chunk_bytes大小的块，减少响应写出次数"""
+    buffer, size = [], 0
+    for record in records:
+        buffer.append(record)
+        size += len(record)
+        if size >= chunk_bytes:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_ndjson(graph: CompactGraph, types: Iterable[str], relations: Optional[Set[int]] = None,
+                  meta: Optional[dict] = None, chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    NDJSON导出：meta行、node行、edge行、done行，每行以type字段区分
+
+    Args:
+        graph: 紧凑图谱（导出期间即使发布新版本也始终读取这一份）
+        types: 导出的记录类型（node / edge）
+        relations: 关系整数ID集合，None表示不过滤
+        meta: 附加到meta行的信息
+    """
+    def records():
+        yield dumps_json({'type': 'meta', **(meta or {})}) + b'\n'
+        counts = {'nodes': 0, 'edges': 0}
+        if 'node' in types:
+            node_ids, degree = graph.node_ids, graph.degree
+            for node in iter_export_nodes(graph, relations):
+                node_id = node_ids[node]
+                yield dumps_json({'type': 'node', 'id': node_id, 'label': node_id,
+                                  'connections': degree[node]}) + b'\n'
+                counts['nodes'] += 1
+        if 'edge' in types:
+            node_ids, relation_names = graph.node_ids, graph.relations
+            edge_src, edge_rel, edge_dst = graph.edge_src, graph.edge_rel, graph.edge_dst
+            for edge in iter_export_edges(graph, relations):
+                yield dumps_json({'type': 'edge', 'source': node_ids[edge_src[edge]],
+                                  'relation': relation_names[edge_rel[edge]],
+                                  'target': node_ids[edge_dst[edge]]}) + b'\n'
+                counts['edges'] += 1
+        yield dumps_json({'type': 'done', **counts}) + b'\n'
+
+    return _chunked(records(), chunk_bytes)
+
+
+def export_csv(graph: CompactGraph, record_type: str, relations: Optional[Set[int]] = None,
+               chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    CSV导出（带表头）
+    - edge: source,relation,target（与导入的CSV列顺序一致）
+    - node: id,connections
+    """
+    def rows():
+        if record_type == 'node':
+            yield ('id', 'connections')
+            node_ids, degree = graph.node_ids, graph.degree
+            for node in iter_export_nodes(graph, relations):
+                yield node_ids[node], degree[node]
+        else:
+            yield ('source', 'relation', 'target')
+            node_ids, relation_names = graph.node_ids, graph.relations
+            edge_src, edge_rel, edge_dst = graph.edge_src, graph.edge_rel, graph.edge_dst
+            for edge in iter_export_edges(graph, relations):
+                yield node_ids[edge_src[edge]], relation_names[edge_rel[edge]], node_ids[edge_dst[edge]]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in rows():
+        writer.writerow(row)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
@@ -0,0 +1,261 @@
+"""
+服务端图谱布局
+- compute_layout: 向量化的 Fruchterman-Reingold 力导向布局（numpy）；
+  小图精确计算两两斥力，大图把节点分入网格，用各网格的质心近似斥力
+- GraphLayout: 坐标 + 网格空间索引（按行优先的网格编号排序，同一行相邻网格的节点在数组中连续），
+  矩形范围查询只需切片后精确过滤
+- LayoutManager: 每个图谱版本在后台线程计算一次（见 background_build），结果按 version_id 持久化到CSV旁的 .layout.npz
+numpy为布局功能的必需依赖，缺失时布局不可用（其他接口不受影响）
+"""
+import math
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.graph_config import GraphConfig
+from src.utils.background_build import BackgroundBuilder
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时不提供服务端布局
+    np = None
+
+LAYOUT_SUFFIX = '.layout.npz'
+
+
+def get_layout_path(csv_file_path: str) -> str:
+    """获取CSV文件对应的布局文件路径"""
+    return os.path.splitext(csv_file_path)[0] + LAYOUT_SUFFIX
+
+
+def _repulsion_exact(pos, k2: float, block: int = 512):
+    """两两斥力 k²/d，按行分块避免 n×n 矩阵占用过多内存"""
+    disp = np.zeros_like(pos)
+    for start in range(0, len(pos), block):
+        delta = pos[start:start + block, None, :] - pos[None, :, :]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta) + 1e-4
+        disp[start:start + block] = np.einsum('ijk,ij->ik', delta, k2 / dist2)
+    return disp
+
+
+def _repulsion_grid(pos, k2: float, grid_size: int, block_elements: int = 4 * 1024 * 1024):
+    """网格近似斥力：每个节点受各网格质心（质量为网格内节点数）的斥力"""
+    low = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - low, 1e-9)
+    cell_xy = np.minimum((pos - low) / span * grid_size, grid_size - 1).astype(np.int64)
+    cells = cell_xy[:, 1] * grid_size + cell_xy[:, 0]
+    cell_count = grid_size * grid_size
+    mass = np.bincount(cells, minlength=cell_count).astype(np.float64)
+    occupied = mass > 0
+    mass = mass[occupied]
+    centroid = np.stack([
+        np.bincount(cells, weights=pos[:, 0], minlength=cell_count)[occupied],
+        np.bincount(cells, weights=pos[:, 1], minlength=cell_count)[occupied]
+    ], axis=1) / mass[:, None]
+
+    disp = np.zeros_like(pos)
+    block = max(1, block_elements // len(mass))
+    for start in range(0, len(pos), block):
+        delta = pos[start:start + block, None, :] - centroid[None, :, :]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta) + 1e-2
+        disp[start:start + block] = np.einsum('ijk,ij->ik', delta, k2 * mass / dist2)
+    return disp
+
+
+def compute_layout(graph, iterations: int = None, seed: int = 0, init=None,
+                   progress: Optional[Callable[[float, Optional[str]], None]] = None):
+    """
+    计算二维坐标
+
+    Args:
+        graph: CompactGraph
+        iterations: 迭代次数，默认 GraphConfig.LAYOUT_ITERATIONS
+        init: 已有坐标（形状 m×2，m ≤ 节点数），作为前m个节点的初始位置；
+              新节点放在已有邻居附近，并以较低温度少量迭代
+        progress: 进度回调
+
+    Returns:
+        (x, y) float32数组
+    """
+    n = graph.node_count
+    if n == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    iterations = iterations or GraphConfig.LAYOUT_ITERATIONS
+    rng = np.random.default_rng(seed)
+    scale = math.sqrt(n)
+    k = 1.0
+
+    src = np.frombuffer(graph.edge_src, dtype=np.int32).astype(np.int64)
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int32).astype(np.int64)
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+
+    pos = rng.uniform(-scale / 2, scale / 2, size=(n, 2))
+    temperature = scale / 10
+    if init is not None and len(init):
+        known = len(init)
+        pos[:known] = init
+        # 新节点放到一个已有邻居旁边
+        for a, b in ((src, dst), (dst, src)):
+            attach = (a >= known) & (b < known)
+            pos[a[attach]] = pos[b[attach]] + rng.normal(scale=k, size=(int(attach.sum()), 2))
+        temperature = scale / 50
+        iterations = max(1, iterations // 2)
+
+    grid_size = int(min(GraphConfig.LAYOUT_MAX_GRID, max(4, math.sqrt(n / 8))))
+    exact = n <= GraphConfig.LAYOUT_EXACT_MAX_NODES
+    for step in range(iterations):
+        disp = _repulsion_exact(pos, k * k) if exact else _repulsion_grid(pos, k * k, grid_size)
+        # 引力 d²/k，沿边方向
+        delta = pos[src] - pos[dst]
+        dist = np.sqrt(np.einsum('ij,ij->i', delta, delta)) + 1e-9
+        pull = delta * (dist / k)[:, None]
+        for axis in (0, 1):
+            disp[:, axis] -= np.bincount(src, weights=pull[:, axis], minlength=n)
+            disp[:, axis] += np.bincount(dst, weights=pull[:, axis], minlength=n)
+        # 向心力，避免不连通的分量飘散
+        disp -= GraphConfig.LAYOUT_GRAVITY * pos
+
+        length = np.sqrt(np.einsum('ij,ij->i', disp, disp)) + 1e-9
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= 1 - 1 / (iterations - step + 1)
+        if progress:
+            progress((step + 1) / iterations, f'布局迭代 {step + 1}/{iterations}')
+
+    pos -= pos.mean(axis=0)
+    return pos[:, 0].astype(np.float32), pos[:, 1].astype(np.float32)
+
+
+class GraphLayout:
+    """一个图谱版本的坐标和网格空间索引"""
+
+    def __init__(self, x, y, version_id: str, node_ids: List[str]):
+        self.x = x
+        self.y = y
+        self.version_id = version_id
+        # 保留节点表引用，后续版本据此判断能否沿用已有坐标
+        self.node_ids = node_ids
+        n = len(x)
+        if n:
+            self.min_x, self.max_x = float(x.min()), float(x.max())
+            self.min_y, self.max_y = float(y.min()), float(y.max())
+        else:
+            self.min_x = self.max_x = self.min_y = self.max_y = 0.0
+
+        # 每个网格平均 GRID_NODES_PER_CELL 个节点
+        cells = max(1, n // GraphConfig.LAYOUT_GRID_NODES_PER_CELL)
+        self.cell_size = max(math.sqrt((self.max_x - self.min_x) * (self.max_y - self.min_y) / cells), 1e-6)
+        self.grid_w = int((self.max_x - self.min_x) / self.cell_size) + 1
+        self.grid_h = int((self.max_y - self.min_y) / self.cell_size) + 1
+        cell_ids = self._cell_y(y) * self.grid_w + self._cell_x(x)
+        self.order = np.argsort(cell_ids, kind='stable').astype(np.int32)
+        self.cell_offsets = np.searchsorted(cell_ids[self.order], np.arange(self.grid_w * self.grid_h + 1))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.x)
+
+    def bounds(self) -> Dict[str, float]:
+        return {'min_x': self.min_x, 'min_y': self.min_y, 'max_x': self.max_x, 'max_y': self.max_y}
+
+    def _cell_x(self, x):
+        return np.clip(((np.asarray(x) - self.min_x) / self.cell_size).astype(np.int64), 0, self.grid_w - 1)
+
+    def _cell_y(self, y):
+        return np.clip(((np.asarray(y) - self.min_y) / self.cell_size).astype(np.int64), 0, self.grid_h - 1)
+
+    def query(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        """矩形范围内的节点（升序节点整数ID数组）"""
+        if not self.node_count or min_x > self.max_x or max_x < self.min_x \
+                or min_y > self.max_y or max_y < self.min_y:
+            return np.zeros(0, dtype=np.int32)
+        cx0, cx1 = int(self._cell_x(min_x)), int(self._cell_x(max_x))
+        cy0, cy1 = int(self._cell_y(min_y)), int(self._cell_y(max_y))
+        # 同一行内 cx0..cx1 的网格在排序后的数组中是连续的一段
+        slices = [
+            self.order[self.cell_offsets[row * self.grid_w + cx0]:self.cell_offsets[row * self.grid_w + cx1 + 1]]
+            for row in range(cy0, cy1 + 1)
+        ]
+        candidates = np.concatenate(slices)
+        x, y = self.x[candidates], self.y[candidates]
+        inside = (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+        return np.sort(candidates[inside])
+
+    def viewport(self, graph, bbox: Tuple[float, float, float, float], rank_limit: float,
+                 max_nodes: int) -> Tuple[List[int], Dict[str, Any]]:
+        """
+        视口内可见的节点：在矩形范围内且连接数排名小于rank_limit，最多max_nodes个
+
+        Returns:
+            (按排名排序的节点整数ID列表, {'total_in_bbox', 'visible_at_zoom', 'truncated'})
+        """
+        in_box = self.query(*bbox)
+        ranks = np.frombuffer(graph.rank_positions, dtype=np.int32)[in_box]
+        visible = ranks < rank_limit
+        nodes, ranks = in_box[visible], ranks[visible]
+        truncated = len(nodes) > max_nodes
+        if truncated:
+            keep = np.argpartition(ranks, max_nodes - 1)[:max_nodes]
+            nodes, ranks = nodes[keep], ranks[keep]
+        stats = {'total_in_bbox': len(in_box), 'visible_at_zoom': len(visible.nonzero()[0]), 'truncated': truncated}
+        return nodes[np.argsort(ranks, kind='stable')].tolist(), stats
+
+    def save(self, path: str) -> None:
+        """写入 .layout.npz（先写临时文件再替换）"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, x=self.x, y=self.y, version_id=np.array(self.version_id))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, version_id: str, node_ids: List[str]) -> Optional['GraphLayout']:
+        """读取布局文件，版本不一致或文件损坏时返回None"""
+        try:
+            with np.load(path) as data:
+                if str(data['version_id']) != version_id or len(data['x']) != len(node_ids):
+                    return None
+                return cls(data['x'], data['y'], version_id, node_ids)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"[布局] 布局文件不可用: {e}")
+            return None
+
+
+class LayoutManager(BackgroundBuilder):
+    """按图谱版本在后台计算并缓存布局"""
+
+    log_tag = '布局'
+    thread_name = 'graph-layout'
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def _compute(self, generation, report) -> GraphLayout:
+        graph = generation.store
+        path = get_layout_path(generation.csv_file_path) if generation.csv_file_path else None
+        if path and os.path.exists(path):
+            layout = GraphLayout.load(path, generation.version_id, graph.node_ids)
+            if layout is not None:
+                print(f"[布局] 使用已保存的布局: {path}")
+                return layout
+
+        # 追加导入的新版本沿用上一版本的坐标作为初始位置
+        init = None
+        previous = self._result
+        if previous is not None and previous.node_count <= graph.node_count \
+                and graph.node_ids[:previous.node_count] == previous.node_ids:
+            init = np.stack([previous.x, previous.y], axis=1).astype(np.float64)
+
+        print(f"[布局] 开始计算: {graph.node_count} 节点, {graph.edge_count} 边"
+              f"{'（沿用上一版本坐标）' if init is not None else ''}")
+        x, y = compute_layout(graph, init=init, progress=report)
+        layout = GraphLayout(x, y, generation.version_id, graph.node_ids)
+        if path:
+            try:
+                layout.save(path)
+            except OSError as e:
+                print(f"[布局] 保存布局失败: {e}")
+        return layout
+
+
+# 全局布局管理器
+layout_manager = LayoutManager()
@@ -0,0 +1,189 @@
+"""
+图谱遍历查询
+基于紧凑存储的CSR邻接实现的有界BFS和双向最短路径搜索，每个节点的展开代价为O(度数)
+"""
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.utils.graph_store import CompactGraph
+
+
+def iter_incident_edges(graph: CompactGraph, node: int, direction: str = 'both',
+                        relations: Optional[Set[int]] = None) -> Iterator[Tuple[int, int]]:
+    """
+    逐条产出节点的关联边 (边ID, 另一端节点)，先出边后入边，不排序，可提前终止
+    自环会出现两次，由调用方去重
+    """
+    edge_rel = graph.edge_rel
+    if direction in ('out', 'both'):
+        edge_dst = graph.edge_dst
+        for edge in graph.out_edge_ids(node):
+            if relations is None or edge_rel[edge] in relations:
+                yield edge, edge_dst[edge]
+    if direction in ('in', 'both'):
+        edge_src = graph.edge_src
+        for edge in graph.in_edge_ids(node):
+            if relations is None or edge_rel[edge] in relations:
+                yield edge, edge_src[edge]
+
+
+class BoundedBFS:
+    """
+    有界k跳邻域搜索：限制深度、节点总数和每个节点每跳展开的新邻居数
+    按层产出结果，调用方可以边计算边输出
+    """
+
+    def __init__(self, graph: CompactGraph, start: int, max_depth: int, max_nodes: int,
+                 max_fanout: int, direction: str = 'both', relations: Optional[Set[int]] = None):
+        self.graph = graph
+        self.start = start
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_fanout = max_fanout
+        self.direction = direction
+        self.relations = relations
+        # 触发的限制：None / 'max_nodes' / 'fanout'
+        self.truncated: Optional[str] = None
+        self.node_count = 0
+        self.edge_count = 0
+
+    def layers(self) -> Iterator[Tuple[int, List[int], List[int]]]:
+        """
+        逐层产出 (深度, 本层新节点, 本层新边)
+        本层新边包括从上一层到本层节点的边，以及上一层节点之间或指向已访问节点的边
+        """
+        visited = {self.start}
+        seen_edges: Set[int] = set()
+        frontier = [self.start]
+        self.node_count = 1
+        yield 0, [self.start], []
+
+        for depth in range(1, self.max_depth + 1):
+            layer_nodes: List[int] = []
+            layer_edges: List[int] = []
+            for node in frontier:
+                expanded = 0
+                for edge, other in iter_incident_edges(self.graph, node, self.direction, self.relations):
+                    if edge in seen_edges:
+                        continue
+                    if other not in visited:
+                        if expanded >= self.max_fanout:
+                            self.truncated = self.truncated or 'fanout'
+                            break
+                        if len(visited) >= self.max_nodes:
+                            self.truncated = 'max_nodes'
+                            break
+                        visited.add(other)
+                        layer_nodes.append(other)
+                        expanded += 1
+                    seen_edges.add(edge)
+                    layer_edges.append(edge)
+                if self.truncated == 'max_nodes':
+                    break
+
+            self.node_count += len(layer_nodes)
+            self.edge_count += len(layer_edges)
+            if layer_nodes or layer_edges:
+                yield depth, layer_nodes, layer_edges
+            if not layer_nodes or self.truncated == 'max_nodes':
+                break
+            frontier = layer_nodes
+
+
+_REVERSE_DIRECTION = {'out': 'in', 'in': 'out', 'both': 'both'}
+
+
+def _expand_level(graph: CompactGraph, frontier: List[int], dist: Dict[int, int],
+                  preds: Dict[int, List[Tuple[int, int]]], level: int, direction: str,
+                  relations: Optional[Set[int]]) -> List[int]:
+    """
+    一侧BFS扩展完整一层：记录新节点的距离，以及所有最短前驱 (边, 前驱节点)
+    """
+    next_frontier: List[int] = []
+    for node in frontier:
+        for edge, other in iter_incident_edges(graph, node, direction, relations):
+            other_dist = dist.get(other)
+            if other_dist is None:
+                dist[other] = level
+                preds[other] = [(edge, node)]
+                next_frontier.append(other)
+            elif other_dist == level and (edge, node) not in preds[other]:
+                preds[other].append((edge, node))
+    return next_frontier
+
+
+def _half_paths(node: int, preds: Dict[int, List[Tuple[int, int]]]) -> Iterator[Tuple[List[int], List[int]]]:
+    """沿最短前驱回溯到起点，产出 (节点序列, 边序列)，节点序列从起点开始"""
+    if not preds.get(node):
+        yield [node], []
+        return
+    for edge, prev in preds[node]:
+        for nodes, edges in _half_paths(prev, preds):
+            yield nodes + [node], edges + [edge]
+
+
+def shortest_paths(graph: CompactGraph, source: int, target: int, max_depth: int, max_paths: int,
+                   direction: str = 'both', relations: Optional[Set[int]] = None,
+                   max_visited: int = 200000) -> Tuple[List[Tuple[List[int], List[int]]], Optional[str]]:
+    """
+    双向BFS求两点间全部最短路径（最多max_paths条）
+    每次扩展当前前沿较小的一侧，避免单向BFS经过枢纽节点时的爆炸式扩张
+
+    Args:
+        direction: 'both' 忽略方向；'out' 从source沿边的方向到达target；'in' 逆边方向
+        relations: 关系白名单（关系整数ID），None表示不过滤
+        max_visited: 两侧合计最多访问的节点数
+
+    Returns:
+        ([(节点序列, 边序列)], 截断原因)，截断原因为 None / 'max_depth' / 'max_visited' / 'max_paths'
+    """
+    if source == target:
+        return [([source], [])], None
+
+    dist_s, dist_t = {source: 0}, {target: 0}
+    preds_s: Dict[int, List[Tuple[int, int]]] = {source: []}
+    preds_t: Dict[int, List[Tuple[int, int]]] = {target: []}
+    frontier_s, frontier_t = [source], [target]
+    level_s = level_t = 0
+    meeting: List[int] = []
+
+    while frontier_s and frontier_t:
+        if level_s + level_t >= max_depth:
+            return [], 'max_depth'
+        if len(dist_s) + len(dist_t) >= max_visited:
+            return [], 'max_visited'
+        # 扩展较小的一侧；target一侧沿反方向搜索
+        if len(frontier_s) <= len(frontier_t):
+            level_s += 1
+            frontier_s = _expand_level(graph, frontier_s, dist_s, preds_s, level_s, direction, relations)
+            meeting = [node for node in frontier_s if node in dist_t]
+        else:
+            level_t += 1
+            frontier_t = _expand_level(graph, frontier_t, dist_t, preds_t, level_t,
+                                       _REVERSE_DIRECTION[direction], relations)
+            meeting = [node for node in frontier_t if node in dist_s]
+        if meeting:
+            break
+
+    if not meeting:
+        return [], None
+
+    # 只保留总长度最短的相遇点
+    best = min(dist_s[node] + dist_t[node] for node in meeting)
+    meeting = sorted(node for node in meeting if dist_s[node] + dist_t[node] == best)
+
+    def all_paths():
+        for node in meeting:
+            for left_nodes, left_edges in _half_paths(node, preds_s):
+                for right_nodes, right_edges in _half_paths(node, preds_t):
+                    # 右半段从target回溯到相遇点，需要反转
+                    yield left_nodes + right_nodes[::-1][1:], left_edges + right_edges[::-1]
+
+    paths = list(itertools.islice(all_paths(), max_paths + 1))
+    truncated = 'max_paths' if len(paths) > max_paths else None
+    return paths[:max_paths], truncated
+
+
+def collect_subgraph(graph: CompactGraph, nodes: Iterable[int], edges: Iterable[int]):
+    """节点和边的整数ID转换为响应使用的节点/边字典（与分页接口结构一致）"""
+    return [graph.node_dict(node) for node in nodes], [graph.edge_dict(edge) for edge in edges]
@@ -0,0 +1,175 @@
+"""
+节点重要性排序
+- pagerank: 基于边数组的稀疏幂迭代（numpy用bincount向量化，缺失时纯Python迭代）
+- approximate_betweenness: 抽样源点的Brandes算法（无向视图），按BFS层向量化，需要numpy
+结果缓存在CompactGraph上（见 CompactGraph.centrality / ranking），每个图谱版本只计算一次，
+新版本发布后由后台线程预先计算，请求时直接使用；计算失败同样记录在图谱上，
+之后的请求直接返回错误（RankingError），不在请求中重新计算
+"""
+import threading
+import time
+from typing import List
+
+from src.config.graph_config import GraphConfig
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时PageRank使用纯Python迭代，不提供介数中心性
+    np = None
+
+# 支持的排序方式；degree 即原有的按连接数排序
+RANK_METRICS = ('degree', 'pagerank', 'betweenness')
+
+
+class RankingError(RuntimeError):
+    """该图谱的排序计算已失败（新版本发布后重新计算）"""
+
+
+def available_rank_metrics() -> List[str]:
+    return list(RANK_METRICS) if np is not None else ['degree', 'pagerank']
+
+
+def pagerank(graph, damping: float = None, tol: float = None, max_iter: int = None):
+    """
+    PageRank（有向，重复边按权重累计，无出边节点的分数均匀分配）
+
+    Returns:
+        numpy float64数组，或无numpy时的list
+    """
+    damping = GraphConfig.PAGERANK_DAMPING if damping is None else damping
+    tol = GraphConfig.PAGERANK_TOL if tol is None else tol
+    max_iter = max_iter or GraphConfig.PAGERANK_MAX_ITER
+    n = graph.node_count
+    if n == 0:
+        return np.zeros(0) if np is not None else []
+
+    if np is None:
+        return _pagerank_python(graph, damping, tol, max_iter)
+
+    src = np.frombuffer(graph.edge_src, dtype=np.int32)
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int32)
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    edge_weight = 1.0 / out_degree[src]
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        spread = np.bincount(dst, weights=rank[src] * edge_weight, minlength=n)
+        new_rank = damping * spread + (damping * rank[dangling].sum() + 1 - damping) / n
+        delta = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if delta < tol:
+            break
+    return rank
+
+
+def _pagerank_python(graph, damping: float, tol: float, max_iter: int) -> List[float]:
+    n = graph.node_count
+    edge_src, edge_dst = graph.edge_src, graph.edge_dst
+    out_degree = [0] * n
+    for source in edge_src:
+        out_degree[source] += 1
+    dangling = [node for node in range(n) if out_degree[node] == 0]
+
+    rank = [1.0 / n] * n
+    for _ in range(max_iter):
+        base = (damping * sum(rank[node] for node in dangling) + 1 - damping) / n
+        new_rank = [base] * n
+        for source, target in zip(edge_src, edge_dst):
+            new_rank[target] += damping * rank[source] / out_degree[source]
+        delta = sum(abs(a - b) for a, b in zip(new_rank, rank))
+        rank = new_rank
+        if delta < tol:
+            break
+    return rank
+
+
+def _undirected_csr(graph):
+    """去重、去自环后的无向邻接（indptr, indices）"""
+    n = graph.node_count
+    src = np.frombuffer(graph.edge_src, dtype=np.int32).astype(np.int64)
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int32).astype(np.int64)
+    keep = src != dst
+    keys = np.unique(np.concatenate([src[keep] * n + dst[keep], dst[keep] * n + src[keep]]))
+    heads, tails = keys // n, keys % n
+    indptr = np.searchsorted(heads, np.arange(n + 1))
+    return indptr, tails
+
+
+def approximate_betweenness(graph, samples: int = None, seed: int = 0):
+    """
+    抽样源点估计的介数中心性（无向视图，按抽样比例放大）
+
+    Args:
+        samples: 抽样的源点数，默认 GraphConfig.BETWEENNESS_SAMPLES
+    """
+    if np is None:
+        raise RuntimeError('介数中心性需要numpy')
+    n = graph.node_count
+    betweenness = np.zeros(n)
+    if n == 0:
+        return betweenness
+    samples = min(samples or GraphConfig.BETWEENNESS_SAMPLES, n)
+    indptr, indices = _undirected_csr(graph)
+    sources = np.random.default_rng(seed).choice(n, samples, replace=False)
+
+    dist = np.full(n, -1, dtype=np.int64)
+    sigma = np.zeros(n)
+    delta = np.zeros(n)
+    for source in sources:
+        dist[source] = 0
+        sigma[source] = 1.0
+        frontier = np.array([source], dtype=np.int64)
+        visited = [frontier]
+        levels = []
+        depth = 0
+        # 正向：逐层BFS，统计最短路径条数
+        while len(frontier):
+            starts, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+            total = int(counts.sum())
+            if total == 0:
+                break
+            offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+            neighbors = indices[offsets]
+            parents = np.repeat(frontier, counts)
+            unseen = dist[neighbors] == -1
+            frontier = np.unique(neighbors[unseen])
+            dist[frontier] = depth + 1
+            on_path = dist[neighbors] == depth + 1
+            parents, children = parents[on_path], neighbors[on_path]
+            np.add.at(sigma, children, sigma[parents])
+            levels.append((parents, children))
+            visited.append(frontier)
+            depth += 1
+        # 反向：按层累计依赖值
+        for parents, children in reversed(levels):
+            np.add.at(delta, parents, sigma[parents] / sigma[children] * (1.0 + delta[children]))
+        delta[source] = 0.0
+        betweenness += delta
+
+        touched = np.concatenate(visited)
+        dist[touched] = -1
+        sigma[touched] = 0.0
+        delta[touched] = 0.0
+
+    # 无向图每条路径被两端各计一次
+    return betweenness * (n / samples) / 2.0
+
+
+def schedule_rankings(generation) -> None:
+    """新版本发布后在后台线程预先计算配置的排序方式"""
+    metrics = [metric for metric in GraphConfig.PRECOMPUTE_RANK_METRICS if metric in available_rank_metrics()]
+    if generation is None or not metrics:
+        return
+
+    def run():
+        for metric in metrics:
+            start = time.time()
+            try:
+                generation.store.ranking(metric)
+                print(f"[排序] {metric} 计算完成: 版本 {generation.version}, 耗时 {time.time() - start:.2f}s")
+            except Exception as e:
+                # 失败已记录在图谱上，请求时直接返回该错误
+                print(f"[警告] {metric} 计算失败: {e}")
+
+    threading.Thread(target=run, name='graph-ranking', daemon=True).start()
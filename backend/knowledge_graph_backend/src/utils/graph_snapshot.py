@@ -0,0 +1,320 @@
+"""
+知识图谱二进制快照
+将解析后的图谱保存为可内存映射(mmap)的二进制文件，启动时直接映射，
+避免每次重新解析CSV；多个进程映射同一文件时共享操作系统页缓存
+
+文件布局:
+    [魔数 8B][格式版本 u32][头部长度 u32][头部JSON][对齐填充][各数据段...]
+
+头部JSON记录来源CSV的大小、修改时间、抽样块哈希和全部内容指纹、节点/边数量以及各数据段的偏移、长度和类型码，
+启动时只按大小、修改时间和抽样块校验（与CSV大小无关），全部内容指纹在后台核对，
+所有数据段按8字节对齐，均为小端序的定长数组或UTF-8字节串
+
+命令行用法（在 backend/knowledge_graph_backend 目录下执行）:
+    python -m src.utils.graph_snapshot build Disease.csv
+    python -m src.utils.graph_snapshot info Disease.kgsnap [--csv Disease.csv]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.utils.graph_store import CompactGraph
+
+SNAPSHOT_MAGIC = b'KGSNAP\x00\x00'
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_SUFFIX = '.kgsnap'
+
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 8
+
+
+class SnapshotError(Exception):
+    """快照文件无效或与来源CSV不匹配"""
+
+
+def get_snapshot_path(csv_file_path: str) -> str:
+    """获取CSV文件对应的默认快照路径"""
+    return os.path.splitext(csv_file_path)[0] + SNAPSHOT_SUFFIX
+
+
+def _pack_strings(strings: List[str]) -> Tuple[array, bytes]:
+    """将字符串表打包为偏移数组和UTF-8字节串"""
+    offsets = array('q', [0])
+    chunks = []
+    position = 0
+    for value in strings:
+        encoded = value.encode('utf-8')
+        chunks.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return offsets, b''.join(chunks)
+
+
+def _unpack_strings(offsets, blob) -> List[str]:
+    """从偏移数组和UTF-8字节串还原字符串表"""
+    data = bytes(blob)
+    return [
+        data[offsets[i]:offsets[i + 1]].decode('utf-8')
+        for i in range(len(offsets) - 1)
+    ]
+
+
+def write_snapshot(graph: CompactGraph, snapshot_path: str,
+                   source_info: Optional[Dict[str, Any]] = None,
+                   ingest_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    将图谱写入二进制快照
+
+    Args:
+        graph: 紧凑图谱
+        snapshot_path: 快照输出路径
+        source_info: 来源CSV指纹（路径、大小、哈希）
+        ingest_stats: 生成快照时的导入统计（含重复三元组报告），加载快照时沿用
+
+    Returns:
+        快照头部信息
+    """
+    node_offsets, node_blob = _pack_strings(graph.node_ids)
+    relation_offsets, relation_blob = _pack_strings(graph.relations)
+
+    sections = [
+        ('node_offsets', node_offsets),
+        ('node_blob', node_blob),
+        ('relation_offsets', relation_offsets),
+        ('relation_blob', relation_blob),
+        ('edge_src', graph.edge_src),
+        ('edge_rel', graph.edge_rel),
+        ('edge_dst', graph.edge_dst),
+        ('out_offsets', graph.out_offsets),
+        ('out_edges', graph.out_edges),
+        ('in_offsets', graph.in_offsets),
+        ('in_edges', graph.in_edges),
+        ('rel_offsets', graph.rel_offsets),
+        ('rel_edges', graph.rel_edges),
+        ('rank_order', graph.rank_order),
+    ]
+
+    header: Dict[str, Any] = {
+        'created_at': time.time(),
+        'source': source_info or {},
+        'ingest': ingest_stats or {},
+        'node_count': graph.node_count,
+        'edge_count': graph.edge_count,
+        'relation_count': len(graph.relations),
+        'byteorder': 'little',
+        'sections': {},
+    }
+
+    # 先计算各段偏移：头部长度依赖偏移值，迭代直到稳定
+    payloads = []
+    for name, data in sections:
+        if isinstance(data, bytes):
+            payloads.append((name, 'B', data))
+            continue
+        # 数组可能来自array或快照的memoryview，统一转为小端序字节
+        typecode = data.typecode if isinstance(data, array) else data.format
+        data = array(typecode, data)
+        if sys.byteorder != 'little':
+            data.byteswap()
+        payloads.append((name, typecode, data.tobytes()))
+
+    header_bytes = b''
+    for _ in range(4):
+        position = _PREAMBLE.size + len(header_bytes)
+        for name, typecode, payload in payloads:
+            position += -position % _ALIGNMENT
+            header['sections'][name] = {'offset': position, 'length': len(payload), 'typecode': typecode}
+            position += len(payload)
+        new_header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        # 长度不变说明偏移已稳定，写入的必须是包含最终偏移的这一版头部
+        stable = len(new_header_bytes) == len(header_bytes)
+        header_bytes = new_header_bytes
+        if stable:
+            break
+
+    # 写入临时文件后原子替换，避免运行中的进程映射到半写入的文件
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, typecode, payload in payloads:
+            f.write(b'\x00' * (header['sections'][name]['offset'] - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, snapshot_path)
+    return header
+
+
+class GraphSnapshot:
+    """内存映射的只读图谱快照"""
+
+    def __init__(self, snapshot_path: str):
+        self.path = snapshot_path
+        # mmap会复制文件描述符，映射建立后即可关闭文件
+        with open(snapshot_path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"快照文件为空: {snapshot_path}")
+
+        try:
+            magic, version, header_length = _PREAMBLE.unpack_from(self._mmap, 0)
+        except struct.error:
+            self.close()
+            raise SnapshotError(f"快照文件已损坏: {snapshot_path}")
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise SnapshotError(f"不是知识图谱快照文件: {snapshot_path}")
+        if version != SNAPSHOT_FORMAT_VERSION:
+            self.close()
+            raise SnapshotError(f"快照格式版本不匹配: {version} != {SNAPSHOT_FORMAT_VERSION}")
+
+        header_start = _PREAMBLE.size
+        self.header: Dict[str, Any] = json.loads(
+            self._mmap[header_start:header_start + header_length].decode('utf-8')
+        )
+        if self.header.get('byteorder') != sys.byteorder:
+            self.close()
+            raise SnapshotError("快照字节序与当前平台不一致")
+
+    def section(self, name: str):
+        """以零拷贝方式获取数据段（定长数组返回memoryview）"""
+        info = self.header['sections'].get(name)
+        if info is None:
+            raise SnapshotError(f"快照缺少数据段: {name}")
+        view = memoryview(self._mmap)[info['offset']:info['offset'] + info['length']]
+        if info['typecode'] == 'B':
+            return view
+        return view.cast(info['typecode'])
+
+    def matches_source(self, source_info: Dict[str, Any]) -> bool:
+        """
+        检查快照是否由当前CSV文件生成：比较大小、修改时间和抽样块哈希，读取量与文件大小无关；
+        全部内容的指纹由加载方在后台核对（或用 info --csv 校验）
+        """
+        recorded = self.header.get('source', {})
+        # 早期快照没有记录抽样哈希或全部内容指纹，一律视为过期
+        # 去重设置不同的快照边集不同（早期快照未去重，视为False）
+        return (bool(recorded.get('sample')) and bool(recorded.get('fingerprint')) and
+                recorded.get('size') == source_info.get('size') and
+                recorded.get('mtime') == source_info.get('mtime') and
+                recorded.get('sample') == source_info.get('sample') and
+                recorded.get('dedupe', False) == source_info.get('dedupe', False))
+
+    def to_compact_graph(self) -> CompactGraph:
+        """
+        直接基于映射内存构建紧凑图谱
+        边数组和邻接数组零拷贝引用快照，只有字符串表需要解码
+        """
+        node_ids = _unpack_strings(self.section('node_offsets'), self.section('node_blob'))
+        relations = _unpack_strings(self.section('relation_offsets'), self.section('relation_blob'))
+        csr = {
+            name: self.section(name)
+            for name in ('out_offsets', 'out_edges', 'in_offsets', 'in_edges', 'rel_offsets', 'rel_edges')
+        }
+        return CompactGraph(
+            node_ids, relations,
+            self.section('edge_src'), self.section('edge_rel'), self.section('edge_dst'),
+            csr=csr, rank_order=self.section('rank_order')
+        )
+
+    def close(self) -> None:
+        """关闭映射（已被图谱引用的映射由垃圾回收在最后一个引用释放后关闭）"""
+        try:
+            self._mmap.close()
+        except (BufferError, AttributeError):
+            pass
+
+
+def load_snapshot(snapshot_path: str, source_info: Optional[Dict[str, Any]] = None) -> Optional[GraphSnapshot]:
+    """
+    加载快照文件
+
+    Args:
+        snapshot_path: 快照路径
+        source_info: 当前CSV指纹，提供时会校验快照是否过期
+
+    Returns:
+        有效的快照对象；文件不存在、损坏或已过期时返回None
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        snapshot = GraphSnapshot(snapshot_path)
+    except (OSError, SnapshotError, ValueError) as e:
+        print(f"[快照] 无法使用快照 {snapshot_path}: {str(e)}")
+        return None
+    if source_info is not None and not snapshot.matches_source(source_info):
+        print(f"[快照] 快照已过期，来源CSV已变化: {snapshot_path}")
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def build_snapshot(csv_file_path: str, snapshot_path: Optional[str] = None) -> Dict[str, Any]:
+    """解析CSV并生成快照（供部署前离线执行）"""
+    from src.utils.graph_cache import KnowledgeGraphCache
+
+    snapshot_path = snapshot_path or get_snapshot_path(csv_file_path)
+    cache = KnowledgeGraphCache()
+    start_time = time.time()
+    source_info = cache._get_source_info(csv_file_path)
+    graph, stats = cache._parse_csv_optimized(csv_file_path)
+    parse_time = time.time() - start_time
+    # 解析期间文件被追加时快照与文件不一致，加载时会视为过期；指纹按实际解析的字节数记录
+    source_info['fingerprint'] = cache._get_content_fingerprint(csv_file_path, stats.get('bytes', source_info['size']))
+
+    header = write_snapshot(graph, snapshot_path, source_info, stats)
+    print(f"[快照] 已生成 {snapshot_path}: 节点 {header['node_count']}, 边 {header['edge_count']}, "
+          f"解析耗时 {parse_time:.2f}s, 总耗时 {time.time() - start_time:.2f}s, "
+          f"大小 {os.path.getsize(snapshot_path) / 1024 / 1024:.1f}MB")
+    return header
+
+
+def verify_snapshot_source(header: Dict[str, Any], csv_file_path: str) -> bool:
+    """按全部内容指纹校验快照是否由该CSV生成（读取整个文件）"""
+    from src.utils.graph_cache import KnowledgeGraphCache
+
+    recorded = header.get('source', {})
+    size = recorded.get('size', -1)
+    fingerprint = KnowledgeGraphCache()._get_content_fingerprint(csv_file_path, size) if size >= 0 else ""
+    matched = bool(fingerprint) and fingerprint == recorded.get('fingerprint') and \
+        os.path.getsize(csv_file_path) == size
+    print(f"[快照] 全部内容校验{'通过' if matched else '未通过'}: {csv_file_path}")
+    return matched
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='知识图谱二进制快照工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='由CSV生成快照')
+    build_parser.add_argument('csv_file', help='来源CSV文件')
+    build_parser.add_argument('-o', '--output', help='快照输出路径（默认与CSV同名，后缀.kgsnap）')
+
+    info_parser = subparsers.add_parser('info', help='查看快照信息')
+    info_parser.add_argument('snapshot_file', help='快照文件')
+    info_parser.add_argument('--csv', help='校验快照是否与该CSV的全部内容一致（不一致时返回1）')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        build_snapshot(args.csv_file, args.output)
+        return 0
+
+    snapshot = load_snapshot(args.snapshot_file)
+    if snapshot is None:
+        return 1
+    print(json.dumps(snapshot.header, ensure_ascii=False, indent=2))
+    snapshot.close()
+    if args.csv:
+        return 0 if verify_snapshot_source(snapshot.header, args.csv) else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,683 @@
+"""
+紧凑图谱存储
+节点ID和关系类型驻留为整数，边以三个int32数组保存，出/入邻接使用
+CSR(偏移+目标)数组表示；节点和边字典只在序列化响应时按需生成
+"""
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时使用纯Python实现
+    np = None
+
+from src.utils.graph_rank import RANK_METRICS, RankingError, approximate_betweenness, pagerank
+
+
+def _int_array(values: Iterable[int] = ()) -> array:
+    """创建int32数组"""
+    return array('i', values)
+
+
+def build_csr(keys, node_count: int) -> Tuple[array, array]:
+    """
+    按键对边做计数排序，构建CSR邻接
+
+    Args:
+        keys: 每条边的分组键（源节点或目标节点）
+        node_count: 节点数量
+
+    Returns:
+        (offsets, edge_ids)：第i个节点的边为 edge_ids[offsets[i]:offsets[i+1]]
+    """
+    edge_count = len(keys)
+    if np is not None and edge_count:
+        key_array = np.frombuffer(keys, dtype=np.int32) if isinstance(keys, (array, memoryview)) \
+            else np.asarray(keys, dtype=np.int32)
+        counts = np.bincount(key_array, minlength=node_count)
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        order = np.argsort(key_array, kind='stable').astype(np.int32)
+        offsets_array = array('q')
+        offsets_array.frombytes(offsets.tobytes())
+        edge_ids = array('i')
+        edge_ids.frombytes(order.tobytes())
+        return offsets_array, edge_ids
+
+    offsets = array('q', bytes(8 * (node_count + 1)))
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(node_count):
+        offsets[i + 1] += offsets[i]
+    positions = array('q', offsets)
+    edge_ids = array('i', bytes(4 * edge_count))
+    for edge_id, key in enumerate(keys):
+        edge_ids[positions[key]] = edge_id
+        positions[key] += 1
+    return offsets, edge_ids
+
+
+def extend_csr(offsets, edge_ids, keys, start: int, group_count: int) -> Tuple[array, array]:
+    """
+    在前start条边的CSR上追加其后的边，结果与 build_csr(keys, group_count) 一致：
+    已有的边按组整段后移，新增的边按键计数排序后放到各组末尾（边编号更大），不对全部边重新排序
+
+    Args:
+        offsets/edge_ids: 前start条边的CSR（组数可少于group_count，多出的组为新节点或新关系）
+        keys: 全部边的分组键
+    """
+    if np is None or not start:
+        return build_csr(keys, group_count)
+    old_offsets = np.frombuffer(offsets, dtype=np.int64)
+    old_groups = len(old_offsets) - 1
+    tail = np.frombuffer(keys, dtype=np.int32)[start:]
+    counts = np.zeros(group_count, dtype=np.int64)
+    counts[:old_groups] = np.diff(old_offsets)
+    tail_counts = np.bincount(tail, minlength=group_count)
+    new_offsets = np.zeros(group_count + 1, dtype=np.int64)
+    np.cumsum(counts + tail_counts, out=new_offsets[1:])
+
+    merged = np.empty(len(keys), dtype=np.int32)
+    shift = new_offsets[:old_groups] - old_offsets[:-1]
+    merged[np.arange(start, dtype=np.int64) + np.repeat(shift, counts[:old_groups])] = \
+        np.frombuffer(edge_ids, dtype=np.int32)
+    order = np.argsort(tail, kind='stable')
+    sorted_keys = tail[order]
+    rank = np.arange(len(tail), dtype=np.int64) - (np.cumsum(tail_counts) - tail_counts)[sorted_keys]
+    merged[new_offsets[sorted_keys] + counts[sorted_keys] + rank] = order.astype(np.int32) + start
+
+    offsets_array = array('q')
+    offsets_array.frombytes(new_offsets.tobytes())
+    merged_ids = array('i')
+    merged_ids.frombytes(merged.tobytes())
+    return offsets_array, merged_ids
+
+
+class EdgeKeySet:
+    """
+    边的 (源, 关系, 目标) 键集合（需要numpy），追加导入时只对新增的边查重
+    按关系分组，组内键为 源 << 31 | 目标；每组由若干有序段组成，追加时新增一段，
+    新段不小于前一段的一半时与之合并（每条边被合并的次数为对数级）。
+    extend 返回新的集合，未变化的段在图谱版本之间共享
+    """
+
+    def __init__(self, groups: Optional[Dict[int, Tuple[Any, ...]]] = None):
+        self.groups = groups or {}
+
+    @staticmethod
+    def _keys(src, dst):
+        return (np.asarray(src, dtype=np.int64) << 31) | np.asarray(dst, dtype=np.int64)
+
+    @classmethod
+    def build(cls, edge_src, edge_rel, edge_dst) -> 'EdgeKeySet':
+        if not len(edge_src):
+            return cls()
+        return cls().extend(np.frombuffer(edge_src, dtype=np.int32), np.frombuffer(edge_rel, dtype=np.int32),
+                            np.frombuffer(edge_dst, dtype=np.int32))
+
+    def extend(self, src, rel, dst) -> 'EdgeKeySet':
+        """加入一批边（numpy数组），返回新的集合"""
+        if not len(src):
+            return self
+        rel = np.asarray(rel, dtype=np.int64)
+        keys = self._keys(src, dst)
+        order = np.lexsort((keys, rel))
+        rel, keys = rel[order], keys[order]
+        starts = np.flatnonzero(np.diff(rel)) + 1
+        groups = dict(self.groups)
+        for group, segment in zip(rel[np.concatenate([[0], starts])].tolist(), np.split(keys, starts)):
+            segments = list(groups.get(group, ()))
+            segments.append(segment)
+            while len(segments) > 1 and 2 * len(segments[-1]) >= len(segments[-2]):
+                merged = np.concatenate(segments[-2:])
+                merged.sort(kind='stable')
+                segments[-2:] = [merged]
+            groups[group] = tuple(segments)
+        return EdgeKeySet(groups)
+
+    def contains(self, src, rel, dst):
+        """每条边是否已在集合中（bool数组）"""
+        rel = np.asarray(rel, dtype=np.int64)
+        keys = self._keys(src, dst)
+        found = np.zeros(len(keys), dtype=bool)
+        for group in np.unique(rel).tolist():
+            segments = self.groups.get(group)
+            if not segments:
+                continue
+            members = np.flatnonzero(rel == group)
+            group_keys = keys[members]
+            hit = np.zeros(len(members), dtype=bool)
+            for segment in segments:
+                positions = np.minimum(np.searchsorted(segment, group_keys), len(segment) - 1)
+                hit |= segment[positions] == group_keys
+            found[members] = hit
+        return found
+
+
+class CompactGraph:
+    """整数驻留 + CSR邻接的只读图谱"""
+
+    def __init__(self, node_ids: List[str], relations: List[str],
+                 edge_src, edge_rel, edge_dst,
+                 csr: Optional[Dict[str, Any]] = None,
+                 rank_order=None, degree=None,
+                 node_index: Optional[Dict[str, int]] = None,
+                 relation_index: Optional[Dict[str, int]] = None,
+                 edge_keys: Optional[EdgeKeySet] = None):
+        """
+        Args:
+            node_ids: 节点ID表，下标即节点整数ID
+            relations: 关系类型表，下标即关系整数ID
+            edge_src/edge_rel/edge_dst: 每条边的源节点、关系、目标节点整数ID
+            csr: 预构建的邻接数组（来自快照或追加导入时无需重建）
+            rank_order: 预计算的度数排序
+            degree: 预先统计的度数（如并行导入合并的局部度数）
+            node_index/relation_index: 已有的驻留字典（来自GraphBuilder，避免重新生成）
+            edge_keys: 已有的边键集合（追加导入时由上一版本扩展而来）
+        """
+        self.node_ids = node_ids
+        self.node_index: Dict[str, int] = node_index if node_index is not None else \
+            {node_id: i for i, node_id in enumerate(node_ids)}
+        self.relations = relations
+        self.relation_index: Dict[str, int] = relation_index if relation_index is not None else \
+            {relation: i for i, relation in enumerate(relations)}
+        self.edge_src = edge_src
+        self.edge_rel = edge_rel
+        self.edge_dst = edge_dst
+
+        node_count = len(node_ids)
+        if csr is None:
+            csr = {}
+            csr['out_offsets'], csr['out_edges'] = build_csr(edge_src, node_count)
+            csr['in_offsets'], csr['in_edges'] = build_csr(edge_dst, node_count)
+            csr['rel_offsets'], csr['rel_edges'] = build_csr(edge_rel, len(relations))
+        self.out_offsets = csr['out_offsets']
+        self.out_edges = csr['out_edges']
+        self.in_offsets = csr['in_offsets']
+        self.in_edges = csr['in_edges']
+        self.rel_offsets = csr['rel_offsets']
+        self.rel_edges = csr['rel_edges']
+
+        # 度数 = 出度 + 入度（自环计两次，与原解析器一致）
+        if degree is not None:
+            self.degree = degree
+        elif np is not None and node_count:
+            out_offsets = np.frombuffer(self.out_offsets, dtype=np.int64)
+            in_offsets = np.frombuffer(self.in_offsets, dtype=np.int64)
+            degree = (np.diff(out_offsets) + np.diff(in_offsets)).astype(np.int32)
+            self.degree = array('i')
+            self.degree.frombytes(degree.tobytes())
+        else:
+            self.degree = _int_array(
+                (self.out_offsets[i + 1] - self.out_offsets[i]) + (self.in_offsets[i + 1] - self.in_offsets[i])
+                for i in range(node_count)
+            )
+        self._rank_order = rank_order
+        self._rank_positions = None
+        # 其他排序方式的 (分数, 排序, 位置)，按需计算并缓存
+        self._rankings: Dict[str, Tuple[Any, array, array]] = {}
+        # 计算失败的排序方式 -> 错误信息，同一图谱不再重试
+        self._ranking_errors: Dict[str, str] = {}
+        self._ranking_lock = threading.Lock()
+        self._edge_keys = edge_keys
+
+    @classmethod
+    def empty(cls) -> 'CompactGraph':
+        """空图谱"""
+        return cls([], [], _int_array(), _int_array(), _int_array())
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_src)
+
+    @staticmethod
+    def _descending_order(scores) -> array:
+        """按分数降序的节点整数ID（稳定排序，分数相同时按节点ID）"""
+        if np is not None and len(scores):
+            order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable').astype(np.int32)
+            result = array('i')
+            result.frombytes(order.tobytes())
+            return result
+        return _int_array(sorted(range(len(scores)), key=lambda node: -scores[node]))
+
+    @staticmethod
+    def _inverse_permutation(order) -> array:
+        """排序 -> 节点整数ID到排序位置的映射"""
+        count = len(order)
+        if np is not None and count:
+            positions = np.empty(count, dtype=np.int32)
+            positions[np.frombuffer(order, dtype=np.int32)] = np.arange(count, dtype=np.int32)
+            result = array('i')
+            result.frombytes(positions.tobytes())
+            return result
+        result = _int_array(bytes(4 * count))
+        for position, node in enumerate(order):
+            result[node] = position
+        return result
+
+    @property
+    def rank_order(self):
+        """按连接数降序排列的节点整数ID（稳定排序，与原分页逻辑一致）"""
+        if self._rank_order is None:
+            self._rank_order = self._descending_order(self.degree)
+        return self._rank_order
+
+    @property
+    def rank_positions(self):
+        """节点整数ID -> 在度数排序中的位置（rank_order的逆排列，每个图谱只计算一次）"""
+        if self._rank_positions is None:
+            self._rank_positions = self._inverse_permutation(self.rank_order)
+        return self._rank_positions
+
+    def _metric_ranking(self, metric: str) -> Tuple[Any, array, array]:
+        ranking = self._rankings.get(metric)
+        if ranking is None:
+            # 后台预计算和请求可能同时触发，只计算一次
+            with self._ranking_lock:
+                ranking = self._rankings.get(metric)
+                if ranking is None:
+                    if metric in self._ranking_errors:
+                        raise RankingError(f'{metric} 计算失败: {self._ranking_errors[metric]}')
+                    try:
+                        scores = pagerank(self) if metric == 'pagerank' else approximate_betweenness(self)
+                    except Exception as e:
+                        self._ranking_errors[metric] = str(e) or type(e).__name__
+                        raise RankingError(f'{metric} 计算失败: {self._ranking_errors[metric]}') from e
+                    order = self._descending_order(scores)
+                    ranking = (scores, order, self._inverse_permutation(order))
+                    self._rankings[metric] = ranking
+        return ranking
+
+    def centrality(self, metric: str = 'degree'):
+        """
+        节点重要性分数（下标为节点整数ID）
+
+        Args:
+            metric: degree / pagerank / betweenness
+        """
+        if metric not in RANK_METRICS:
+            raise ValueError(f'不支持的排序方式: {metric}')
+        if metric == 'degree':
+            return self.degree
+        return self._metric_ranking(metric)[0]
+
+    def ranking(self, metric: str = 'degree') -> Tuple[array, array]:
+        """(按分数降序的节点整数ID, 节点整数ID -> 排序位置)，每个图谱每种方式只计算一次"""
+        if metric not in RANK_METRICS:
+            raise ValueError(f'不支持的排序方式: {metric}')
+        if metric == 'degree':
+            return self.rank_order, self.rank_positions
+        _, order, positions = self._metric_ranking(metric)
+        return order, positions
+
+    def edge_key_set(self) -> EdgeKeySet:
+        """边键集合（需要numpy），首次调用时构建；追加导入产生的新图谱在此基础上扩展"""
+        if self._edge_keys is None:
+            self._edge_keys = EdgeKeySet.build(self.edge_src, self.edge_rel, self.edge_dst)
+        return self._edge_keys
+
+    def node_dict(self, node: int) -> Dict[str, Any]:
+        """生成节点字典（仅在序列化时调用）"""
+        node_id = self.node_ids[node]
+        return {
+            'id': node_id,
+            'label': node_id,
+            'type': 'entity',
+            'connections': self.degree[node]
+        }
+
+    def edge_dict(self, edge: int) -> Dict[str, Any]:
+        """生成边字典（仅在序列化时调用）"""
+        relation = self.relations[self.edge_rel[edge]]
+        return {
+            'source': self.node_ids[self.edge_src[edge]],
+            'target': self.node_ids[self.edge_dst[edge]],
+            'relation': relation,
+            'label': relation
+        }
+
+    def get_node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """按字符串ID获取节点字典"""
+        node = self.node_index.get(node_id)
+        return self.node_dict(node) if node is not None else None
+
+    def out_edge_ids(self, node: int):
+        """节点的出边ID"""
+        return self.out_edges[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def in_edge_ids(self, node: int):
+        """节点的入边ID"""
+        return self.in_edges[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    def incident_edge_ids(self, node: int, direction: str = 'both',
+                          relations: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        节点的关联边ID（按原始边顺序，自环只出现一次），代价O(度数)
+
+        Args:
+            node: 节点整数ID
+            direction: 'out' 出边 / 'in' 入边 / 'both' 双向
+            relations: 只保留这些关系整数ID的边，None表示不过滤
+        """
+        if direction == 'out':
+            edge_ids = list(self.out_edge_ids(node))
+        elif direction == 'in':
+            edge_ids = list(self.in_edge_ids(node))
+        else:
+            edge_ids = sorted(set(self.out_edge_ids(node)) | set(self.in_edge_ids(node)))
+        if relations is not None:
+            relations = set(relations)
+            edge_rel = self.edge_rel
+            edge_ids = [edge for edge in edge_ids if edge_rel[edge] in relations]
+        return edge_ids
+
+    def induced_edge_ids(self, nodes: Iterable[int]) -> List[int]:
+        """节点集合内部的边（按原始边顺序），代价为这些节点的出度之和"""
+        members = set(nodes)
+        edge_dst = self.edge_dst
+        edge_ids = [edge for node in members for edge in self.out_edge_ids(node) if edge_dst[edge] in members]
+        edge_ids.sort()
+        return edge_ids
+
+    def relation_edge_ids(self, relation: int):
+        """某关系类型的全部边ID"""
+        return self.rel_edges[self.rel_offsets[relation]:self.rel_offsets[relation + 1]]
+
+    def relation_counts(self) -> Dict[str, int]:
+        """关系类型字典：关系 -> 边数（按关系编号顺序）"""
+        offsets = self.rel_offsets
+        return {relation: offsets[i + 1] - offsets[i] for i, relation in enumerate(self.relations)}
+
+    def to_graph_data(self, version: int = 0) -> 'GraphData':
+        """包装为兼容旧接口的nodes/edges字典"""
+        return GraphData(self, version)
+
+
+class GraphBuilder:
+    """
+    边逐条加入时完成字符串驻留，最后一次性构建CompactGraph
+    由已有图谱继续追加时（from_graph），去重只检查新增的边，邻接数组在原图谱的基础上合并
+    """
+
+    def __init__(self):
+        self.node_ids: List[str] = []
+        self.node_index: Dict[str, int] = {}
+        self.relations: List[str] = []
+        self.relation_index: Dict[str, int] = {}
+        self.edge_src = _int_array()
+        self.edge_rel = _int_array()
+        self.edge_dst = _int_array()
+        # 并行导入时由各分块的局部度数累加而来；追加导入时继承自原图谱
+        self.degree: Optional[array] = None
+        # 已计入 degree 的边数，其后的边在 build() 时补充累加
+        self._degree_edges = 0
+        # 追加导入的原图谱及其边数（前这么多条边与原图谱一致）
+        self._base: Optional[CompactGraph] = None
+        self._base_edges = 0
+
+    @classmethod
+    def from_graph(cls, graph: CompactGraph) -> 'GraphBuilder':
+        """以已有图谱为起点继续追加边（复制驻留表、边数组和度数，原图谱保持不变）"""
+        builder = cls()
+        builder.node_ids = list(graph.node_ids)
+        builder.node_index = dict(graph.node_index)
+        builder.relations = list(graph.relations)
+        builder.relation_index = dict(graph.relation_index)
+        builder.edge_src.frombytes(memoryview(graph.edge_src).cast('B'))
+        builder.edge_rel.frombytes(memoryview(graph.edge_rel).cast('B'))
+        builder.edge_dst.frombytes(memoryview(graph.edge_dst).cast('B'))
+        builder.degree = _int_array()
+        builder.degree.frombytes(memoryview(graph.degree).cast('B'))
+        builder._degree_edges = len(builder.edge_src)
+        builder._base = graph
+        builder._base_edges = graph.edge_count
+        return builder
+
+    def _intern_node(self, node_id: str) -> int:
+        node = self.node_index.get(node_id)
+        if node is None:
+            node = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+        return node
+
+    def _intern_relation(self, relation: str) -> int:
+        rel = self.relation_index.get(relation)
+        if rel is None:
+            rel = self.relation_index[relation] = len(self.relations)
+            self.relations.append(relation)
+        return rel
+
+    def add_edge(self, source: str, relation: str, target: str) -> None:
+        """加入一条边（节点按首次出现顺序编号：先源后目标）"""
+        self.edge_src.append(self._intern_node(source))
+        self.edge_rel.append(self._intern_relation(relation))
+        self.edge_dst.append(self._intern_node(target))
+
+    def merge_chunk(self, chunk: Dict[str, Any]) -> None:
+        """
+        合并一个独立解析的分块（局部驻留表 + 局部整数边 + 局部度数）
+        分块需按文件顺序合并，以保证节点编号与逐行解析一致
+        """
+        node_map = _int_array(self._intern_node(node_id) for node_id in chunk['node_ids'])
+        relation_map = _int_array(self._intern_relation(relation) for relation in chunk['relations'])
+
+        for target, key, mapping in ((self.edge_src, 'edge_src', node_map),
+                                     (self.edge_rel, 'edge_rel', relation_map),
+                                     (self.edge_dst, 'edge_dst', node_map)):
+            local = _int_array()
+            local.frombytes(chunk[key])
+            if np is not None and len(local):
+                remapped = np.frombuffer(mapping, dtype=np.int32)[np.frombuffer(local, dtype=np.int32)]
+                target.frombytes(remapped.astype(np.int32).tobytes())
+            else:
+                target.extend(mapping[i] for i in local)
+
+        # 合并局部度数
+        local_degree = _int_array()
+        local_degree.frombytes(chunk['degree'])
+        if self.degree is None:
+            self.degree = _int_array()
+        self.degree.extend([0] * (len(self.node_ids) - len(self.degree)))
+        for local_node, count in enumerate(local_degree):
+            self.degree[node_map[local_node]] += count
+        self._degree_edges = len(self.edge_src)
+
+    def _fold_degree(self) -> None:
+        """将尚未计入度数的边（如追加的新边）累加到已有度数上"""
+        start = self._degree_edges
+        self.degree.extend([0] * (len(self.node_ids) - len(self.degree)))
+        if np is not None and len(self.edge_src) > start:
+            degree = np.frombuffer(self.degree, dtype=np.int32).astype(np.int64)
+            node_count = len(self.node_ids)
+            degree += np.bincount(np.frombuffer(self.edge_src, dtype=np.int32)[start:], minlength=node_count)
+            degree += np.bincount(np.frombuffer(self.edge_dst, dtype=np.int32)[start:], minlength=node_count)
+            self.degree = _int_array()
+            self.degree.frombytes(degree.astype(np.int32).tobytes())
+        else:
+            for edge in range(start, len(self.edge_src)):
+                self.degree[self.edge_src[edge]] += 1
+                self.degree[self.edge_dst[edge]] += 1
+        self._degree_edges = len(self.edge_src)
+
+    def drop_duplicates(self, report_limit: int = 100) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        去除重复的(源, 关系, 目标)三元组，只保留首次出现的边
+        由已有图谱追加时原图谱已去重，只检查新增的边（与原图谱的边键集合以及新增边之间）
+
+        Args:
+            report_limit: 报告中最多列出的重复三元组数量
+
+        Returns:
+            (丢弃的边数, [{'source', 'relation', 'target', 'duplicates'}]，按首次重复出现的顺序)
+        """
+        start = self._base_edges
+        edge_count = len(self.edge_src)
+        if edge_count == start:
+            return 0, []
+
+        if np is not None:
+            src = np.frombuffer(self.edge_src, dtype=np.int32)[start:].astype(np.int64)
+            rel = np.frombuffer(self.edge_rel, dtype=np.int32)[start:].astype(np.int64)
+            dst = np.frombuffer(self.edge_dst, dtype=np.int32)[start:].astype(np.int64)
+            node_count = max(len(self.node_ids), 1)
+            relation_count = max(len(self.relations), 1)
+            if node_count * node_count * relation_count < 2 ** 62:
+                keys = (src * relation_count + rel) * node_count + dst
+                _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            else:
+                _, first, inverse = np.unique(np.stack([src, rel, dst], axis=1), axis=0,
+                                              return_index=True, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            keep = np.zeros(edge_count - start, dtype=bool)
+            keep[first] = True
+            if start:
+                # 与原图谱重复的新增边全部丢弃
+                keep &= ~self._base.edge_key_set().contains(src, rel, dst)
+            if keep.all():
+                return 0, []
+            dropped = np.flatnonzero(~keep)
+            # 每个重复三元组丢弃的次数，按首次重复出现的位置排序
+            _, group_first, group_counts = np.unique(inverse[dropped], return_index=True, return_counts=True)
+            order = np.argsort(group_first, kind='stable')[:report_limit]
+            report_edges = [(start + int(dropped[group_first[i]]), int(group_counts[i])) for i in order]
+            dropped_edges = (dropped + start).tolist()
+        else:
+            seen = set(zip(self.edge_src[:start], self.edge_rel[:start], self.edge_dst[:start]))
+            counts: Dict[Tuple[int, int, int], List[int]] = {}
+            dropped_edges = []
+            for edge in range(start, edge_count):
+                key = (self.edge_src[edge], self.edge_rel[edge], self.edge_dst[edge])
+                if key in seen:
+                    dropped_edges.append(edge)
+                    if key in counts:
+                        counts[key][1] += 1
+                    else:
+                        counts[key] = [edge, 1]
+                else:
+                    seen.add(key)
+            if not dropped_edges:
+                return 0, []
+            report_edges = [(edge, count) for edge, count in list(counts.values())[:report_limit]]
+
+        report = [{
+            'source': self.node_ids[self.edge_src[edge]],
+            'relation': self.relations[self.edge_rel[edge]],
+            'target': self.node_ids[self.edge_dst[edge]],
+            'duplicates': count,
+        } for edge, count in report_edges]
+
+        # 已计入度数的重复边（并行导入合并的局部度数）需要扣除
+        counted = self._degree_edges
+        counted_dropped = [edge for edge in dropped_edges if edge < counted]
+        if self.degree is not None:
+            for edge in counted_dropped:
+                self.degree[self.edge_src[edge]] -= 1
+                self.degree[self.edge_dst[edge]] -= 1
+        self._degree_edges = counted - len(counted_dropped)
+
+        # 只改写 start 之后的部分，原图谱的边不复制
+        dropped_set = None if np is not None else set(dropped_edges)
+        for name in ('edge_src', 'edge_rel', 'edge_dst'):
+            values = getattr(self, name)
+            if np is not None:
+                kept = np.frombuffer(values, dtype=np.int32)[start:][keep].tobytes()
+                del values[start:]
+                values.frombytes(kept)
+            else:
+                kept = [v for i, v in enumerate(values[start:], start) if i not in dropped_set]
+                del values[start:]
+                values.extend(kept)
+        return len(dropped_edges), report
+
+    def __len__(self) -> int:
+        return len(self.edge_src)
+
+    def build(self) -> CompactGraph:
+        """构建图谱（驻留表和边数组直接交给图谱，之后不应再向本构建器加入边）"""
+        if self.degree is not None:
+            self._fold_degree()
+        base, start = self._base, self._base_edges
+        csr, edge_keys = None, None
+        if base is not None and np is not None:
+            # 追加：在原图谱的邻接上合并新增的边
+            node_count, relation_count = len(self.node_ids), len(self.relations)
+            csr = {}
+            csr['out_offsets'], csr['out_edges'] = extend_csr(base.out_offsets, base.out_edges,
+                                                              self.edge_src, start, node_count)
+            csr['in_offsets'], csr['in_edges'] = extend_csr(base.in_offsets, base.in_edges,
+                                                            self.edge_dst, start, node_count)
+            csr['rel_offsets'], csr['rel_edges'] = extend_csr(base.rel_offsets, base.rel_edges,
+                                                              self.edge_rel, start, relation_count)
+            if base._edge_keys is not None:
+                edge_keys = base._edge_keys.extend(*(np.frombuffer(values, dtype=np.int32)[start:]
+                                                     for values in (self.edge_src, self.edge_rel, self.edge_dst)))
+        return CompactGraph(self.node_ids, self.relations, self.edge_src, self.edge_rel, self.edge_dst,
+                            csr=csr, degree=self.degree, node_index=self.node_index,
+                            relation_index=self.relation_index, edge_keys=edge_keys)
+
+
+class NodeList(Sequence):
+    """按需生成节点字典的只读序列"""
+
+    def __init__(self, graph: CompactGraph):
+        self.graph = graph
+
+    def __len__(self) -> int:
+        return self.graph.node_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.graph.node_dict(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.graph.node_dict(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        node_dict = self.graph.node_dict
+        for i in range(len(self)):
+            yield node_dict(i)
+
+
+class EdgeList(Sequence):
+    """按需生成边字典的只读序列"""
+
+    def __init__(self, graph: CompactGraph):
+        self.graph = graph
+
+    def __len__(self) -> int:
+        return self.graph.edge_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.graph.edge_dict(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.graph.edge_dict(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        edge_dict = self.graph.edge_dict
+        for i in range(len(self)):
+            yield edge_dict(i)
+
+
+class GraphData(dict):
+    """
+    兼容旧接口的图谱数据：{'nodes': ..., 'edges': ...}
+    nodes/edges为惰性序列，底层紧凑存储可通过 .store 访问，
+    所属缓存版本号可通过 .version 访问（用于按版本缓存派生结果）
+    """
+
+    def __init__(self, store: CompactGraph, version: int = 0):
+        super().__init__(nodes=NodeList(store), edges=EdgeList(store))
+        self.store = store
+        self.version = version
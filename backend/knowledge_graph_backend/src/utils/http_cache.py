@@ -0,0 +1,59 @@
+"""
+HTTP条件请求
+读接口的ETag由图谱版本标识和请求参数生成，Last-Modified取该代数据的发布时间；
+客户端携带 If-None-Match / If-Modified-Since 且图谱未变化时直接返回304
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from flask import make_response, request
+
+
+def compute_etag(version_id: str) -> str:
+    """版本标识 + 路径 + 排序后的查询参数 + Accept（决定序列化格式） -> ETag值"""
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    accept = request.headers.get('Accept', '')
+    digest = hashlib.blake2b(f'{version_id}|{request.path}|{params}|{accept}'.encode('utf-8'), digest_size=12)
+    return digest.hexdigest()
+
+
+def conditional_get(get_generation: Callable[[], Optional[Any]]):
+    """
+    生成视图装饰器：为GET/HEAD请求加上基于图谱版本的ETag和Last-Modified
+
+    Args:
+        get_generation: 返回当前一代图谱数据（需有 version_id 和 timestamp），未加载时返回None
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            generation = get_generation()
+            if generation is None:
+                return view(*args, **kwargs)
+
+            # 弱ETag：内容相同但压缩编码不同的响应也视为同一版本
+            etag = compute_etag(generation.version_id)
+            last_modified = datetime.fromtimestamp(int(generation.timestamp), tz=timezone.utc)
+            not_modified = (
+                request.if_none_match.contains_weak(etag) if request.if_none_match
+                else request.if_modified_since is not None and request.if_modified_since >= last_modified
+            )
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # 处理期间发布了新一代数据（响应内容可能来自新版本）或视图禁止缓存时，不设置缓存头
+                if response.status_code != 200 or get_generation() is not generation \
+                        or response.cache_control.no_store:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            # 浏览器每次都带条件头重新验证
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+"""
+字符n-gram倒排索引
+中文标签没有空格，无法按词切分，因此按字切分：每个标签的单字和相邻两字
+分别建立倒排表（节点整数ID升序）。子串查询取查询中各二元组倒排表的交集，
+再对候选逐个校验，结果与 `query in label` 线性扫描完全一致
+
+有numpy时倒排表为CSR数组（gram键有序数组 + 偏移 + 节点数组），整个构建过程向量化；
+否则使用 gram -> array('i') 字典
+"""
+from array import array
+from collections import defaultdict
+from typing import List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时使用字典倒排表
+    np = None
+
+# 最短倒排表不超过该长度时直接逐个校验，不再与其他倒排表求交
+_VERIFY_THRESHOLD = 256
+
+# 追加导入产生的分段超过该数量时合并重建
+_MAX_SEGMENTS = 8
+
+
+def _gram_key(gram: str) -> int:
+    """gram编码为整数：单字为码点，二元组为 (首字码点+1)<<21 | 次字码点"""
+    if len(gram) == 1:
+        return ord(gram)
+    return ((ord(gram[0]) + 1) << 21) | ord(gram[1])
+
+
+class _ArraySegment:
+    """numpy CSR倒排表，覆盖节点区间 [start, end)"""
+
+    def __init__(self, labels: Sequence[str], start: int):
+        lowered = [labels[node].lower() for node in range(start, len(labels))]
+        lengths = np.fromiter(map(len, lowered), dtype=np.int64, count=len(lowered))
+        # 标签以一个占位字符相连，占位位置由长度推出，不依赖标签内容
+        codes = np.frombuffer('\x00'.join(lowered).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        node_of = np.repeat(np.arange(start, len(labels), dtype=np.int32), lengths + 1)[:len(codes)]
+        separator = np.zeros(len(codes) + 1, dtype=bool)
+        separator[np.cumsum(lengths + 1) - 1] = True
+        separator = separator[:len(codes)]
+
+        unigram = ~separator
+        bigram = ~(separator[:-1] | separator[1:])
+        keys = np.concatenate([codes[unigram], ((codes[:-1][bigram] + 1) << 21) | codes[1:][bigram]])
+        nodes = np.concatenate([node_of[unigram], node_of[:-1][bigram]])
+
+        # 按gram稳定排序后同一gram内节点升序，去掉同一标签内重复的gram
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        nodes = nodes[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (nodes[1:] != nodes[:-1])
+        keys = keys[keep]
+        self.nodes = nodes[keep]
+
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else \
+            np.zeros(0, dtype=np.int64)
+        self.keys = keys[starts]
+        self.offsets = np.append(starts, len(keys))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def postings(self, gram: str):
+        key = _gram_key(gram)
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        return self.nodes[self.offsets[i]:self.offsets[i + 1]]
+
+    @staticmethod
+    def intersect(lists) -> List[int]:
+        merged = lists[0]
+        for nodes in lists[1:]:
+            merged = np.intersect1d(merged, nodes, assume_unique=True)
+            if not len(merged):
+                break
+        return merged.tolist()
+
+
+class _DictSegment:
+    """纯Python倒排表，覆盖节点区间 [start, end)"""
+
+    def __init__(self, labels: Sequence[str], start: int):
+        postings = defaultdict(list)
+        for node in range(start, len(labels)):
+            label = labels[node].lower()
+            grams = set(label)
+            grams.update(label[i:i + 2] for i in range(len(label) - 1))
+            for gram in grams:
+                postings[gram].append(node)
+        self._postings = {gram: array('i', nodes) for gram, nodes in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def postings(self, gram: str):
+        return self._postings.get(gram)
+
+    @staticmethod
+    def intersect(lists) -> List[int]:
+        merged = set(lists[0])
+        for nodes in lists[1:]:
+            merged.intersection_update(nodes)
+        return sorted(merged)
+
+
+class NgramIndex:
+    """
+    不可变的n-gram倒排索引
+    追加节点时为新节点单独建立一个分段并返回新索引（原索引保持不变）
+    """
+
+    def __init__(self, segments: List, size: int):
+        self._segments = segments
+        self.size = size
+
+    @classmethod
+    def build(cls, labels: Sequence[str]) -> 'NgramIndex':
+        """为全部标签建立索引，下标即节点整数ID"""
+        return cls([cls._segment(labels, 0)], len(labels))
+
+    @staticmethod
+    def _segment(labels: Sequence[str], start: int):
+        return _ArraySegment(labels, start) if np is not None else _DictSegment(labels, start)
+
+    def extend(self, labels: Sequence[str]) -> 'NgramIndex':
+        """加入编号不小于 self.size 的新标签"""
+        if len(labels) <= self.size:
+            return self
+        if len(self._segments) >= _MAX_SEGMENTS:
+            return NgramIndex.build(labels)
+        return NgramIndex(self._segments + [self._segment(labels, self.size)], len(labels))
+
+    @property
+    def gram_count(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def search(self, query: str, labels: Sequence[str], limit: Optional[int] = None) -> List[int]:
+        """
+        子串匹配（不区分大小写）
+
+        Args:
+            query: 查询字符串
+            labels: 节点标签表（用于校验候选）
+            limit: 最多返回的匹配数，None表示全部
+
+        Returns:
+            匹配的节点整数ID，升序
+        """
+        query = query.lower()
+        if not query:
+            return []
+        grams = {query[i:i + 2] for i in range(len(query) - 1)} or {query}
+        # 查询不超过两个字时倒排表本身就是精确结果
+        exact = len(query) <= 2
+
+        results: List[int] = []
+        for segment in self._segments:
+            lists = [segment.postings(gram) for gram in grams]
+            if any(nodes is None for nodes in lists):
+                continue
+            lists.sort(key=len)
+            candidates = lists[0]
+            if not exact and len(candidates) > _VERIFY_THRESHOLD and len(lists) > 1:
+                candidates = segment.intersect(lists)
+
+            if exact:
+                results.extend(candidates.tolist())
+            else:
+                for node in candidates:
+                    if query in labels[node].lower():
+                        results.append(int(node))
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
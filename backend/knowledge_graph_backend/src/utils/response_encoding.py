@@ -0,0 +1,136 @@
+"""
+图谱接口响应编码
+- JSON 优先使用 orjson 序列化，缺失时回退到标准库 json
+- 请求头 Accept 显式请求 application/msgpack（或 application/x-msgpack）且安装了 msgpack 时返回 MessagePack
+- 响应体超过 GraphConfig.COMPRESS_MIN_BYTES 时按 Accept-Encoding 选择 brotli / gzip 压缩（q值相同时优先brotli）
+orjson、msgpack、brotli 均为可选依赖
+"""
+import gzip
+import json
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, request
+
+from src.config.graph_config import GraphConfig
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时使用标准库json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖，缺失时不提供MessagePack编码
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，缺失时只提供gzip压缩
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def dumps_json_stdlib(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_json(payload: Any) -> bytes:
+    """序列化为UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return dumps_json_stdlib(payload)
+
+
+def dumps_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+# 可用的序列化方式: 名称 -> (MIME类型, 序列化函数)
+SERIALIZERS: Dict[str, Tuple[str, Callable[[Any], bytes]]] = {'json': (JSON_MIMETYPE, dumps_json)}
+if msgpack is not None:
+    SERIALIZERS['msgpack'] = (MSGPACK_MIMETYPES[0], dumps_msgpack)
+
+# 可用的压缩方式: Content-Encoding -> 压缩函数
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=GraphConfig.GZIP_LEVEL, mtime=0)
+}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda body: brotli.compress(body, quality=GraphConfig.BROTLI_QUALITY)
+
+
+def negotiate_format() -> str:
+    """
+    根据Accept头选择序列化方式；MessagePack需显式请求：
+    q值高于JSON，或q值相同且显式列出（如 "application/msgpack, */*"）而JSON只由通配符匹配时返回MessagePack
+    """
+    if 'msgpack' in SERIALIZERS:
+        accept = request.accept_mimetypes
+        named = set(accept.values())
+        json_quality = accept[JSON_MIMETYPE]
+        for mimetype in MSGPACK_MIMETYPES:
+            quality = accept[mimetype]
+            if quality > json_quality or (quality and quality == json_quality and
+                                          mimetype in named and JSON_MIMETYPE not in named):
+                return 'msgpack'
+    return 'json'
+
+
+def negotiate_compression(size: int) -> Optional[str]:
+    """根据Accept-Encoding选择压缩方式（q值最高者，相同时优先brotli），小响应不压缩"""
+    if size < GraphConfig.COMPRESS_MIN_BYTES:
+        return None
+    accept = request.accept_encodings
+    best = max((encoding for encoding in ('br', 'gzip') if encoding in COMPRESSORS),
+               key=lambda encoding: accept[encoding])
+    return best if accept[best] else None
+
+
+def encode_response(payload: Any, status: int = 200) -> Response:
+    """按内容协商结果序列化并压缩，代替 jsonify 用于数据量大的图谱接口"""
+    mimetype, serialize = SERIALIZERS[negotiate_format()]
+    body = serialize(payload)
+    encoding = negotiate_compression(len(body))
+    if encoding:
+        body = COMPRESSORS[encoding](body)
+
+    response = Response(body, status=status, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+
+def _gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(GraphConfig.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = brotli.Compressor(quality=GraphConfig.BROTLI_QUALITY)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def encode_stream(chunks: Iterable[bytes], mimetype: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """流式响应：按Accept-Encoding逐块压缩（大小未知，总是尝试压缩）"""
+    encoding = negotiate_compression(GraphConfig.COMPRESS_MIN_BYTES)
+    if encoding == 'br':
+        chunks = _brotli_stream(chunks)
+    elif encoding == 'gzip':
+        chunks = _gzip_stream(chunks)
+
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,124 @@
+"""
+实体标签前缀补全索引（输入联想）
+所有标签转小写后排序，前缀查询用两次二分得到匹配区间 [lo, hi)：
+- 区间不超过 scan_max 个标签时直接在区间内取排名最高的前k个
+- 更大的区间（"重"前缀）在构建时预先算好前 top_k 个实体，查询只需一次字典查找
+重前缀逐层展开：第d层只在第d-1层的重前缀区间内按二分跳跃分组，
+每层的重前缀数量不超过 N / scan_max，总内存与标签数相比可以忽略
+
+排名使用图谱的连接数排序位置（CompactGraph.rank_positions），位置越小越靠前
+"""
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时用heapq在区间内取前k个
+    np = None
+
+# 前缀区间上界：匹配区间内的标签都小于 prefix + _MAX_CHAR
+_MAX_CHAR = '\U0010ffff'
+
+
+class SuggestIndex:
+    """排序标签数组 + 重前缀的预计算前k个实体"""
+
+    def __init__(self, keys: List[str], nodes: array, ranks: array, top_k: int, scan_max: int):
+        self.keys = keys            # 小写标签，升序
+        self.nodes = nodes          # 与keys对应的节点整数ID
+        self.ranks = ranks          # 与keys对应的排名位置
+        self.top_k = top_k
+        self.scan_max = scan_max
+        self.top: Dict[str, array] = {}  # 重前缀 -> 排名最高的前top_k个节点
+        self._build_top()
+
+    @classmethod
+    def build(cls, labels: Sequence[str], rank_positions: Sequence[int],
+              top_k: int = 20, scan_max: int = 256) -> 'SuggestIndex':
+        """由全部节点标签构建"""
+        lowered = [label.lower() for label in labels]
+        order = sorted(range(len(lowered)), key=lowered.__getitem__)
+        return cls._from_order(lowered, order, rank_positions, top_k, scan_max)
+
+    def extend(self, labels: Sequence[str], start: int, rank_positions: Sequence[int]) -> 'SuggestIndex':
+        """
+        追加导入后生成新索引（原索引不变）：新标签排序后与原有序数组合并；
+        已有节点的连接数也可能变化，排名和重前缀全部按新图谱重新计算
+        """
+        lowered = [label.lower() for label in labels]
+        added = sorted(range(start, len(lowered)), key=lowered.__getitem__)
+        # 两段各自有序，Timsort按两个有序段线性合并
+        order = sorted(list(self.nodes) + added, key=lowered.__getitem__)
+        return self._from_order(lowered, order, rank_positions, self.top_k, self.scan_max)
+
+    @classmethod
+    def _from_order(cls, lowered: List[str], order: List[int], rank_positions: Sequence[int],
+                    top_k: int, scan_max: int) -> 'SuggestIndex':
+        keys = [lowered[node] for node in order]
+        ranks = array('i', [rank_positions[node] for node in order])
+        return cls(keys, array('i', order), ranks, top_k, scan_max)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def heavy_prefix_count(self) -> int:
+        return len(self.top)
+
+    def _range(self, prefix: str, lo: int = 0, hi: Optional[int] = None):
+        hi = len(self.keys) if hi is None else hi
+        start = bisect_left(self.keys, prefix, lo, hi)
+        return start, bisect_right(self.keys, prefix + _MAX_CHAR, start, hi)
+
+    def _best(self, lo: int, hi: int, count: int) -> List[int]:
+        """区间 [lo, hi) 内排名最高的count个下标（按排名升序）"""
+        if np is not None and hi - lo > self.scan_max:
+            ranks = np.frombuffer(self.ranks, dtype=np.int32)[lo:hi]
+            if count < hi - lo:
+                picked = np.argpartition(ranks, count)[:count]
+            else:
+                picked = np.arange(hi - lo)
+            picked = picked[np.argsort(ranks[picked], kind='stable')]
+            return (picked + lo).tolist()
+        return heapq.nsmallest(count, range(lo, hi), key=self.ranks.__getitem__)
+
+    def _build_top(self) -> None:
+        """逐层找出匹配数超过scan_max的前缀并记录前top_k个节点"""
+        keys, nodes = self.keys, self.nodes
+        ranges = [('', 0, len(keys))] if len(keys) > self.scan_max else []
+        depth = 0
+        while ranges:
+            depth += 1
+            next_ranges = []
+            for _, lo, hi in ranges:
+                i = lo
+                # 跳过长度不足depth的标签（它们等于上一层前缀，排在区间最前）
+                while i < hi and len(keys[i]) < depth:
+                    i += 1
+                while i < hi:
+                    prefix = keys[i][:depth]
+                    j = bisect_right(keys, prefix + _MAX_CHAR, i, hi)
+                    if j - i > self.scan_max:
+                        self.top[prefix] = array('i', (nodes[k] for k in self._best(i, j, self.top_k)))
+                        next_ranges.append((prefix, i, j))
+                    i = j
+            ranges = next_ranges
+
+    def complete(self, prefix: str, limit: int = 10) -> List[int]:
+        """标签以prefix开头（不区分大小写）的节点，按排名取前limit个"""
+        prefix = prefix.lower()
+        if not prefix or limit <= 0:
+            return []
+        if limit <= self.top_k:
+            top = self.top.get(prefix)
+            if top is not None:
+                return top[:limit].tolist()
+        lo, hi = self._range(prefix)
+        return [self.nodes[i] for i in self._best(lo, hi, min(limit, hi - lo))]
+
+    def count(self, prefix: str) -> int:
+        """匹配前缀的标签数"""
+        lo, hi = self._range(prefix.lower())
+        return hi - lo
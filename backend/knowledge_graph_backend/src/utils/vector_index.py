@@ -0,0 +1,397 @@
+"""
+实体语义向量与近似最近邻检索（离线计算，不依赖网络和外部模型）
+- 特征：与BM25相同的实体文档（自身标签加权 + 邻居标签 + 关系类型），词项为单字和字二元组；
+  TF-IDF（次线性词频）后按行归一化
+- 降维：随机化截断SVD（Halko等），稀疏矩阵乘法用numpy分块实现，得到 VECTOR_DIM 维向量（LSA）。
+  共同出现在相似上下文中的字和词组落在相近方向上，措辞与标签不同的问题也能找到相关实体
+- 索引：IVF（球面k-means把向量分成若干簇，向量按簇连续存放），查询只与最近的几个簇内的向量
+  做一次矩阵乘；节点较少时直接与全部向量做矩阵乘
+- VectorManager: 每个图谱版本在后台线程计算一次（见 background_build），结果按 version_id 持久化到CSV旁的 .vectors.npz
+需要numpy
+"""
+import math
+import os
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+from src.config.graph_config import GraphConfig
+from src.utils.background_build import BackgroundBuilder
+from src.utils.bm25_index import document_terms, tokenize
+
+try:
+    import numpy as np
+except ImportError:  # numpy为可选依赖，缺失时不提供语义检索
+    np = None
+
+VECTORS_SUFFIX = '.vectors.npz'
+
+# 稀疏矩阵乘法每块处理的非零元个数；稠密分块每块的元素个数
+_CHUNK_NNZ = 1 << 18
+_DENSE_BLOCK = 1 << 22
+# 非零元比例不低于该值时按行分块转成稠密矩阵用BLAS相乘
+_DENSE_RATIO = 1 / 32
+
+
+def get_vectors_path(csv_file_path: str) -> str:
+    """获取CSV文件对应的向量索引文件路径"""
+    return os.path.splitext(csv_file_path)[0] + VECTORS_SUFFIX
+
+
+class _SparseRows:
+    """
+    只读CSR稀疏矩阵（只支持与稠密矩阵相乘）
+    较稠密时按行分块还原成稠密块用BLAS相乘；较稀疏时逐块收集非零元再按行累加，另存CSC副本用于转置乘法
+    """
+
+    def __init__(self, rows, cols, values, shape: Tuple[int, int]):
+        order = np.lexsort((cols, rows))
+        self.shape = shape
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=shape[0]))])
+        self.indices, self.data = cols[order], values[order]
+        self.dense = len(values) >= _DENSE_RATIO * shape[0] * shape[1]
+        if not self.dense:
+            # 稀疏路径的主要开销是随机读取稠密矩阵的行，用float32减半内存访问
+            self.data = self.data.astype(np.float32)
+            order = np.lexsort((rows, cols))
+            self.t_indptr = np.concatenate([[0], np.cumsum(np.bincount(cols, minlength=shape[1]))])
+            self.t_indices, self.t_data = rows[order], values[order].astype(np.float32)
+
+    def _dense_blocks(self):
+        """按行分块依次生成 (起始行, 结束行, 稠密块)"""
+        step = max(1, _DENSE_BLOCK // max(self.shape[1], 1))
+        for row in range(0, self.shape[0], step):
+            end = min(row + step, self.shape[0])
+            start_nnz, end_nnz = self.indptr[row], self.indptr[end]
+            block = np.zeros((end - row, self.shape[1]))
+            block[np.repeat(np.arange(end - row), np.diff(self.indptr[row:end + 1])),
+                  self.indices[start_nnz:end_nnz]] = self.data[start_nnz:end_nnz]
+            yield row, end, block
+
+    @staticmethod
+    def _multiply(indptr, indices, data, dense, out_rows: int):
+        """(CSR) @ dense，按行分块，每块不超过 _CHUNK_NNZ 个非零元"""
+        out = np.zeros((out_rows, dense.shape[1]))
+        dense = dense.astype(np.float32)
+        row = 0
+        while row < out_rows:
+            end = int(np.searchsorted(indptr, indptr[row] + _CHUNK_NNZ, side='right')) - 1
+            end = min(max(end, row + 1), out_rows)
+            start_nnz, end_nnz = indptr[row], indptr[end]
+            if end_nnz > start_nnz:
+                products = dense[indices[start_nnz:end_nnz]]
+                products *= data[start_nnz:end_nnz, None]
+                starts = indptr[row:end] - start_nnz
+                nonempty = indptr[row + 1:end + 1] > indptr[row:end]
+                out[row:end][nonempty] = np.add.reduceat(products, starts[nonempty], axis=0)
+            row = end
+        return out
+
+    def dot(self, dense):
+        """self @ dense"""
+        if not self.dense:
+            return self._multiply(self.indptr, self.indices, self.data, dense, self.shape[0])
+        out = np.empty((self.shape[0], dense.shape[1]))
+        for row, end, block in self._dense_blocks():
+            out[row:end] = block @ dense
+        return out
+
+    def t_dot(self, dense):
+        """self.T @ dense"""
+        if not self.dense:
+            return self._multiply(self.t_indptr, self.t_indices, self.t_data, dense, self.shape[1])
+        out = np.zeros((self.shape[1], dense.shape[1]))
+        for row, end, block in self._dense_blocks():
+            out += block.T @ dense[row:end]
+        return out
+
+
+def truncated_svd(matrix: _SparseRows, rank: int, oversample: int = 10, power_iter: int = 4, seed: int = 0):
+    """
+    随机化截断SVD：matrix ≈ U·diag(S)·Vt，只保留前rank个奇异值
+
+    Returns:
+        (U, S, Vt)
+    """
+    rng = np.random.default_rng(seed)
+    width = min(rank + oversample, min(matrix.shape))
+    basis, _ = np.linalg.qr(matrix.dot(rng.standard_normal((matrix.shape[1], width))))
+    for _ in range(power_iter):
+        right, _ = np.linalg.qr(matrix.t_dot(basis))
+        basis, _ = np.linalg.qr(matrix.dot(right))
+    small = matrix.t_dot(basis).T
+    u_small, singular, vt = np.linalg.svd(small, full_matrices=False)
+    rank = min(rank, len(singular))
+    return basis @ u_small[:, :rank], singular[:rank], vt[:rank]
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def spherical_kmeans(vectors, clusters: int, iterations: int, seed: int = 0, sample: int = None):
+    """
+    球面k-means（余弦相似度，中心归一化）；sample给定时只在抽样上迭代
+
+    Returns:
+        中心矩阵 (clusters × dim)
+    """
+    rng = np.random.default_rng(seed)
+    train = vectors
+    if sample and len(vectors) > sample:
+        train = vectors[rng.choice(len(vectors), sample, replace=False)]
+    centroids = train[rng.choice(len(train), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(train @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, train)
+        empty = ~np.any(sums, axis=1)
+        # 空簇重新取随机样本作为中心
+        sums[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+class VectorIndex:
+    """
+    一个图谱版本的语义向量索引
+    vectors 按簇连续存放：list_offsets[c]:list_offsets[c+1] 为第c个簇，order 给出对应的节点整数ID
+    """
+
+    def __init__(self, version_id: str, term_keys, idf, components, centroids, list_offsets, order, vectors):
+        self.version_id = version_id
+        self.term_keys = term_keys      # 词项编码（升序）
+        self.idf = idf                  # 每个词项的IDF
+        self.components = components    # SVD右奇异向量的转置 (词项数 × dim)，用于投影查询
+        self.centroids = centroids      # IVF簇中心 (簇数 × dim)
+        self.list_offsets = list_offsets
+        self.order = order
+        self.vectors = vectors          # 单位向量 (节点数 × dim)，float32
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    @property
+    def list_count(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, graph, version_id: str, dim: int = None, progress=None) -> 'VectorIndex':
+        """由图谱计算向量并建立IVF索引"""
+        dim = dim or GraphConfig.VECTOR_DIM
+        report = progress or (lambda fraction, message=None: None)
+        n = graph.node_count
+
+        report(0.0, '提取文档词项')
+        docs, keys, weights = document_terms(graph, GraphConfig.VECTOR_LABEL_WEIGHT, unigrams=True)
+        term_keys, terms = np.unique(keys, return_inverse=True)
+        pairs, inverse = np.unique(terms * max(n, 1) + docs, return_inverse=True)
+        tf = np.bincount(inverse, weights=weights, minlength=len(pairs))
+        cols, rows = pairs // max(n, 1), pairs % max(n, 1)
+        df = np.bincount(cols, minlength=len(term_keys))
+
+        # 只出现在一个文档中的词项不影响实体之间的相似度；词项过多时只保留文档频率最高的部分
+        kept = np.flatnonzero(df >= 2)
+        if len(kept) > GraphConfig.VECTOR_MAX_TERMS:
+            kept = np.sort(kept[np.argsort(-df[kept], kind='stable')[:GraphConfig.VECTOR_MAX_TERMS]])
+        remap = np.full(len(term_keys), -1, dtype=np.int64)
+        remap[kept] = np.arange(len(kept))
+        keep = remap[cols] >= 0
+        term_keys, df = term_keys[kept], df[kept]
+        rows, cols, tf = rows[keep], remap[cols[keep]], tf[keep]
+
+        idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+        values = (1.0 + np.log(tf)) * idf[cols]
+        row_norm = np.sqrt(np.bincount(rows, weights=values * values, minlength=n))
+        values = values / row_norm[rows]
+        matrix = _SparseRows(rows, cols, values, (n, len(term_keys)))
+
+        report(0.2, '截断SVD')
+        if n > 1 and len(term_keys) > 1:
+            u, singular, components = truncated_svd(matrix, min(dim, n - 1, len(term_keys) - 1),
+                                                    power_iter=GraphConfig.VECTOR_SVD_POWER_ITER)
+            vectors = _normalize_rows(u * singular).astype(np.float32)
+        else:
+            components = np.zeros((0, len(term_keys)))
+            vectors = np.zeros((n, 0), dtype=np.float32)
+        components = components.T
+
+        report(0.6, '建立IVF索引')
+        list_count = cls._list_count(n)
+        if list_count > 1 and vectors.shape[1]:
+            centroids = spherical_kmeans(vectors, list_count, GraphConfig.VECTOR_KMEANS_ITER,
+                                         sample=list_count * GraphConfig.VECTOR_KMEANS_SAMPLE_PER_LIST)
+            assign = cls._assign(vectors, centroids)
+        else:
+            centroids = _normalize_rows(vectors.mean(axis=0, keepdims=True)) if n else np.zeros((1, vectors.shape[1]))
+            assign = np.zeros(n, dtype=np.int64)
+        order = np.argsort(assign, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+        report(1.0, None)
+        return cls(version_id, term_keys, idf, np.ascontiguousarray(components, dtype=np.float32),
+                   centroids.astype(np.float32),
+                   list_offsets, order.astype(np.int32), vectors[order])
+
+    @staticmethod
+    def _list_count(n: int) -> int:
+        """簇数：节点较少时为1（直接全量计算），否则约为 √n"""
+        if n < GraphConfig.VECTOR_IVF_MIN_NODES:
+            return 1
+        return max(2, int(math.sqrt(n) * GraphConfig.VECTOR_IVF_LIST_FACTOR))
+
+    @staticmethod
+    def _assign(vectors, centroids, block: int = 65536):
+        """每个向量最近的簇，分块计算"""
+        return np.concatenate([np.argmax(vectors[i:i + block] @ centroids.T, axis=1)
+                               for i in range(0, len(vectors), block)]) if len(vectors) else \
+            np.zeros(0, dtype=np.int64)
+
+    def embed(self, texts: Sequence[str]):
+        """把一组查询文本投影到向量空间（与实体向量相同的TF-IDF和SVD），返回单位向量矩阵"""
+        queries = np.zeros((len(texts), self.components.shape[1]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text, unigrams=True))
+            if not counts or not len(self.term_keys):
+                continue
+            keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            positions = np.minimum(np.searchsorted(self.term_keys, keys), len(self.term_keys) - 1)
+            found = self.term_keys[positions] == keys
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))[found]
+            # 只取查询中出现的词项对应的行
+            queries[row] = ((1.0 + np.log(tf)) * self.idf[positions[found]]) @ self.components[positions[found]]
+        return _normalize_rows(queries)
+
+    def search_vectors(self, queries, limit: int = 10, nprobe: int = None) -> List[List[Tuple[int, float]]]:
+        """
+        一批查询向量的近似最近邻（余弦相似度）
+
+        Args:
+            queries: 单位向量矩阵 (查询数 × dim)
+            nprobe: 每个查询检查的簇数，默认 GraphConfig.VECTOR_NPROBE
+
+        Returns:
+            每个查询的 [(节点整数ID, 相似度)]，相似度从高到低
+        """
+        nprobe = min(nprobe or GraphConfig.VECTOR_NPROBE, self.list_count)
+        if not len(self.vectors) or not self.dim:
+            return [[] for _ in range(len(queries))]
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        # 所有查询与簇中心的相似度一次算出，每个查询取最近的nprobe个簇
+        probe_lists = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        if len(queries) == 1:
+            return [self._scan(queries[0], probe_lists[0], limit)]
+
+        # 每个 (查询, 簇) 的得分在扁平缓冲区中的起点：同一查询的各簇首尾相接
+        sizes = np.diff(self.list_offsets)[probe_lists]
+        slots = np.concatenate([[0], np.cumsum(sizes.ravel())])
+        scores = np.empty(int(slots[-1]), dtype=np.float32)
+        positions = np.empty(len(scores), dtype=np.int64)
+        pair_lists = probe_lists.ravel()
+        pair_queries = np.repeat(np.arange(len(queries)), nprobe)
+        grouped = np.argsort(pair_lists, kind='stable')
+        bounds = np.flatnonzero(np.diff(pair_lists[grouped])) + 1
+        # 按簇分组：每个簇的向量与探查它的所有查询做一次矩阵乘
+        for pairs in np.split(grouped, bounds):
+            start, end = self.list_offsets[pair_lists[pairs[0]]], self.list_offsets[pair_lists[pairs[0]] + 1]
+            if end == start:
+                continue
+            targets = slots[pairs][:, None] + np.arange(end - start)
+            scores[targets] = (self.vectors[start:end] @ queries[pair_queries[pairs]].T).T
+            positions[targets] = np.arange(start, end)
+
+        results = []
+        query_slots = slots[::nprobe]
+        for row, query in enumerate(queries):
+            begin, finish = query_slots[row], query_slots[row + 1]
+            count = min(limit, int(finish - begin))
+            if count <= 0 or not np.any(query):
+                results.append([])
+                continue
+            block = scores[begin:finish]
+            top = np.argpartition(-block, count - 1)[:count]
+            top = top[np.argsort(-block[top], kind='stable')]
+            results.append([(int(node), float(score))
+                            for node, score in zip(self.order[positions[begin + top]], block[top])])
+        return results
+
+    def _scan(self, query, lists, limit: int) -> List[Tuple[int, float]]:
+        """单个查询：逐个簇与连续存放的向量相乘，不复制向量"""
+        if not np.any(query):
+            return []
+        bounds = [(int(self.list_offsets[item]), int(self.list_offsets[item + 1])) for item in lists]
+        bounds = [(start, end) for start, end in bounds if end > start]
+        if not bounds:
+            return []
+        scores = np.concatenate([self.vectors[start:end] @ query for start, end in bounds])
+        positions = np.concatenate([np.arange(start, end) for start, end in bounds])
+        count = min(limit, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(node), float(score)) for node, score in zip(self.order[positions[top]], scores[top])]
+
+    def search(self, text: str, limit: int = 10, nprobe: int = None) -> List[Tuple[int, float]]:
+        """与查询文本语义最接近的实体"""
+        return self.search_vectors(self.embed([text]), limit, nprobe)[0]
+
+    def save(self, path: str) -> None:
+        """写入 .vectors.npz（先写临时文件再替换）"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version_id=np.array(self.version_id), term_keys=self.term_keys, idf=self.idf,
+                     components=self.components, centroids=self.centroids, list_offsets=self.list_offsets,
+                     order=self.order, vectors=self.vectors, config=self._config_signature())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _config_signature():
+        """影响向量和簇划分的配置，变化后已保存的文件作废"""
+        return np.array([GraphConfig.VECTOR_DIM, GraphConfig.VECTOR_LABEL_WEIGHT, GraphConfig.VECTOR_MAX_TERMS,
+                         GraphConfig.VECTOR_IVF_MIN_NODES, GraphConfig.VECTOR_IVF_LIST_FACTOR], dtype=np.float64)
+
+    @classmethod
+    def load(cls, path: str, version_id: str, node_count: int) -> Optional['VectorIndex']:
+        """读取向量索引文件，版本或配置不一致、文件损坏时返回None"""
+        try:
+            with np.load(path) as data:
+                if str(data['version_id']) != version_id or len(data['order']) != node_count \
+                        or not np.array_equal(data['config'], cls._config_signature()):
+                    return None
+                return cls(version_id, data['term_keys'], data['idf'], data['components'], data['centroids'],
+                           data['list_offsets'], data['order'], data['vectors'])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"[向量] 向量索引文件不可用: {e}")
+            return None
+
+
+class VectorManager(BackgroundBuilder):
+    """按图谱版本在后台计算并缓存语义向量索引"""
+
+    log_tag = '向量'
+    thread_name = 'graph-vectors'
+
+    @property
+    def available(self) -> bool:
+        return np is not None
+
+    def _compute(self, generation, report) -> VectorIndex:
+        graph = generation.store
+        path = get_vectors_path(generation.csv_file_path) if generation.csv_file_path else None
+        if path and os.path.exists(path):
+            index = VectorIndex.load(path, generation.version_id, graph.node_count)
+            if index is not None:
+                print(f"[向量] 使用已保存的向量索引: {path}")
+                return index
+
+        print(f"[向量] 开始计算: {graph.node_count} 节点, {graph.edge_count} 边")
+        index = VectorIndex.build(graph, generation.version_id, progress=report)
+        if path:
+            try:
+                index.save(path)
+            except OSError as e:
+                print(f"[向量] 保存向量索引失败: {e}")
+        return index
+
+
+# 全局向量索引管理器
+vector_manager = VectorManager()
@@ -0,0 +1,141 @@
+"""
+后台预热模块
+知识图谱加载和LLM探测放到后台线程执行，Flask启动后立即可以响应；
+预热完成前到达的请求快速返回503并带Retry-After头
+"""
+import os
+import threading
+import time
+import traceback
+from typing import Dict, Any, List, Optional, Callable
+
+from flask import jsonify, request
+
+# 任务函数签名: task(progress)，progress(fraction, message) 汇报0~1的进度
+ProgressReporter = Callable[[float, Optional[str]], None]
+
+
+class WarmupManager:
+    """后台预热任务管理器"""
+
+    RETRY_AFTER_SECONDS = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._task_funcs: Dict[str, Callable[[ProgressReporter], Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._process_start = time.time()
+        self._startup_profile: Dict[str, float] = {}
+
+    def add_task(self, name: str, func: Callable[[ProgressReporter], Any], description: str = '') -> None:
+        """注册预热任务（各任务在独立线程中并行执行）"""
+        with self._lock:
+            self._task_funcs[name] = func
+            self._tasks[name] = {
+                'name': name,
+                'description': description,
+                'state': 'pending',   # pending / running / done / failed
+                'progress': 0.0,
+                'message': None,
+                'started_at': None,
+                'finished_at': None,
+                'duration': None,
+                'error': None,
+            }
+
+    def start(self) -> None:
+        """启动所有尚未运行的预热任务"""
+        with self._lock:
+            pending = [name for name, task in self._tasks.items() if task['state'] == 'pending']
+            for name in pending:
+                self._tasks[name]['state'] = 'running'
+                self._tasks[name]['started_at'] = time.time()
+        for name in pending:
+            thread = threading.Thread(target=self._run_task, args=(name,), name=f'warmup-{name}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _run_task(self, name: str) -> None:
+        def report(fraction: float, message: Optional[str] = None) -> None:
+            with self._lock:
+                task = self._tasks[name]
+                task['progress'] = round(max(task['progress'], min(float(fraction), 1.0)), 4)
+                if message:
+                    task['message'] = message
+
+        print(f"[预热] 开始: {self._tasks[name]['description'] or name}")
+        try:
+            self._task_funcs[name](report)
+            state, error = 'done', None
+        except Exception as e:
+            traceback.print_exc()
+            state, error = 'failed', str(e)
+
+        with self._lock:
+            task = self._tasks[name]
+            task['state'] = state
+            task['error'] = error
+            task['finished_at'] = time.time()
+            task['duration'] = round(task['finished_at'] - task['started_at'], 3)
+            if state == 'done':
+                task['progress'] = 1.0
+        print(f"[预热] {'完成' if state == 'done' else '失败'}: {name}, 耗时 {task['duration']}s")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """阻塞等待全部任务结束（用于命令行脚本）"""
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in list(self._threads):
+            thread.join(None if deadline is None else max(0.0, deadline - time.time()))
+        return self.is_ready()
+
+    def is_ready(self, *names: str) -> bool:
+        """指定任务（默认全部）是否已结束；失败的任务不阻塞请求，由路由按需回退"""
+        with self._lock:
+            tasks = [self._tasks[name] for name in names if name in self._tasks] if names \
+                else list(self._tasks.values())
+            return all(task['state'] in ('done', 'failed') for task in tasks)
+
+    def record_startup_phase(self, phase: str, seconds: float) -> None:
+        """记录启动阶段耗时（如模块导入），用于跟踪启动性能回退"""
+        self._startup_profile[phase] = round(seconds, 4)
+
+    def status(self) -> Dict[str, Any]:
+        """预热状态快照"""
+        with self._lock:
+            tasks = [dict(task) for task in self._tasks.values()]
+        overall = sum(task['progress'] for task in tasks) / len(tasks) if tasks else 1.0
+        return {
+            'ready': all(task['state'] in ('done', 'failed') for task in tasks),
+            'progress': round(overall, 4),
+            'tasks': tasks,
+            'uptime': round(time.time() - self._process_start, 3),
+            'startup_profile': dict(self._startup_profile),
+            'pid': os.getpid(),
+        }
+
+    def require_ready(self, *names: str):
+        """
+        生成 before_request 钩子：预热未完成时直接返回503
+
+        用法: blueprint.before_request(warmup.require_ready('graph'))
+        """
+        def check():
+            # CORS预检请求不受影响
+            if request.method == 'OPTIONS' or self.is_ready(*names):
+                return None
+            status = self.status()
+            response = jsonify({
+                'error': '服务正在预热，请稍后重试',
+                'ready': False,
+                'progress': status['progress'],
+                'tasks': {task['name']: task['state'] for task in status['tasks']},
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = str(self.RETRY_AFTER_SECONDS)
+            return response
+        return check
+
+
+# 全局预热管理器
+warmup = WarmupManager()
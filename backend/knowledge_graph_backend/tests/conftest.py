@@ -0,0 +1,43 @@
+"""
+测试公共配置：将后端根目录加入导入路径（与 python -m src.main 的运行方式一致）
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_ROOT not in sys.path:
+    sys.path.insert(0, BACKEND_ROOT)
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """写入三元组CSV，返回文件路径；rows 为 (源, 关系, 目标) 列表"""
+    def write(rows, name='graph.csv'):
+        path = tmp_path / name
+        path.write_bytes(''.join(f'{s},{r},{t}\n' for s, r, t in rows).encode('utf-8'))
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def graph_client(write_csv, monkeypatch):
+    """
+    知识图谱接口的测试客户端：rows 写入独立的CSV，由独立的缓存实例加载
+    （不触发全局缓存上注册的后台任务），返回Flask测试客户端
+    """
+    from flask import Flask
+
+    from src.routes import knowledge_graph
+    from src.utils.graph_cache import KnowledgeGraphCache
+    from src.utils.lru_cache import LRUCache
+
+    def create(rows):
+        monkeypatch.setattr(knowledge_graph, 'DEFAULT_CSV_PATH', write_csv(rows))
+        monkeypatch.setattr(knowledge_graph, 'graph_cache', KnowledgeGraphCache())
+        monkeypatch.setattr(knowledge_graph, '_page_cache', LRUCache(8))
+        app = Flask(__name__)
+        app.register_blueprint(knowledge_graph.knowledge_graph_bp, url_prefix='/api')
+        return app.test_client()
+    return create
@@ -0,0 +1,78 @@
+"""
+后台构建：失败的版本在退避期内不重新构建，退避期过后或新版本发布后重新构建
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.config.graph_config import GraphConfig
+from src.utils import bm25_index
+from src.utils.bm25_index import BM25Manager
+from src.utils.graph_store import GraphBuilder
+
+
+def _generation(version):
+    builder = GraphBuilder()
+    builder.add_edge('感冒', '症状', '发热')
+    return SimpleNamespace(version=version, version_id=f'v{version}', store=builder.build(), append_lineage=())
+
+
+def _wait(manager, generation):
+    deadline = time.time() + 10
+    while manager.status(generation)['state'] in ('pending', 'running'):
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return manager.status(generation)
+
+
+@pytest.fixture
+def failing_build(monkeypatch):
+    calls = []
+    build = bm25_index.BM25Index.build
+
+    def fail_first_version(graph, version_id=None, **kwargs):
+        calls.append(version_id)
+        if version_id == 'v1':
+            raise MemoryError('内存不足')
+        return build(graph, version_id, **kwargs)
+    monkeypatch.setattr(bm25_index.BM25Index, 'build', staticmethod(fail_first_version))
+    return calls
+
+
+def test_failed_build_waits_for_backoff(failing_build, monkeypatch):
+    monkeypatch.setattr(GraphConfig, 'BACKGROUND_RETRY_DELAY', 0.5)
+    manager = BM25Manager()
+    generation = _generation(1)
+    manager.schedule(generation)
+    status = _wait(manager, generation)
+    assert (status['state'], status['error'], status['failures']) == ('failed', '内存不足', 1)
+    retry_at = status['retry_at']
+
+    # 退避期内重复调度（例如每次搜索）不重新构建
+    for _ in range(5):
+        manager.schedule(generation)
+    assert _wait(manager, generation)['state'] == 'failed'
+    assert failing_build == ['v1']
+
+    # 退避期过后重试，失败次数累计，退避时间翻倍
+    time.sleep(max(retry_at - time.time(), 0) + 0.01)
+    manager.schedule(generation)
+    status = _wait(manager, generation)
+    assert status['failures'] == 2
+    assert status['retry_at'] - time.time() > 0.5
+    assert failing_build == ['v1', 'v1']
+
+
+def test_new_generation_builds_after_failure(failing_build):
+    manager = BM25Manager()
+    failed = _generation(1)
+    manager.schedule(failed)
+    _wait(manager, failed)
+
+    generation = _generation(2)
+    manager.schedule(generation)
+    status = _wait(manager, generation)
+    assert (status['state'], status['mode'], status['failures']) == ('done', 'full', 0)
+    assert manager.get(generation).version_id == 'v2'
+    assert manager.get(failed) is None
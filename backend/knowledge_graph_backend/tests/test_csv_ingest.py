@@ -0,0 +1,81 @@
+"""
+导入去重：各解析后端丢弃相同的重复三元组，报告的重复次数、度数和关系计数一致
+"""
+import pytest
+
+from src.config.graph_config import GraphConfig
+from src.utils import csv_ingest, graph_store
+from src.utils.csv_ingest import available_backends, ingest_csv
+
+ROWS = [
+    ('感冒', '症状', '发热'),
+    ('感冒', '症状', '咳嗽'),
+    ('感冒', '症状', '发热'),
+    ('肺炎', '症状', '发热'),
+    ('感冒', '常用药品', '布洛芬'),
+    ('感冒', '症状', '发热'),
+    ('肺炎', '症状', '发热'),
+    ('肺炎', '并发症', '感冒'),
+]
+
+
+@pytest.fixture(autouse=True)
+def two_workers(monkeypatch):
+    monkeypatch.setattr(GraphConfig, 'INGEST_WORKERS', 2)
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_dedupe_counts(write_csv, backend):
+    graph, stats = ingest_csv(write_csv(ROWS), backend=backend)
+
+    assert stats['rows'] == len(ROWS)
+    assert stats['duplicate_edges'] == 3
+    assert stats['edges'] == graph.edge_count == 5
+    assert stats['duplicates'] == [
+        {'source': '感冒', 'relation': '症状', 'target': '发热', 'duplicates': 2},
+        {'source': '肺炎', 'relation': '症状', 'target': '发热', 'duplicates': 1},
+    ]
+    degree = {node_id: graph.degree[i] for i, node_id in enumerate(graph.node_ids)}
+    assert degree == {'感冒': 4, '发热': 2, '咳嗽': 1, '肺炎': 2, '布洛芬': 1}
+    assert graph.relation_counts() == {'症状': 3, '常用药品': 1, '并发症': 1}
+
+
+def test_dedupe_without_numpy_matches(write_csv, monkeypatch):
+    csv_path = write_csv(ROWS)
+    expected_graph, expected = ingest_csv(csv_path, backend='fast')
+    monkeypatch.setattr(graph_store, 'np', None)
+    graph, stats = ingest_csv(csv_path, backend='fast')
+
+    assert stats['duplicates'] == expected['duplicates']
+    assert list(graph.edge_src) == list(expected_graph.edge_src)
+    assert list(graph.edge_dst) == list(expected_graph.edge_dst)
+
+
+def test_dedupe_report_limit(write_csv, monkeypatch):
+    monkeypatch.setattr(GraphConfig, 'DUPLICATE_REPORT_LIMIT', 1)
+    _, stats = ingest_csv(write_csv(ROWS), backend='fast')
+    assert stats['duplicate_edges'] == 3
+    assert len(stats['duplicates']) == 1
+
+
+def test_dedupe_disabled(write_csv, monkeypatch):
+    monkeypatch.setattr(GraphConfig, 'DEDUPE_EDGES', False)
+    graph, stats = ingest_csv(write_csv(ROWS), backend='fast')
+    assert graph.edge_count == len(ROWS)
+    assert stats['duplicate_edges'] == 0
+
+
+def test_auto_backend_keeps_ragged_rows(tmp_path, monkeypatch):
+    # 列数不一致的行：auto即使在安装了pyarrow时也不选择它，结果与csv基准后端一致
+    monkeypatch.setattr(csv_ingest, 'pa_csv', object())
+    path = tmp_path / 'ragged.csv'
+    path.write_bytes('感冒,症状\n感冒,症状,发热\n肺炎,症状,发热,备注\n感冒,症状,\n肺炎,并发症,感冒\n'.encode('utf-8'))
+
+    graph, stats = ingest_csv(str(path), backend='auto')
+    expected_graph, expected_stats = ingest_csv(str(path), backend='csv')
+    assert stats['backend'] == 'fast'
+    assert stats['rows'] == expected_stats['rows'] == 5
+    assert graph.node_ids == expected_graph.node_ids
+    assert [graph.edge_dict(edge) for edge in range(graph.edge_count)] == \
+        [expected_graph.edge_dict(edge) for edge in range(expected_graph.edge_count)]
+    assert graph.edge_count == 3
@@ -0,0 +1,154 @@
+"""
+追加导入：只追加行时增量加载并合并导入统计，已导入部分被改写时回退到全量重建；
+各解析后端只读取到记录的字节数
+"""
+import os
+
+import numpy as np
+import pytest
+
+from src.config.graph_config import GraphConfig
+from src.utils.csv_ingest import _BACKENDS, available_backends, merge_ingest_stats
+from src.utils.graph_cache import KnowledgeGraphCache
+from src.utils.graph_store import GraphBuilder
+
+ROWS = [
+    ('感冒', '症状', '发热'),
+    ('感冒', '症状', '咳嗽'),
+    ('感冒', '症状', '发热'),
+    ('肺炎', '症状', '发热'),
+]
+
+
+def _append(csv_path, rows):
+    with open(csv_path, 'ab') as f:
+        f.write(''.join(f'{s},{r},{t}\n' for s, r, t in rows).encode('utf-8'))
+
+
+def _triples(graph):
+    return {(edge['source'], edge['relation'], edge['target'])
+            for edge in (graph.edge_dict(i) for i in range(graph.edge_count))}
+
+
+def test_append_loads_tail_and_merges_stats(write_csv):
+    csv_path = write_csv(ROWS)
+    cache = KnowledgeGraphCache()
+    cache.load_graph(csv_path)
+    base = cache.get_generation()
+    assert base.ingest_stats['duplicate_edges'] == 1
+
+    _append(csv_path, [('肺炎', '常用药品', '阿莫西林'), ('感冒', '症状', '发热')])
+    cache.load_graph(csv_path)
+    generation = cache.get_generation()
+
+    assert generation.version == base.version + 1
+    assert generation.append_lineage[-1][0] == base.version_id
+    assert ('肺炎', '常用药品', '阿莫西林') in _triples(generation.store)
+    stats = generation.ingest_stats
+    assert stats['appends'] == 1
+    assert stats['backend'] == base.ingest_stats['backend']
+    assert stats['rows'] == 6
+    assert stats['duplicate_edges'] == 2
+    assert stats['duplicates'] == [{'source': '感冒', 'relation': '症状', 'target': '发热', 'duplicates': 2}]
+    assert stats['bytes'] == os.path.getsize(csv_path)
+    # 新实体进入增量更新的搜索索引
+    search_index = generation.search_index
+    assert '阿莫西林' in search_index['exact']
+    assert len(search_index['labels_lower']) == generation.store.node_count
+
+
+def test_append_falls_back_when_earlier_bytes_change(write_csv):
+    csv_path = write_csv(ROWS)
+    cache = KnowledgeGraphCache()
+    cache.load_graph(csv_path)
+
+    # 改写已导入的第一行（长度不变）并追加新行：不能只解析尾部
+    with open(csv_path, 'r+b') as f:
+        f.write('流感'.encode('utf-8'))
+    _append(csv_path, [('肺炎', '常用药品', '阿莫西林')])
+    cache.load_graph(csv_path)
+    generation = cache.get_generation()
+
+    assert 'appends' not in generation.ingest_stats
+    assert generation.append_lineage == ()
+    triples = _triples(generation.store)
+    assert ('流感', '症状', '发热') in triples
+    assert ('肺炎', '常用药品', '阿莫西林') in triples
+    assert generation.content_fingerprint == cache._get_content_fingerprint(csv_path, os.path.getsize(csv_path))
+    assert '流感' in generation.search_index['exact']
+
+
+def test_append_falls_back_when_last_line_was_incomplete(write_csv):
+    csv_path = write_csv(ROWS)
+    with open(csv_path, 'ab') as f:
+        f.write('高血压,症状'.encode('utf-8'))
+    cache = KnowledgeGraphCache()
+    cache.load_graph(csv_path)
+
+    # 续写上次不完整的末行
+    with open(csv_path, 'ab') as f:
+        f.write(',头晕\n'.encode('utf-8'))
+    cache.load_graph(csv_path)
+    generation = cache.get_generation()
+    assert 'appends' not in generation.ingest_stats
+    assert ('高血压', '症状', '头晕') in _triples(generation.store)
+    assert '头晕' in generation.search_index['exact']
+
+
+def test_merge_ingest_stats_keeps_inputs_unchanged():
+    base = {'backend': 'fast', 'rows': 3, 'skipped_rows': 0, 'duplicate_edges': 1,
+            'duplicates': [{'source': 'a', 'relation': 'r', 'target': 'b', 'duplicates': 1}]}
+    tail = {'backend': 'append', 'rows': 2, 'edges': 4, 'nodes': 3, 'skipped_rows': 1,
+            'duplicate_edges': 1, 'bytes': 40,
+            'duplicates': [{'source': 'a', 'relation': 'r', 'target': 'b', 'duplicates': 1}]}
+
+    merged = merge_ingest_stats(base, tail)
+    assert merged['backend'] == 'fast'
+    assert (merged['rows'], merged['skipped_rows'], merged['duplicate_edges']) == (5, 1, 2)
+    assert merged['duplicates'] == [{'source': 'a', 'relation': 'r', 'target': 'b', 'duplicates': 2}]
+    assert merged['last_append']['rows'] == 2 and 'duplicates' not in merged['last_append']
+    assert base['duplicates'][0]['duplicates'] == 1
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_backends_stop_at_byte_limit(write_csv, monkeypatch, backend):
+    monkeypatch.setattr(GraphConfig, 'INGEST_WORKERS', 2)
+    rows = [(f'疾病{i}', '症状', f'症状{i}') for i in range(200)]
+    csv_path = write_csv(rows)
+    # 记录的字节数之后的行（模拟解析期间追加）不应被读取
+    limit = os.path.getsize(csv_path)
+    _append(csv_path, [('追加疾病', '症状', '追加症状')])
+
+    builder = GraphBuilder()
+    assert _BACKENDS[backend](csv_path, builder, None, limit) == len(rows)
+    assert '追加疾病' not in builder.build().node_index
+
+
+def _build(rows, base=None):
+    builder = GraphBuilder() if base is None else GraphBuilder.from_graph(base)
+    for row in rows:
+        builder.add_edge(*row)
+    dropped = builder.drop_duplicates()
+    return builder.build(), dropped
+
+
+def test_tail_build_matches_full_build():
+    base_rows = [(f'疾病{i % 7}', f'关系{i % 3}', f'症状{i % 11}') for i in range(60)]
+    # 追加：与原图谱重复（含最后一行）、追加部分内部重复、新节点和新关系类型
+    tail_rows = base_rows[5:15] + [('疾病1', '新关系', '新症状'), ('新疾病', '关系0', '症状1'),
+                                   ('新疾病', '关系0', '症状1'), ('疾病2', '关系1', '症状3')]
+    base, _ = _build(base_rows)
+    graph, (dropped, report) = _build(tail_rows, base)
+    expected, (expected_dropped, expected_report) = _build(base_rows + tail_rows)
+
+    assert (dropped, report) == (expected_dropped, expected_report)
+    assert dropped == 12
+    for name in ('edge_src', 'edge_rel', 'edge_dst', 'degree', 'out_offsets', 'out_edges',
+                 'in_offsets', 'in_edges', 'rel_offsets', 'rel_edges'):
+        assert list(getattr(graph, name)) == list(getattr(expected, name)), name
+    assert graph.node_index == expected.node_index
+    # 原图谱不受影响；去重时构建的边键集合随版本扩展，包含新图谱的全部边
+    assert (base.edge_count, graph.edge_count) == (60, 62)
+    edges = [np.frombuffer(values, dtype=np.int32) for values in (graph.edge_src, graph.edge_rel, graph.edge_dst)]
+    assert graph._edge_keys is not None and graph._edge_keys.contains(*edges).all()
+    assert base.edge_key_set().contains(*edges).sum() == 60
@@ -0,0 +1,85 @@
+"""
+多层聚类：两个只由一条边相连的团被分成两个簇，子成员CSR划分全部成员；
+后台计算失败后接口返回错误，不再无限返回202
+"""
+import time
+
+import numpy as np
+import pytest
+
+from src.utils import graph_community
+from src.utils.csv_ingest import ingest_csv
+from src.utils.graph_community import ClusterHierarchy, label_propagation
+
+ROWS = [('感冒', '症状', '发热'), ('感冒', '症状', '咳嗽'), ('肺炎', '症状', '发热')]
+
+
+def _clique(prefix, size):
+    return [(f'{prefix}{i}', '关系', f'{prefix}{j}') for i in range(size) for j in range(i + 1, size)]
+
+
+# 两个5节点的团，A0-B0 一条边相连
+TWO_CLIQUES = _clique('A', 5) + _clique('B', 5) + [('A0', '关系', 'B0')]
+
+
+def test_label_propagation_splits_two_cliques():
+    # 节点0-4、5-9各为一个团，4-5相连
+    pairs = [(i, j) for base in (0, 5) for i in range(base, base + 5) for j in range(i + 1, base + 5)] + [(4, 5)]
+    src = np.array([a for a, _ in pairs], dtype=np.int64)
+    dst = np.array([b for _, b in pairs], dtype=np.int64)
+    weights = np.ones(len(pairs))
+    degree = np.bincount(src, weights=weights, minlength=10) + np.bincount(dst, weights=weights, minlength=10)
+
+    labels = label_propagation(src, dst, weights, 10, degree)
+    assert labels.tolist() == [0] * 5 + [1] * 5
+
+
+def test_hierarchy_children_partition_members(write_csv):
+    graph, _ = ingest_csv(write_csv(TWO_CLIQUES), backend='fast')
+    hierarchy = ClusterHierarchy(graph)
+    assert hierarchy.top_level == 0
+    level = hierarchy.levels[0]
+    assert level.cluster_count == 2
+    assert level.sizes.tolist() == [5, 5]
+
+    members = [{graph.node_ids[node] for node in level.children(cluster).tolist()} for cluster in range(2)]
+    assert sorted(members, key=sorted) == [{f'A{i}' for i in range(5)}, {f'B{i}' for i in range(5)}]
+    # 子成员CSR覆盖全部节点且各簇不重叠
+    assert level.child_offsets.tolist() == [0, 5, 10]
+    assert sorted(level.child_order.tolist()) == list(range(graph.node_count))
+    for cluster in range(2):
+        children = level.children(cluster)
+        assert (level.node_cluster[children] == cluster).all()
+        # 组内按连接数排名排列，代表节点是排名最高的成员
+        assert level.leaders[cluster] == children[0]
+
+
+@pytest.mark.parametrize('cluster_id', ['0:2', '0:-1', '1:0', 'x', '0:1:2'])
+def test_parse_cluster_id_rejects_invalid(write_csv, cluster_id):
+    graph, _ = ingest_csv(write_csv(TWO_CLIQUES), backend='fast')
+    hierarchy = ClusterHierarchy(graph)
+    assert hierarchy.parse_cluster_id('0:1') == (0, 1)
+    with pytest.raises(ValueError):
+        hierarchy.parse_cluster_id(cluster_id)
+
+
+def test_clusters_report_failure(graph_client, monkeypatch):
+    calls = []
+
+    def fail(graph):
+        calls.append(graph)
+        raise MemoryError('内存不足')
+    monkeypatch.setattr(graph_community, 'ClusterHierarchy', fail)
+    client = graph_client(ROWS)
+
+    deadline = time.time() + 10
+    response = client.get('/api/graph/clusters')
+    while response.status_code == 202:
+        assert time.time() < deadline
+        time.sleep(0.01)
+        response = client.get('/api/graph/clusters')
+    assert response.status_code == 500
+    assert '内存不足' in response.get_json()['error']
+    # 同一版本不再重新计算
+    assert client.get('/api/graph/clusters/0:0').status_code == 500
+    assert len(calls) == 1
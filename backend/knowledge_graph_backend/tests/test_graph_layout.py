@@ -0,0 +1,157 @@
+"""
+服务端布局：力导向布局、网格空间索引的矩形查询与视口、布局文件的版本校验，
+以及 /graph/viewport 在布局计算中、计算完成和计算失败时的响应
+"""
+import time
+
+import numpy as np
+
+from src.routes import knowledge_graph
+from src.utils import graph_layout
+from src.utils.graph_layout import GraphLayout, LayoutManager, compute_layout
+from src.utils.graph_store import GraphBuilder
+
+
+def _graph(rows):
+    builder = GraphBuilder()
+    for row in rows:
+        builder.add_edge(*row)
+    return builder.build()
+
+
+# 两个互不相连的星形：中心 A、B 各连5个叶子
+STAR_ROWS = [(center, '关联', f'{center}{i}') for center in 'AB' for i in range(5)]
+
+
+def test_compute_layout():
+    graph = _graph(STAR_ROWS)
+    reports = []
+    x, y = compute_layout(graph, iterations=30, progress=lambda fraction, message: reports.append(fraction))
+    assert len(x) == len(y) == graph.node_count
+    assert np.isfinite(x).all() and np.isfinite(y).all()
+    assert reports[-1] == 1.0 and len(reports) == 30
+    # 坐标居中；相连节点之间的距离小于不相连节点之间的平均距离
+    assert abs(float(x.mean())) < 1e-3 and abs(float(y.mean())) < 1e-3
+    pos = np.stack([x, y], axis=1).astype(np.float64)
+    src = np.frombuffer(graph.edge_src, dtype=np.int32)
+    dst = np.frombuffer(graph.edge_dst, dtype=np.int32)
+    edge_length = np.linalg.norm(pos[src] - pos[dst], axis=1).mean()
+    pairwise = np.linalg.norm(pos[:, None] - pos[None, :], axis=2)
+    assert edge_length < pairwise[np.triu_indices(len(pos), 1)].mean()
+    # 相同种子结果一致
+    assert np.array_equal(compute_layout(graph, iterations=30)[0], x)
+    assert len(compute_layout(_graph([]))[0]) == 0
+
+
+def test_compute_layout_keeps_previous_positions():
+    base = _graph(STAR_ROWS)
+    x, y = compute_layout(base, iterations=30)
+    graph = _graph(STAR_ROWS + [('A', '关联', 'A新')])
+    init = np.stack([x, y], axis=1).astype(np.float64)
+    new_x, new_y = compute_layout(graph, iterations=30, init=init)
+    # 沿用上一版本的坐标时已有节点只小幅移动，新节点放在邻居附近
+    moved = np.hypot(new_x[:base.node_count] - x, new_y[:base.node_count] - y)
+    assert moved.max() < np.ptp(x)
+    new, anchor = graph.node_index['A新'], graph.node_index['A']
+    assert np.hypot(new_x[new] - new_x[anchor], new_y[new] - new_y[anchor]) < np.ptp(x) / 2
+
+
+def _random_layout(n=3000, seed=5):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(scale=30, size=n).astype(np.float32)
+    y = rng.uniform(-50, 50, size=n).astype(np.float32)
+    return GraphLayout(x, y, 'v1', [f'n{i}' for i in range(n)])
+
+
+def test_query_matches_brute_force():
+    layout = _random_layout()
+    rng = np.random.default_rng(8)
+    boxes = [tuple(sorted(rng.uniform(-80, 80, 2))) + tuple(sorted(rng.uniform(-60, 60, 2))) for _ in range(50)]
+    boxes += [(-1000, 1000, -1000, 1000), (200, 300, 0, 1), (0, 0, 0, 0)]
+    for min_x, max_x, min_y, max_y in boxes:
+        expected = np.nonzero((layout.x >= min_x) & (layout.x <= max_x) &
+                              (layout.y >= min_y) & (layout.y <= max_y))[0]
+        assert layout.query(min_x, min_y, max_x, max_y).tolist() == expected.tolist()
+
+
+def test_viewport_filters_by_rank():
+    graph = _graph([('A', '关联', f'A{i}') for i in range(6)] + [('B', '关联', 'B1'), ('B', '关联', 'B2')])
+    n = graph.node_count
+    layout = GraphLayout(np.arange(n, dtype=np.float32), np.zeros(n, dtype=np.float32), 'v1', graph.node_ids)
+    ranks = graph.rank_positions
+    everything = (-1, -1, n, 1)
+
+    nodes, stats = layout.viewport(graph, everything, n, n)
+    assert nodes == list(graph.rank_order)
+    assert stats == {'total_in_bbox': n, 'visible_at_zoom': n, 'truncated': False}
+    # 只显示排名在阈值内的节点，超过 max_nodes 时保留排名靠前的
+    nodes, stats = layout.viewport(graph, everything, 4, 2)
+    assert nodes == list(graph.rank_order[:2])
+    assert stats == {'total_in_bbox': n, 'visible_at_zoom': 4, 'truncated': True}
+    nodes, _ = layout.viewport(graph, (2.5, -1, n, 1), n, n)
+    assert nodes == sorted(range(3, n), key=ranks.__getitem__)
+
+
+def test_save_and_load(tmp_path):
+    layout = _random_layout(200)
+    path = str(tmp_path / 'graph.layout.npz')
+    layout.save(path)
+
+    loaded = GraphLayout.load(path, 'v1', layout.node_ids)
+    assert np.array_equal(loaded.x, layout.x) and np.array_equal(loaded.y, layout.y)
+    assert loaded.query(-10, -10, 10, 10).tolist() == layout.query(-10, -10, 10, 10).tolist()
+    # 版本或节点数不一致、文件损坏时不使用
+    assert GraphLayout.load(path, 'v2', layout.node_ids) is None
+    assert GraphLayout.load(path, 'v1', layout.node_ids[:-1]) is None
+    with open(path, 'wb') as f:
+        f.write(b'broken')
+    assert GraphLayout.load(path, 'v1', layout.node_ids) is None
+
+
+VIEWPORT = '/api/graph/viewport?min_x=-1000&min_y=-1000&max_x=1000&max_y=1000'
+
+
+def _poll(client, url):
+    deadline = time.time() + 10
+    response = client.get(url)
+    while response.status_code == 202:
+        assert response.headers['Retry-After'] == '2'
+        assert time.time() < deadline
+        time.sleep(0.01)
+        response = client.get(url)
+    return response
+
+
+def test_viewport_route(graph_client, monkeypatch):
+    monkeypatch.setattr(knowledge_graph, 'layout_manager', LayoutManager())
+    client = graph_client(STAR_ROWS)
+    first = client.get(VIEWPORT)
+    assert first.status_code == 202
+    assert first.get_json()['layout']['state'] in ('pending', 'running', 'done')
+
+    response = _poll(client, VIEWPORT)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['nodes']) == 12 and len(data['edges']) == 10
+    assert data['nodes'][0]['id'] in ('A', 'B')
+    assert all(-1000 <= node['x'] <= 1000 for node in data['nodes'])
+    assert client.get('/api/graph/viewport?min_x=0').status_code == 400
+
+
+def test_viewport_route_reports_failure(graph_client, monkeypatch):
+    calls = []
+
+    def fail(*args, **kwargs):
+        calls.append(args)
+        raise MemoryError('内存不足')
+    monkeypatch.setattr(graph_layout, 'compute_layout', fail)
+    monkeypatch.setattr(knowledge_graph, 'layout_manager', LayoutManager())
+    client = graph_client(STAR_ROWS)
+
+    response = _poll(client, VIEWPORT)
+    assert response.status_code == 500
+    data = response.get_json()
+    assert '内存不足' in data['error'] and data['layout']['state'] == 'failed'
+    # 退避期内不重新计算
+    assert client.get(VIEWPORT).status_code == 500
+    assert len(calls) == 1
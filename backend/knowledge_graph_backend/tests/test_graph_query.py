@@ -0,0 +1,201 @@
+"""
+图谱遍历：有界BFS按层产出、双向BFS最短路径，触发限制时标记截断原因；
+批量邻居接口合并去重各节点的邻域
+"""
+import pytest
+
+from src.config.graph_config import GraphConfig
+from src.utils.graph_query import BoundedBFS, shortest_paths
+from src.utils.graph_store import GraphBuilder
+
+
+def _build(triples):
+    builder = GraphBuilder()
+    for source, relation, target in triples:
+        builder.add_edge(source, relation, target)
+    return builder.build()
+
+
+# 边编号即插入顺序: A->B1..B5 为 0~4，B1->C1 5，B1->C2 6，B2->C1 7，C1->A 8
+BFS_GRAPH = _build(
+    [('A', 'r', f'B{i}') for i in range(1, 6)] +
+    [('B1', 'r', 'C1'), ('B1', 'r', 'C2'), ('B2', 's', 'C1'), ('C1', 'r', 'A')]
+)
+
+
+def _layers(bfs):
+    ids = BFS_GRAPH.node_ids
+    return [(depth, [ids[n] for n in nodes], edges) for depth, nodes, edges in bfs.layers()]
+
+
+def _bfs(start='A', **kwargs):
+    options = dict(max_depth=2, max_nodes=100, max_fanout=100, direction='out')
+    options.update(kwargs)
+    return BoundedBFS(BFS_GRAPH, BFS_GRAPH.node_index[start], **options)
+
+
+def test_bfs_layers():
+    bfs = _bfs()
+    assert _layers(bfs) == [
+        (0, ['A'], []),
+        (1, ['B1', 'B2', 'B3', 'B4', 'B5'], [0, 1, 2, 3, 4]),
+        # B2->C1 指向已访问节点，仍作为本层的边输出
+        (2, ['C1', 'C2'], [5, 6, 7]),
+    ]
+    assert bfs.truncated is None
+    assert (bfs.node_count, bfs.edge_count) == (8, 8)
+
+
+def test_bfs_last_layer_with_edges_only():
+    bfs = _bfs(max_depth=5)
+    assert _layers(bfs)[-1] == (3, [], [8])
+    assert bfs.truncated is None
+
+
+def test_bfs_fanout_truncation():
+    bfs = _bfs(max_fanout=2)
+    assert _layers(bfs) == [
+        (0, ['A'], []),
+        (1, ['B1', 'B2'], [0, 1]),
+        (2, ['C1', 'C2'], [5, 6, 7]),
+    ]
+    assert bfs.truncated == 'fanout'
+
+
+def test_bfs_max_nodes_truncation():
+    bfs = _bfs(max_nodes=4)
+    assert _layers(bfs) == [
+        (0, ['A'], []),
+        (1, ['B1', 'B2', 'B3'], [0, 1, 2]),
+    ]
+    assert bfs.truncated == 'max_nodes'
+    assert bfs.node_count == 4
+
+
+def test_bfs_direction_and_relations():
+    incoming = _bfs(direction='in', max_depth=1)
+    assert _layers(incoming) == [(0, ['A'], []), (1, ['C1'], [8])]
+
+    relation_s = {BFS_GRAPH.relation_index['s']}
+    assert _layers(_bfs(relations=relation_s)) == [(0, ['A'], [])]
+    both = _bfs('C1', direction='both', relations=relation_s, max_depth=1)
+    assert _layers(both) == [(0, ['C1'], []), (1, ['B2'], [7])]
+
+
+# S 到 T 有两条长度为2的路径（经 a1 / a2）和一条长度为3、只使用关系 q 的路径（经 b1、b2）
+PATH_GRAPH = _build([
+    ('S', 'p', 'a1'), ('a1', 'p', 'T'),
+    ('S', 'p', 'a2'), ('a2', 'p', 'T'),
+    ('S', 'q', 'b1'), ('b1', 'q', 'b2'), ('b2', 'q', 'T'),
+    ('S', 'p', 'x'),
+])
+
+
+def _paths(source, target, **kwargs):
+    options = dict(max_depth=6, max_paths=10)
+    options.update(kwargs)
+    index = PATH_GRAPH.node_index
+    paths, truncated = shortest_paths(PATH_GRAPH, index[source], index[target], **options)
+    for nodes, edges in paths:
+        # 边序列与节点序列首尾相接
+        assert len(edges) == len(nodes) - 1
+        for i, edge in enumerate(edges):
+            ends = {PATH_GRAPH.edge_src[edge], PATH_GRAPH.edge_dst[edge]}
+            assert ends == {nodes[i], nodes[i + 1]}
+    return sorted([PATH_GRAPH.node_ids[n] for n in nodes] for nodes, _ in paths), truncated
+
+
+def test_all_shortest_paths():
+    assert _paths('S', 'T', direction='out') == ([['S', 'a1', 'T'], ['S', 'a2', 'T']], None)
+    assert _paths('T', 'S', direction='both') == ([['T', 'a1', 'S'], ['T', 'a2', 'S']], None)
+    assert _paths('S', 'S') == ([['S']], None)
+
+
+def test_path_direction_and_relations():
+    # 逆边方向从 S 无法到达 T
+    assert _paths('S', 'T', direction='in') == ([], None)
+    assert _paths('T', 'S', direction='in') == ([['T', 'a1', 'S'], ['T', 'a2', 'S']], None)
+    relation_q = {PATH_GRAPH.relation_index['q']}
+    assert _paths('S', 'T', direction='out', relations=relation_q) == ([['S', 'b1', 'b2', 'T']], None)
+
+
+def test_path_truncation():
+    paths, truncated = _paths('S', 'T', direction='out', max_paths=1)
+    assert len(paths) == 1 and truncated == 'max_paths'
+    assert _paths('S', 'T', direction='out', max_depth=1) == ([], 'max_depth')
+    relation_q = {PATH_GRAPH.relation_index['q']}
+    assert _paths('S', 'T', direction='out', relations=relation_q, max_depth=2) == ([], 'max_depth')
+    assert _paths('S', 'T', direction='out', max_visited=2) == ([], 'max_visited')
+
+
+# 感冒、肺炎共享邻居发热，且彼此相连
+BATCH_ROWS = [
+    ('感冒', '症状', '发热'),
+    ('感冒', '症状', '咳嗽'),
+    ('肺炎', '症状', '发热'),
+    ('肺炎', '并发症', '感冒'),
+    ('高血压', '推荐食谱', '芹菜粥'),
+]
+
+
+def _membership_ids(data, node_id):
+    member = data['membership'][node_id]
+    nodes = [data['nodes'][i]['id'] for i in member['nodes']]
+    edges = [(data['edges'][i]['source'], data['edges'][i]['target']) for i in member['edges']]
+    return nodes, edges
+
+
+def test_batch_neighbors_dedupes_merged_neighborhood(graph_client):
+    client = graph_client(BATCH_ROWS)
+    response = client.post('/api/node/neighbors/batch', json={'ids': ['感冒', '肺炎', '感冒']})
+    assert response.status_code == 200
+    data = response.get_json()
+
+    # 共享的节点和边只出现一次
+    assert [node['id'] for node in data['nodes']] == ['感冒', '发热', '咳嗽', '肺炎']
+    assert [(edge['source'], edge['target']) for edge in data['edges']] == \
+        [('感冒', '发热'), ('感冒', '咳嗽'), ('肺炎', '发热'), ('肺炎', '感冒')]
+    assert data['center_nodes'] == ['感冒', '肺炎']
+    assert data['missing'] == []
+
+    nodes, edges = _membership_ids(data, '感冒')
+    assert sorted(nodes) == sorted(['感冒', '发热', '咳嗽', '肺炎'])
+    assert sorted(edges) == sorted([('感冒', '发热'), ('感冒', '咳嗽'), ('肺炎', '感冒')])
+    assert data['membership']['感冒']['neighbor_count'] == 3
+    nodes, edges = _membership_ids(data, '肺炎')
+    assert sorted(nodes) == sorted(['肺炎', '发热', '感冒'])
+    assert sorted(edges) == sorted([('肺炎', '发热'), ('肺炎', '感冒')])
+
+    # GET 与 POST 结果一致，方向过滤同 /node/neighbors
+    assert client.get('/api/node/neighbors/batch?id=感冒&id=肺炎').get_json() == data
+    data = client.get('/api/node/neighbors/batch?id=感冒&id=肺炎&direction=out').get_json()
+    assert [node['id'] for node in data['nodes']] == ['感冒', '发热', '咳嗽', '肺炎']
+    assert _membership_ids(data, '感冒')[1] == [('感冒', '发热'), ('感冒', '咳嗽')]
+
+
+def test_batch_neighbors_reports_unknown_ids(graph_client):
+    client = graph_client(BATCH_ROWS)
+    data = client.post('/api/node/neighbors/batch', json={'ids': ['不存在', '高血压']}).get_json()
+    assert data['missing'] == ['不存在']
+    assert data['center_nodes'] == ['高血压']
+    assert [node['id'] for node in data['nodes']] == ['高血压', '芹菜粥']
+
+    data = client.post('/api/node/neighbors/batch', json={'ids': ['不存在']}).get_json()
+    assert data == {'nodes': [], 'edges': [], 'membership': {}, 'center_nodes': [], 'missing': ['不存在']}
+
+
+@pytest.mark.parametrize('body', [{}, {'ids': []}, {'ids': '感冒'}])
+def test_batch_neighbors_requires_ids(graph_client, body):
+    client = graph_client(BATCH_ROWS)
+    assert client.post('/api/node/neighbors/batch', json=body).status_code == 400
+
+
+def test_batch_neighbors_id_limit(graph_client):
+    client = graph_client(BATCH_ROWS)
+    ids = [f'节点{i}' for i in range(GraphConfig.BATCH_MAX_IDS)]
+    assert client.post('/api/node/neighbors/batch', json={'ids': ids}).status_code == 200
+    # 重复ID去重后计数
+    assert client.post('/api/node/neighbors/batch', json={'ids': ids + ids[:1]}).status_code == 200
+    response = client.post('/api/node/neighbors/batch', json={'ids': ids + ['感冒']})
+    assert response.status_code == 400
+    assert str(GraphConfig.BATCH_MAX_IDS) in response.get_json()['error']
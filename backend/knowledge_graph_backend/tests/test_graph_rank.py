@@ -0,0 +1,91 @@
+"""
+节点重要性排序：PageRank的numpy与纯Python实现一致、无出边节点的分数被均匀分配；
+源点全部参与抽样时介数中心性等于精确值；/graph?rank_by= 按所选方式分页，计算失败时返回错误且不重新计算
+"""
+import pytest
+
+from src.config.graph_config import GraphConfig
+from src.utils import graph_store
+from src.utils.csv_ingest import ingest_csv
+from src.utils.graph_rank import _pagerank_python, approximate_betweenness, pagerank
+
+# D、E没有出边
+ROWS = [
+    ('A', '关系', 'B'),
+    ('A', '关系', 'C'),
+    ('B', '关系', 'C'),
+    ('C', '关系', 'A'),
+    ('C', '关系', 'D'),
+    ('E', '关系', 'A'),
+    ('B', '关系', 'E'),
+]
+PATH_ROWS = [(f'P{i}', '关系', f'P{i + 1}') for i in range(4)]
+STAR_ROWS = [('中心', '关系', f'叶{i}') for i in range(4)]
+
+
+def _graph(write_csv, rows):
+    graph, _ = ingest_csv(write_csv(rows), backend='fast')
+    return graph
+
+
+def test_pagerank_numpy_matches_python(write_csv):
+    graph = _graph(write_csv, ROWS)
+    damping, tol, max_iter = GraphConfig.PAGERANK_DAMPING, 1e-12, 500
+    fast = pagerank(graph, damping, tol, max_iter)
+    slow = _pagerank_python(graph, damping, tol, max_iter)
+    assert list(fast) == pytest.approx(slow, abs=1e-9)
+    assert sum(fast) == pytest.approx(1.0)
+
+
+def test_pagerank_spreads_dangling_mass(write_csv):
+    # 只有 起点 -> 终点 一条边：终点没有出边，它的分数均匀分配给所有节点
+    graph = _graph(write_csv, [('起点', '关系', '终点')])
+    damping = 0.85
+    rank = pagerank(graph, damping, 1e-12, 500)
+    start, end = graph.node_index['起点'], graph.node_index['终点']
+    assert rank[start] == pytest.approx((damping * rank[end] + 1 - damping) / 2)
+    assert rank[end] == pytest.approx(damping * rank[start] + rank[start])
+    assert sum(rank) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('rows, expected', [
+    # 路径 P0-P1-P2-P3-P4：第i个节点位于 i·(4-i) 对节点的最短路径上
+    (PATH_ROWS, {'P0': 0, 'P1': 3, 'P2': 4, 'P3': 3, 'P4': 0}),
+    # 星形：4个叶子两两之间都经过中心
+    (STAR_ROWS, {'中心': 6, '叶0': 0, '叶1': 0, '叶2': 0, '叶3': 0}),
+])
+def test_betweenness_exact_when_all_sources_sampled(write_csv, rows, expected):
+    graph = _graph(write_csv, rows)
+    betweenness = approximate_betweenness(graph, samples=graph.node_count)
+    assert {node: betweenness[graph.node_index[node]] for node in expected} == pytest.approx(expected)
+
+
+def test_graph_rank_by(graph_client):
+    client = graph_client(STAR_ROWS + PATH_ROWS)
+    data = client.get('/api/graph?rank_by=betweenness&page_size=2').get_json()
+    assert [node['id'] for node in data['nodes']] == ['中心', 'P2']
+    assert data['nodes'][0]['score'] > data['nodes'][1]['score']
+    assert data['pagination']['rank_by'] == 'betweenness'
+
+    data = client.get('/api/graph?rank_by=pagerank&page_size=20').get_json()
+    scores = [node['score'] for node in data['nodes']]
+    assert len(scores) == 10 and scores == sorted(scores, reverse=True)
+    assert client.get('/api/graph?rank_by=unknown').status_code == 400
+
+
+def test_graph_rank_by_reports_failure(graph_client, monkeypatch):
+    calls = []
+
+    def fail(graph):
+        calls.append(graph)
+        raise MemoryError('内存不足')
+    monkeypatch.setattr(graph_store, 'approximate_betweenness', fail)
+    client = graph_client(STAR_ROWS)
+
+    for _ in range(2):
+        response = client.get('/api/graph?rank_by=betweenness')
+        assert response.status_code == 500
+        assert 'betweenness 计算失败: 内存不足' in response.get_json()['error']
+    # 失败记录在图谱上，之后的请求不再重新计算；其他排序方式不受影响
+    assert len(calls) == 1
+    assert client.get('/api/graph?rank_by=pagerank').status_code == 200
@@ -0,0 +1,112 @@
+"""
+二进制快照：写入后映射读回的图谱与解析结果一致，来源CSV改写后快照视为过期
+"""
+import os
+import time
+
+from src.utils.csv_ingest import ingest_csv
+from src.utils.graph_cache import KnowledgeGraphCache
+from src.utils.graph_snapshot import (
+    GraphSnapshot, build_snapshot, get_snapshot_path, load_snapshot, main, write_snapshot
+)
+
+ROWS = [
+    ('感冒', '症状', '发热'),
+    ('感冒', '症状', '咳嗽'),
+    ('感冒', '常用药品', '布洛芬'),
+    ('肺炎', '症状', '发热'),
+    ('肺炎', '并发症', '感冒'),
+    ('高血压', '推荐食谱', '芹菜粥'),
+]
+
+
+def _edges(graph):
+    return [graph.edge_dict(edge) for edge in range(graph.edge_count)]
+
+
+def test_snapshot_round_trip(tmp_path, write_csv):
+    graph, stats = ingest_csv(write_csv(ROWS), backend='fast')
+    snapshot_path = str(tmp_path / 'graph.kgsnap')
+    write_snapshot(graph, snapshot_path, {'size': 1, 'fingerprint': 'x'}, stats)
+
+    snapshot = GraphSnapshot(snapshot_path)
+    restored = snapshot.to_compact_graph()
+    assert restored.node_ids == graph.node_ids
+    assert restored.relations == graph.relations
+    assert _edges(restored) == _edges(graph)
+    assert list(restored.degree) == list(graph.degree)
+    assert list(restored.rank_order) == list(graph.rank_order)
+    for node in range(graph.node_count):
+        assert list(restored.out_edge_ids(node)) == list(graph.out_edge_ids(node))
+        assert list(restored.in_edge_ids(node)) == list(graph.in_edge_ids(node))
+    assert snapshot.header['ingest']['edges'] == stats['edges']
+
+
+def test_snapshot_stale_after_same_length_edit(write_csv):
+    csv_path = write_csv(ROWS)
+    build_snapshot(csv_path)
+    cache = KnowledgeGraphCache()
+    assert load_snapshot(get_snapshot_path(csv_path), cache._get_source_info(csv_path)) is not None
+
+    # 同长度改写：大小不变，修改时间和抽样块哈希（小文件整体参与抽样）能发现变化
+    with open(csv_path, 'r+b') as f:
+        data = f.read()
+        f.seek(0)
+        f.write(data.replace('芹菜粥'.encode('utf-8'), '小米粥'.encode('utf-8')))
+    assert load_snapshot(get_snapshot_path(csv_path), cache._get_source_info(csv_path)) is None
+
+
+def test_load_graph_prefers_valid_snapshot(write_csv, monkeypatch):
+    csv_path = write_csv(ROWS)
+    header = build_snapshot(csv_path)
+
+    cache = KnowledgeGraphCache()
+    def fail(*args, **kwargs):
+        raise AssertionError('快照有效时不应解析CSV')
+    monkeypatch.setattr(cache, '_parse_csv_optimized', fail)
+    cache.load_graph(csv_path)
+
+    generation = cache.get_generation()
+    assert generation.store.edge_count == header['edge_count']
+    assert generation.ingest_stats['edges'] == header['edge_count']
+    assert '感冒' in generation.search_index['exact']
+
+
+def _rewrite_middle_keep_mtime(csv_path):
+    """同长度改写中间一行，并恢复修改时间"""
+    stat = os.stat(csv_path)
+    with open(csv_path, 'r+b') as f:
+        data = f.read()
+        f.seek(0)
+        f.write(data.replace('布洛芬'.encode('utf-8'), '对乙酰'.encode('utf-8')))
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_background_check_reparses_when_unsampled_bytes_change(write_csv, monkeypatch):
+    # 只抽样首尾各8字节，中间的改写在启动时发现不了
+    monkeypatch.setattr(KnowledgeGraphCache, 'SAMPLE_BLOCKS', 2)
+    monkeypatch.setattr(KnowledgeGraphCache, 'SAMPLE_BLOCK_SIZE', 8)
+    csv_path = write_csv(ROWS)
+    build_snapshot(csv_path)
+    _rewrite_middle_keep_mtime(csv_path)
+
+    cache = KnowledgeGraphCache()
+    cache.load_graph(csv_path)
+
+    # 后台核对全部内容后不再使用快照，重新解析CSV发布新版本
+    deadline = time.time() + 5
+    while cache.get_generation().version < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    generation = cache.get_generation()
+    assert generation.version == 2
+    assert '对乙酰' in generation.store.node_index
+    assert '布洛芬' not in generation.store.node_index
+    assert generation.content_fingerprint == cache._get_content_fingerprint(csv_path, os.path.getsize(csv_path))
+
+
+def test_info_cli_verifies_full_content(write_csv):
+    csv_path = write_csv(ROWS)
+    build_snapshot(csv_path)
+    assert main(['info', get_snapshot_path(csv_path), '--csv', csv_path]) == 0
+    _rewrite_middle_keep_mtime(csv_path)
+    assert main(['info', get_snapshot_path(csv_path), '--csv', csv_path]) == 1
@@ -0,0 +1,79 @@
+"""
+条件请求：同一代图谱的重复请求返回304，参数或图谱版本变化后返回新内容
+"""
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify, request
+
+from src.utils.http_cache import conditional_get
+
+
+@pytest.fixture
+def app():
+    state = {'generation': SimpleNamespace(version_id='v1', timestamp=1700000000.5), 'calls': 0}
+    app = Flask(__name__)
+
+    @app.route('/search', methods=['GET', 'POST'])
+    @conditional_get(lambda: state['generation'])
+    def search():
+        state['calls'] += 1
+        if request.args.get('swap'):
+            # 处理期间发布了新一代数据
+            state['generation'] = SimpleNamespace(version_id='v-swap', timestamp=1700000100.0)
+        response = jsonify({'q': request.args.get('q'), 'calls': state['calls']})
+        if request.args.get('private'):
+            response.cache_control.no_store = True
+        return response
+
+    app.state = state
+    return app
+
+
+def test_etag_and_not_modified(app):
+    client = app.test_client()
+    first = client.get('/search?q=感冒')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert first.headers['Last-Modified']
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    second = client.get('/search?q=感冒', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    assert app.state['calls'] == 1
+
+    modified = client.get('/search?q=感冒', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert modified.status_code == 304
+
+
+def test_etag_depends_on_params_and_accept(app):
+    client = app.test_client()
+    etag = client.get('/search?q=感冒').headers['ETag']
+    assert client.get('/search?q=发热').headers['ETag'] != etag
+    assert client.get('/search?q=感冒', headers={'Accept': 'application/x-msgpack'}).headers['ETag'] != etag
+    # 参数顺序不影响ETag
+    assert client.get('/search?q=感冒&page=2').headers['ETag'] == client.get('/search?page=2&q=感冒').headers['ETag']
+
+
+def test_new_generation_invalidates(app):
+    client = app.test_client()
+    etag = client.get('/search?q=感冒').headers['ETag']
+    app.state['generation'] = SimpleNamespace(version_id='v2', timestamp=1700000200.0)
+    response = client.get('/search?q=感冒', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_no_cache_headers_when_uncacheable(app):
+    client = app.test_client()
+    assert 'ETag' not in client.post('/search?q=感冒').headers
+    assert 'ETag' not in client.get('/search?q=感冒&swap=1').headers
+    assert 'ETag' not in client.get('/search?q=感冒&private=1').headers
+
+    app.state['generation'] = None
+    response = client.get('/search?q=感冒')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
@@ -0,0 +1,58 @@
+"""
+n-gram子串索引：结果与 `query in label` 线性扫描一致（含分段追加和无numpy的字典实现）
+"""
+import random
+
+import pytest
+
+from src.utils import ngram_index
+from src.utils.ngram_index import NgramIndex
+
+ALPHABET = '感冒发热咳嗽头痛AbCa'
+
+
+def _labels(count, seed=7):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 6))) for _ in range(count)]
+
+
+def _queries():
+    rng = random.Random(11)
+    fixed = ['感', '感冒', '冒发热', 'ab', 'ABC', 'aa', '不存在', '感冒发热咳嗽头痛']
+    return fixed + [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 4))) for _ in range(60)]
+
+
+def _scan(query, labels):
+    query = query.lower()
+    return [i for i, label in enumerate(labels) if query in label.lower()]
+
+
+@pytest.fixture(params=['numpy', 'dict'])
+def backend(request, monkeypatch):
+    if request.param == 'dict':
+        monkeypatch.setattr(ngram_index, 'np', None)
+    return request.param
+
+
+def test_matches_linear_scan(backend, monkeypatch):
+    # 降低逐个校验的阈值，使常见二元组走倒排表求交路径
+    monkeypatch.setattr(ngram_index, '_VERIFY_THRESHOLD', 16)
+    labels = _labels(3000)
+    index = NgramIndex.build(labels)
+    for query in _queries():
+        assert index.search(query, labels) == _scan(query, labels), query
+    assert index.search('感冒', labels, limit=5) == _scan('感冒', labels)[:5]
+    assert index.search('', labels) == []
+
+
+def test_extend_matches_full_build(backend, monkeypatch):
+    monkeypatch.setattr(ngram_index, '_MAX_SEGMENTS', 3)
+    labels = _labels(1200)
+    index = NgramIndex.build(labels[:300])
+    # 分段数达到上限后合并重建
+    for end in (500, 700, 900, 1200):
+        index = index.extend(labels[:end])
+        assert index.size == end
+        for query in _queries():
+            assert index.search(query, labels[:end]) == _scan(query, labels[:end]), query
+    assert index.extend(labels) is index
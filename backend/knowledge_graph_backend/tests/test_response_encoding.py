@@ -0,0 +1,95 @@
+"""
+响应编码的内容协商：显式请求MessagePack（含与 */* 同q值的情况）时返回MessagePack，q=0 表示拒绝；
+压缩方式按 Accept-Encoding 的q值选择，相同时优先brotli
+"""
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from src.config.graph_config import GraphConfig
+from src.utils import response_encoding
+from src.utils.response_encoding import (
+    MSGPACK_MIMETYPES, encode_response, negotiate_compression, negotiate_format
+)
+
+app = Flask(__name__)
+
+
+@pytest.fixture
+def codecs(monkeypatch):
+    """测试环境未必安装msgpack和brotli，以可辨认的编码代替，只检验协商结果"""
+    monkeypatch.setitem(response_encoding.SERIALIZERS, 'msgpack', (MSGPACK_MIMETYPES[0], lambda payload: b'msgpack'))
+    monkeypatch.setitem(response_encoding.COMPRESSORS, 'br', lambda body: b'br:' + body)
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, 'json'),
+    ('*/*', 'json'),
+    ('application/json', 'json'),
+    ('application/msgpack', 'msgpack'),
+    ('application/x-msgpack', 'msgpack'),
+    # 显式列出的类型在q值相同时优先于通配符
+    ('application/msgpack, */*', 'msgpack'),
+    ('application/msgpack, application/*', 'msgpack'),
+    ('application/msgpack, application/json', 'json'),
+    ('application/msgpack;q=0.5, */*', 'json'),
+    ('application/json;q=0.5, application/msgpack', 'msgpack'),
+    ('application/msgpack;q=0, */*', 'json'),
+    ('text/html', 'json'),
+])
+def test_negotiate_format(codecs, accept, expected):
+    headers = {'Accept': accept} if accept else {}
+    with app.test_request_context(headers=headers):
+        assert negotiate_format() == expected
+
+
+def test_msgpack_requires_library(monkeypatch):
+    monkeypatch.delitem(response_encoding.SERIALIZERS, 'msgpack', raising=False)
+    with app.test_request_context(headers={'Accept': 'application/msgpack'}):
+        assert negotiate_format() == 'json'
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    (None, None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('br', 'br'),
+    ('gzip, br', 'br'),
+    ('*', 'br'),
+    ('gzip, br;q=0.5', 'gzip'),
+    ('br;q=0, *', 'gzip'),
+    ('gzip;q=0, br;q=0', None),
+    ('*;q=0', None),
+])
+def test_negotiate_compression(codecs, accept_encoding, expected):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    with app.test_request_context(headers=headers):
+        assert negotiate_compression(GraphConfig.COMPRESS_MIN_BYTES) == expected
+        # 小响应不压缩
+        assert negotiate_compression(GraphConfig.COMPRESS_MIN_BYTES - 1) is None
+
+
+def test_brotli_requires_library(monkeypatch):
+    monkeypatch.delitem(response_encoding.COMPRESSORS, 'br', raising=False)
+    with app.test_request_context(headers={'Accept-Encoding': 'br'}):
+        assert negotiate_compression(GraphConfig.COMPRESS_MIN_BYTES) is None
+    with app.test_request_context(headers={'Accept-Encoding': '*'}):
+        assert negotiate_compression(GraphConfig.COMPRESS_MIN_BYTES) == 'gzip'
+
+
+def test_encode_response(codecs):
+    payload = {'nodes': [{'id': f'节点{i}'} for i in range(1000)]}
+    with app.test_request_context(headers={'Accept': '*/*', 'Accept-Encoding': 'gzip'}):
+        response = encode_response(payload)
+        assert response.mimetype == 'application/json'
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.get_data())) == payload
+        assert {'Accept', 'Accept-Encoding'} <= set(response.vary)
+
+    with app.test_request_context(headers={'Accept': 'application/msgpack, */*'}):
+        response = encode_response({'ok': True})
+        assert response.mimetype == MSGPACK_MIMETYPES[0]
+        assert response.get_data() == b'msgpack'
+        assert 'Content-Encoding' not in response.headers
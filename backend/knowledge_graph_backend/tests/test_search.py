@@ -0,0 +1,334 @@
+"""
+实体搜索：前缀补全、容错索引与暴力扫描一致，BM25增量更新与全量构建一致，
+语义向量的IVF检索在探查全部簇时与穷举一致；
+各匹配阶段按 精确 > 前缀 > 词语 > 容错 > BM25 的顺序给出结果；搜索结果按图谱版本缓存
+"""
+import random
+import time
+
+import numpy as np
+import pytest
+
+from src.ai import medical_ai
+from src.config.graph_config import GraphConfig
+from src.utils import fuzzy_index
+from src.utils import graph_cache as graph_cache_module
+from src.utils.bm25_index import BM25Index, BM25Manager
+from src.utils.fuzzy_index import FuzzyIndex, bounded_distance
+from src.utils.graph_cache import KnowledgeGraphCache
+from src.utils.graph_store import GraphBuilder
+from src.utils.suggest_index import SuggestIndex
+from src.utils.vector_index import VectorIndex, VectorManager
+
+ROWS = [
+    ('高血压', '症状', '头晕'),
+    ('高血压', '症状', '心悸'),
+    ('高血压', '常用药品', '硝苯地平'),
+    ('高血压病', '症状', '头晕'),
+    ('高血压危象', '症状', '头晕'),
+    ('高血压危象', '并发症', '脑出血'),
+    ('糖尿病', '症状', '多饮'),
+    ('糖尿病', '常用药品', '二甲双胍'),
+    ('糖尿病肾病', '症状', '蛋白尿'),
+    ('primary hypertension', '所属科室', '心内科'),
+]
+
+
+@pytest.fixture
+def cache(write_csv, monkeypatch):
+    """加载测试图谱的独立缓存实例（BM25使用独立的管理器，互不影响）"""
+    monkeypatch.setattr(graph_cache_module, 'bm25_manager', BM25Manager())
+    monkeypatch.setattr(graph_cache_module, 'vector_manager', VectorManager())
+    cache = KnowledgeGraphCache()
+    cache.load_graph(write_csv(ROWS))
+    return cache
+
+
+def _wait_bm25(cache):
+    generation = cache.get_generation()
+    manager = graph_cache_module.bm25_manager
+    manager.schedule(generation)
+    deadline = time.time() + 10
+    while manager.get(generation) is None:
+        assert time.time() < deadline, manager.status(generation)
+        time.sleep(0.01)
+    return manager.get(generation)
+
+
+def _search(cache, query, limit=10):
+    return [(result['label'], result['match_type']) for result in cache.search_entities_fast(query, limit)]
+
+
+def test_suggest_matches_brute_force():
+    rng = random.Random(3)
+    labels = [''.join(rng.choice('高血压糖尿病Ab') for _ in range(rng.randint(1, 5))) for _ in range(2000)]
+    ranks = list(range(len(labels)))
+    rng.shuffle(ranks)
+    # scan_max 较小时大部分前缀都是预先计算的重前缀
+    index = SuggestIndex.build(labels, ranks, top_k=5, scan_max=16)
+    assert index.heavy_prefix_count > 0
+    for prefix in ['高', '高血', '糖尿病', 'a', 'AB', 'b高', '不存在']:
+        matches = sorted((i for i, label in enumerate(labels) if label.lower().startswith(prefix.lower())),
+                         key=ranks.__getitem__)
+        assert index.complete(prefix, 5) == matches[:5], prefix
+        assert index.complete(prefix, 12) == matches[:12], prefix
+        assert index.count(prefix) == len(matches)
+
+
+def test_suggest_extend_matches_build():
+    rng = random.Random(5)
+    labels = [''.join(rng.choice('高血压糖尿病') for _ in range(rng.randint(1, 4))) for _ in range(600)]
+    ranks = list(range(len(labels)))
+    rng.shuffle(ranks)
+    extended = SuggestIndex.build(labels[:400], ranks[:400], 5, 16).extend(labels, 400, ranks)
+    rebuilt = SuggestIndex.build(labels, ranks, 5, 16)
+    assert extended.keys == rebuilt.keys
+    for prefix in ['高', '血压', '糖尿', '病病']:
+        assert extended.complete(prefix, 8) == rebuilt.complete(prefix, 8)
+
+
+def test_stage_order_exact_then_prefix(cache):
+    # 前缀匹配分数相同时按连接数排序
+    assert _search(cache, '高血压') == [
+        ('高血压', 'exact'), ('高血压危象', 'prefix'), ('高血压病', 'prefix'),
+    ]
+    assert _search(cache, '高血压', limit=2) == [('高血压', 'exact'), ('高血压危象', 'prefix')]
+    # 更长的前缀分数更高
+    results = cache.search_entities_fast('高血压病人')
+    assert [(r['label'], r['match_score']) for r in results] == [
+        ('高血压病', 84), ('高血压', 83), ('高血压危象', 83),
+    ]
+
+
+def test_long_query_exact_match_ranks_first(cache, write_csv):
+    # 前缀加分有上限：长查询的前缀匹配（连接数更多）仍排在精确匹配之后
+    long_label = '遗传性家族性高胆固醇血症合并早发冠状动脉粥样硬化性心脏病'
+    rows = [(long_label, '症状', '胸痛')] + [(long_label + '型', '症状', f'症状{i}') for i in range(5)]
+    cache.load_graph(write_csv(rows))
+    results = cache.search_entities_fast(long_label)
+    assert [(r['label'], r['match_type'], r['match_score']) for r in results] == [
+        (long_label, 'exact', 100), (long_label + '型', 'prefix', 86),
+    ]
+
+
+def test_token_stage(cache):
+    assert _search(cache, 'hypertension') == [('primary hypertension', 'token')]
+    assert _search(cache, '  PRIMARY  ') == [('primary hypertension', 'prefix')]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_fuzzy_matches_brute_force(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(fuzzy_index, 'np', None)
+    rng = random.Random(9)
+    labels = [''.join(rng.choice('高血压糖尿病Ab') for _ in range(rng.randint(1, 8))) for _ in range(1500)]
+    ranks = list(range(len(labels)))
+    rng.shuffle(ranks)
+    # 前缀长度小于标签长度时只按前缀生成删除变体，校验阶段仍按完整标签计算距离
+    index = FuzzyIndex.build(labels[:1000], max_distance=2, prefix_length=4).extend(labels)
+    queries = [labels[i] for i in rng.sample(range(len(labels)), 20)] + ['高血压病', 'ab糖尿', '病压血高a']
+    for query in queries:
+        for distance in (1, 2):
+            expected = sorted((bounded_distance(query.lower(), label.lower(), distance), ranks[i], i)
+                              for i, label in enumerate(labels))
+            expected = [(i, d) for d, _, i in expected if d <= distance][:10]
+            assert index.search(query, labels, ranks, 10, distance) == expected, (query, distance)
+
+
+def test_fuzzy_stage(cache):
+    # 相邻两字颠倒、错字各计距离1
+    assert _search(cache, '血高压') == [('高血压', 'fuzzy')]
+    result = cache.search_entities_fast('糖屎病')[0]
+    assert (result['label'], result['match_score'], result['edit_distance']) == ('糖尿病', 40, 1)
+    # 不超过 FUZZY_SHORT_QUERY 个字的查询只允许距离1
+    assert _search(cache, '压血高') == []
+
+
+def _graph(rows, base=None):
+    builder = GraphBuilder() if base is None else GraphBuilder.from_graph(base)
+    for row in rows:
+        builder.add_edge(*row)
+    return builder.build()
+
+
+def test_bm25_extend_matches_full_build():
+    base = _graph(ROWS)
+    # 追加：新实体、已有实体之间的新边、已有实体指向新实体的边
+    graph = _graph([('糖尿病', '并发症', '高血压'), ('糖尿病足', '症状', '溃疡'),
+                    ('高血压', '常用药品', '缬沙坦')], base)
+    extended = BM25Index.build(base).extend(graph, base.node_count, base.edge_count)
+    rebuilt = BM25Index.build(graph)
+
+    assert extended.segment_count == 2
+    assert extended.total_length == pytest.approx(rebuilt.total_length)
+    assert extended.term_count == rebuilt.term_count
+    for query in ['糖尿病并发症', '高血压常用药品', '溃疡', '哪些药品治疗高血压', '糖尿病足']:
+        expected = rebuilt.search(query, 20, graph.rank_positions)
+        actual = extended.search(query, 20, graph.rank_positions)
+        assert [node for node, _ in actual] == [node for node, _ in expected], query
+        assert [score for _, score in actual] == pytest.approx([score for _, score in expected]), query
+
+
+def test_bm25_gates():
+    index = BM25Index.build(_graph(ROWS))
+    assert index.search('双胍', 5)
+    # 只有一个词项的查询不返回结果
+    assert index.search('双胍', 5, min_terms=2) == []
+    assert index.search('糖尿病药品', 5, min_terms=2)
+    # 得分不可能达到满分（词频有限）
+    assert index.search('糖尿病药品', 5, min_score_ratio=1.0) == []
+
+
+def test_bm25_stage(cache):
+    # BM25索引就绪前跳过该阶段，就绪后不会命中就绪前缓存的结果
+    assert _search(cache, '哪些药品治疗糖尿病') == []
+    _wait_bm25(cache)
+    results = cache.search_entities_fast('哪些药品治疗糖尿病')
+    assert (results[0]['label'], results[0]['match_type'], results[0]['match_score']) == ('糖尿病', 'bm25', 25.0)
+    assert all(result['match_type'] == 'bm25' for result in results)
+    # 单个词项的查询、已有精确或前缀匹配的查询不补充BM25结果
+    assert _search(cache, '双胍') == []
+    assert all(match_type != 'bm25' for _, match_type in _search(cache, '糖尿病常用药品'))
+
+
+def _symptom_graph(disease_count=600, seed=13):
+    rng = random.Random(seed)
+    chars = '热咳痛晕痒肿胀酸麻吐泻喘悸乏渴汗'
+    symptoms = sorted({''.join(rng.sample(chars, 2)) for _ in range(80)})
+    drugs = [f'药物{chr(0x4e00 + i)}' for i in range(40)]
+    rows = []
+    for i in range(disease_count):
+        for symptom in rng.sample(symptoms, 3):
+            rows.append((f'疾病{i}', '症状', symptom))
+        rows.append((f'疾病{i}', '常用药品', rng.choice(drugs)))
+    return _graph(rows)
+
+
+def test_vector_ivf_full_probe_matches_exhaustive(monkeypatch):
+    monkeypatch.setattr(GraphConfig, 'VECTOR_IVF_MIN_NODES', 100)
+    graph = _symptom_graph()
+    index = VectorIndex.build(graph, 'v1', dim=16)
+    assert index.list_count > 1
+    assert sorted(index.order.tolist()) == list(range(graph.node_count))
+
+    queries = ['发热咳嗽', '头晕乏力', '疾病12', '药物丁']
+    embedded = index.embed(queries)
+    batch = index.search_vectors(embedded, 5, nprobe=index.list_count)
+    for row, query in enumerate(queries):
+        scores = index.vectors @ embedded[row]
+        expected = [int(node) for node in index.order[np.argsort(-scores, kind='stable')[:5]]]
+        single = index.search(query, 5, nprobe=index.list_count)
+        assert [node for node, _ in single] == expected, query
+        assert [node for node, _ in batch[row]] == expected, query
+        assert [score for _, score in single] == pytest.approx(sorted(scores, reverse=True)[:5], abs=1e-5)
+    # 查询中没有已知词项时返回空结果
+    assert index.search('xyz', 5) == []
+
+
+def test_vector_index_save_and_load(tmp_path, monkeypatch):
+    graph = _symptom_graph(100)
+    index = VectorIndex.build(graph, 'v1', dim=8)
+    path = str(tmp_path / 'graph.vectors.npz')
+    index.save(path)
+
+    loaded = VectorIndex.load(path, 'v1', graph.node_count)
+    assert loaded.search('发热咳嗽', 5) == index.search('发热咳嗽', 5)
+    assert VectorIndex.load(path, 'v2', graph.node_count) is None
+    monkeypatch.setattr(GraphConfig, 'VECTOR_DIM', GraphConfig.VECTOR_DIM + 1)
+    assert VectorIndex.load(path, 'v1', graph.node_count) is None
+
+
+def test_semantic_search(cache):
+    # 向量尚未算好时返回空列表并在后台开始计算
+    assert cache.search_semantic('血压高头晕') == []
+    generation = cache.get_generation()
+    manager = graph_cache_module.vector_manager
+    deadline = time.time() + 10
+    while manager.get(generation) is None:
+        assert time.time() < deadline, manager.status(generation)
+        time.sleep(0.01)
+
+    results = cache.search_semantic('血压高头晕', limit=5)
+    assert results
+    similarities = [result['similarity'] for result in results]
+    assert similarities == sorted(similarities, reverse=True)
+    assert min(similarities) >= GraphConfig.VECTOR_MIN_SIMILARITY
+    assert all(result['match_type'] == 'semantic' for result in results)
+
+
+def test_semantic_search_does_not_retry_failed_build(cache, monkeypatch):
+    calls = []
+
+    def fail(*args, **kwargs):
+        calls.append(args)
+        raise MemoryError('内存不足')
+    monkeypatch.setattr(VectorIndex, 'build', staticmethod(fail))
+    generation = cache.get_generation()
+    manager = graph_cache_module.vector_manager
+    assert cache.search_semantic('血压高头晕') == []
+    deadline = time.time() + 10
+    while manager.status(generation)['state'] != 'failed':
+        assert time.time() < deadline
+        time.sleep(0.01)
+    # 退避期内的请求不重新计算
+    for _ in range(5):
+        assert cache.search_semantic('血压高头晕') == []
+    assert manager.status(generation)['state'] == 'failed'
+    assert len(calls) == 1
+
+
+def _hits(cache):
+    return cache.get_search_cache_stats()['hits']
+
+
+def test_entity_search_cache(cache):
+    # BM25是否就绪计入缓存键，先等待就绪
+    _wait_bm25(cache)
+    first = cache.search_entities_fast('高血压')
+    hits = _hits(cache)
+    # 大小写和首尾空白不同的查询共用缓存条目；调用方修改结果不影响缓存
+    first[0]['label'] = 'changed'
+    assert cache.search_entities_fast('  高血压 ') == cache.search_entities_fast('高血压')
+    assert cache.search_entities_fast('高血压')[0]['label'] == '高血压'
+    assert _hits(cache) == hits + 3
+
+
+def test_relation_search_cache(cache):
+    results = cache.search_by_relation_fast('高血压', '症状')
+    assert sorted(result['label'] for result in results) == ['头晕', '心悸']
+    hits = _hits(cache)
+    again = cache.search_by_relation_fast(' 高血压 ', '症状 ')
+    assert _hits(cache) == hits + 1
+    assert [result['id'] for result in again] == [result['id'] for result in results]
+    assert cache.search_by_relation_fast(' ', '症状') == []
+
+    # 缓存键使用规范化的疾病名，返回的来源疾病仍是调用方传入的原始字符串
+    indexed = [result for result in results if result['search_method'] == 'disease_relations_index']
+    assert indexed and all(result['source_disease'] == '高血压' for result in indexed)
+    assert all(result['source_disease'] == ' 高血压 ' for result in again
+               if result['search_method'] == 'disease_relations_index')
+    assert all(result['source_disease'] == '高血压' for result in cache.search_by_relation_fast('高血压', '症状')
+               if result['search_method'] == 'disease_relations_index')
+
+
+def test_cache_cleared_on_publish(cache):
+    assert [result['label'] for result in cache.search_by_relation_fast('糖尿病', '并发症')] == []
+    with open(cache.get_csv_file_path(), 'ab') as f:
+        f.write('糖尿病,并发症,糖尿病足\n'.encode('utf-8'))
+    cache.load_graph(cache.get_csv_file_path())
+    assert cache.get_generation().ingest_stats['appends'] == 1
+    assert [result['label'] for result in cache.search_by_relation_fast('糖尿病', '并发症')] == ['糖尿病足']
+
+
+def test_symptom_search_cache(cache, monkeypatch):
+    monkeypatch.setattr(medical_ai, 'graph_cache', cache)
+    assistant = medical_ai.MedicalKnowledgeGraphAI(probe_llm=False)
+    results = assistant._search_by_symptoms(['高血压', '头晕'], 5)
+    # 含疾病关键词的实体为诊断结果，其余为症状相关实体
+    assert [(result['label'], result['match_type']) for result in results] == [
+        ('高血压', 'symptom_diagnosis'), ('高血压病', 'symptom_diagnosis'), ('高血压危象', 'symptom_diagnosis'),
+        ('头晕', 'symptom_entity'),
+    ]
+    hits = _hits(cache)
+    assert assistant._search_by_symptoms(['高血压', '头晕'], 5) == results
+    assert _hits(cache) == hits + 1
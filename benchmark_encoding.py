@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+图谱接口响应编码基准
+对 /graph 分页数据比较各序列化方式（jsonify默认的json、紧凑json、orjson、MessagePack）
+和压缩方式（无 / gzip / brotli）的传输字节数与耗时
+
+用法:
+    python benchmark_encoding.py
+    python benchmark_encoding.py --csv /path/to/large.csv --page-sizes 500 2000 10000 --runs 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'knowledge_graph_backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from src.routes.knowledge_graph import DEFAULT_CSV_PATH, get_paginated_graph  # noqa: E402
+from src.utils.graph_cache import graph_cache  # noqa: E402
+from src.utils import response_encoding  # noqa: E402
+
+
+def best_time(func: Callable[[], Any], runs: int) -> float:
+    """多次执行取最短耗时（毫秒）"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def serializers() -> Dict[str, Callable[[Any], bytes]]:
+    result = {
+        # Flask jsonify 的默认行为：ensure_ascii + sort_keys
+        'jsonify': lambda payload: json.dumps(payload, ensure_ascii=True, sort_keys=True).encode('utf-8'),
+        'json': response_encoding.dumps_json_stdlib,
+    }
+    if response_encoding.orjson is not None:
+        result['orjson'] = response_encoding.dumps_json
+    if response_encoding.msgpack is not None:
+        result['msgpack'] = response_encoding.dumps_msgpack
+    return result
+
+
+def benchmark(payload: Any, runs: int) -> List[Dict[str, Any]]:
+    rows = []
+    for name, serialize in serializers().items():
+        body = serialize(payload)
+        encode_ms = best_time(lambda: serialize(payload), runs)
+        rows.append({'encoding': name, 'compression': '-', 'bytes': len(body),
+                     'serialize_ms': encode_ms, 'compress_ms': 0.0})
+        for compression, compress in response_encoding.COMPRESSORS.items():
+            compressed = compress(body)
+            rows.append({'encoding': name, 'compression': compression, 'bytes': len(compressed),
+                         'serialize_ms': encode_ms, 'compress_ms': best_time(lambda: compress(body), runs)})
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='比较图谱接口响应的编码与压缩方式')
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH, help='知识图谱CSV文件')
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[50, 500, 2000], help='测试的每页节点数')
+    parser.add_argument('--runs', type=int, default=5, help='每项重复次数（取最短耗时）')
+    args = parser.parse_args()
+
+    full_graph = graph_cache.load_graph(args.csv)
+    missing = [name for name in ('orjson', 'msgpack', 'brotli') if getattr(response_encoding, name) is None]
+    if missing:
+        print(f"[提示] 未安装: {', '.join(missing)}，相应编码不参与比较")
+
+    for page_size in args.page_sizes:
+        payload = get_paginated_graph(full_graph, 1, page_size)
+        print(f"\n=== page_size={page_size}: {len(payload['nodes'])} 节点, {len(payload['edges'])} 边 ===")
+        print(f"{'编码':<10}{'压缩':<8}{'字节数':>12}{'序列化(ms)':>14}{'压缩(ms)':>12}{'合计(ms)':>12}")
+        for row in benchmark(payload, args.runs):
+            total = row['serialize_ms'] + row['compress_ms']
+            print(f"{row['encoding']:<10}{row['compression']:<8}{row['bytes']:>12}"
+                  f"{row['serialize_ms']:>14.2f}{row['compress_ms']:>12.2f}{total:>12.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+输入联想索引基准
+在合成标签（默认100万个）或指定CSV的图谱上测量 SuggestIndex 的构建耗时和
+每次按键（逐字输入的每个前缀）的查询延迟，并与逐个标签 startswith 的线性扫描抽样核对结果
+
+用法:
+    python benchmark_suggest.py
+    python benchmark_suggest.py --labels 1000000 --queries 20000
+    python benchmark_suggest.py --csv /path/to/large.csv
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'knowledge_graph_backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from src.config.graph_config import GraphConfig  # noqa: E402
+from src.utils.suggest_index import SuggestIndex  # noqa: E402
+
+
+def synthetic_labels(count: int, seed: int) -> List[str]:
+    """常用字集中的短标签（前缀大量重叠）与全字集中的标签各占一半"""
+    rng = random.Random(seed)
+    alphabet = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+    common = alphabet[:80]
+    return [''.join(rng.choice(common if rng.random() < 0.5 else alphabet) for _ in range(rng.randint(2, 8)))
+            for _ in range(count)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='测量输入联想索引的构建与查询耗时')
+    parser.add_argument('--csv', help='使用该CSV的图谱（默认使用合成标签）')
+    parser.add_argument('--labels', type=int, default=1_000_000, help='合成标签数')
+    parser.add_argument('--queries', type=int, default=10000, help='抽样的标签数（每个标签逐字输入）')
+    parser.add_argument('--limit', type=int, default=10, help='每次返回的联想数')
+    parser.add_argument('--verify', type=int, default=50, help='与线性扫描核对的查询数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.csv:
+        from src.utils.graph_cache import graph_cache
+        graph_cache.load_graph(args.csv)
+        graph = graph_cache.get_generation().store
+        labels, rank_positions = list(graph.node_ids), graph.rank_positions
+    else:
+        labels = synthetic_labels(args.labels, args.seed)
+        order = sorted(range(len(labels)), key=lambda _: rng.random())
+        rank_positions = [0] * len(labels)
+        for position, node in enumerate(order):
+            rank_positions[node] = position
+
+    start = time.perf_counter()
+    index = SuggestIndex.build(labels, rank_positions, GraphConfig.SUGGEST_TOP_K, GraphConfig.SUGGEST_SCAN_MAX)
+    print(f"标签数: {len(index)}, 重前缀: {index.heavy_prefix_count}, "
+          f"构建: {time.perf_counter() - start:.2f}s")
+
+    # 模拟逐字输入：每个抽样标签的每个前缀各查询一次
+    prefixes = [label[:end] for label in rng.sample(labels, min(args.queries, len(labels)))
+                for end in range(1, len(label) + 1)]
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.complete(prefix, args.limit)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"查询数: {len(timings)}, 平均 {sum(timings) / len(timings) * 1000:.4f}ms, "
+          f"p50 {timings[len(timings) // 2] * 1000:.4f}ms, p99 {timings[int(len(timings) * 0.99)] * 1000:.4f}ms, "
+          f"最大 {timings[-1] * 1000:.4f}ms")
+
+    lowered = [label.lower() for label in labels]
+    for prefix in rng.sample(prefixes, min(args.verify, len(prefixes))):
+        expected = sorted((node for node, label in enumerate(lowered) if label.startswith(prefix.lower())),
+                          key=rank_positions.__getitem__)[:args.limit]
+        if index.complete(prefix, args.limit) != expected:
+            print(f"[错误] 前缀 {prefix!r} 的结果与线性扫描不一致")
+            return 1
+    print(f"抽样核对 {min(args.verify, len(prefixes))} 个前缀: 与线性扫描一致")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,6 +22,8 @@ import {
 
 // API基础URL
 const API_BASE_URL = 'http://localhost:5000/api';
+// 实体搜索：停止输入多久后请求
+const SUGGEST_DEBOUNCE_MS = 120;
 
 const AIAssistant = ({ onEntityFocus, onEntitySearch }) => {
   const [question, setQuestion] = useState('');
@@ -34,6 +36,7 @@ const AIAssistant = ({ onEntityFocus, onEntitySearch }) => {
   const [aiStatus, setAiStatus] = useState('unknown');
   const [searchResults, setSearchResults] = useState([]);
   const [showSearch, setShowSearch] = useState(false);
+  const [entityQuery, setEntityQuery] = useState('');
   
   const chatContainerRef = useRef(null);
 
@@ -192,23 +195,47 @@ const AIAssistant = ({ onEntityFocus, onEntitySearch }) => {
     }
   };
 
-  const searchEntities = async (query) => {
-    if (!query.trim()) {
+  // 实体搜索：先按前缀联想（每次按键都很快），没有前缀匹配时再用完整搜索
+  const searchEntities = async (query, signal) => {
+    const suggestResponse = await fetch(
+      `${API_BASE_URL}/suggest?q=${encodeURIComponent(query)}&limit=5`, { signal }
+    );
+    const suggestData = await suggestResponse.json();
+    const suggestions = suggestData.suggestions || [];
+    if (suggestions.length > 0) {
+      const lowered = query.toLowerCase();
+      return suggestions.map(entity => ({
+        ...entity,
+        match_type: entity.label.toLowerCase() === lowered ? 'exact' : 'prefix'
+      }));
+    }
+
+    const response = await fetch(`${API_BASE_URL}/ai/search?q=${encodeURIComponent(query)}&limit=5`, { signal });
+    const data = await response.json();
+    return data.success ? (data.data.results || []) : [];
+  };
+
+  useEffect(() => {
+    const query = entityQuery.trim();
+    if (!query) {
       setSearchResults([]);
       return;
     }
-
-    try {
-      const response = await fetch(`${API_BASE_URL}/ai/search?q=${encodeURIComponent(query)}&limit=5`);
-      const data = await response.json();
-      
-      if (data.success) {
-        setSearchResults(data.data.results || []);
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        setSearchResults(await searchEntities(query, controller.signal));
+      } catch (error) {
+        if (error.name !== 'AbortError') {
+          console.error('搜索实体失败:', error);
+        }
       }
-    } catch (error) {
-      console.error('搜索实体失败:', error);
-    }
-  };
+    }, SUGGEST_DEBOUNCE_MS);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [entityQuery]);
 
   const handleEntityClick = (entity) => {
     if (onEntityFocus && entity.id) {
@@ -216,6 +243,14 @@ const AIAssistant = ({ onEntityFocus, onEntitySearch }) => {
     }
   };
 
+  // 聚焦回答涉及的全部实体（建议聚焦的实体排在第一个），由图谱一次批量获取合并后的邻域
+  const handleFocusRelated = (message) => {
+    const entityIds = (message.relatedEntities || []).map(entity => entity.id).filter(Boolean);
+    if (onEntityFocus) {
+      onEntityFocus(entityIds.length > 0 ? entityIds : [message.suggestedFocus]);
+    }
+  };
+
   const handleEntitySearch = (entity) => {
     if (onEntitySearch && entity.label) {
       onEntitySearch(entity.label);
@@ -287,20 +322,21 @@ const AIAssistant = ({ onEntityFocus, onEntitySearch }) => {
           <div className="space-y-2">
             <Input
               placeholder="搜索医疗实体..."
-              onChange={(e) => searchEntities(e.target.value)}
+              value={entityQuery}
+              onChange={(e) => setEntityQuery(e.target.value)}
             />
             {searchResults.length > 0 && (
               <div className="max-h-32 overflow-y-auto space-y-1">
                 {searchResults.map((entity, index) => (
                   <div 
-                    key={index}
+                    key={entity.id || index}
                     className="flex items-center justify-between p-2 bg-white border rounded hover:bg-gray-50"
                   >
                     <div className="flex-1">
                       <div className="font-medium">{entity.label}</div>
                       <div className="text-xs text-gray-500 flex items-center space-x-2">
                         <Badge variant="outline" className="text-xs">
-                          {entity.match_type === 'exact' ? '精确' : '模糊'}
+                          {entity.match_type === 'exact' ? '精确' : entity.match_type === 'prefix' ? '前缀' : '模糊'}
                         </Badge>
                         <span>连接数: {entity.connections || 0}</span>
                       </div>
@@ -401,7 +437,7 @@ const AIAssistant = ({ onEntityFocus, onEntitySearch }) => {
                           size="sm"
                           variant="outline"
                           className="mt-2 h-6 text-xs"
-                          onClick={() => handleEntityClick({ id: message.suggestedFocus })}
+                          onClick={() => handleFocusRelated(message)}
                         >
                           <Target className="h-3 w-3 mr-1" />
                           聚焦相关节点
@@ -9,6 +9,11 @@ import AIAssistant from './AIAssistant';
 
 // API基础URL
 const API_BASE_URL = 'http://localhost:5000/api';
+// 服务端布局坐标到画布坐标的缩放比例
+const LAYOUT_SCALE = 30;
+// 输入联想：停止输入多久后请求、显示的条数
+const SUGGEST_DEBOUNCE_MS = 120;
+const SUGGEST_LIMIT = 8;
 
 const KnowledgeGraph = () => {
   const [graphData, setGraphData] = useState({ nodes: [], links: [] });
@@ -18,6 +23,8 @@ const KnowledgeGraph = () => {
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState([]); // 搜索结果
   const [showSearchResults, setShowSearchResults] = useState(false); // 是否显示搜索结果列表
+  const [suggestions, setSuggestions] = useState([]); // 输入联想
+  const [activeSuggestion, setActiveSuggestion] = useState(-1); // 键盘选中的联想项
   const [selectedNode, setSelectedNode] = useState(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [pageSize, setPageSize] = useState(50);
@@ -33,9 +40,11 @@ const KnowledgeGraph = () => {
   const [showStatsPanel, setShowStatsPanel] = useState(true); // 是否显示统计面板
   const [isDragging, setIsDragging] = useState(null); // 拖拽状态
   const [graphDimensions, setGraphDimensions] = useState({ width: 800, height: 600 }); // 图谱画布尺寸
+  const [clusterView, setClusterView] = useState(null); // 聚类视图：{ cluster, parent }，null 表示分页视图
   
   const graphRef = useRef();
   const containerRef = useRef();
+  const skipSuggestRef = useRef(false); // 选中联想项后不再为该输入请求联想
 
   // 获取图谱基本信息
   const fetchGraphInfo = async () => {
@@ -59,7 +68,8 @@ const KnowledgeGraph = () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/graph?page=${page}&page_size=${size}`);
+      // layout=1：服务端已计算好布局时直接使用坐标，浏览器无需再跑力导向模拟
+      const response = await fetch(`${API_BASE_URL}/graph?page=${page}&page_size=${size}&layout=1`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -69,9 +79,11 @@ const KnowledgeGraph = () => {
       }
       
         // 转换数据格式以适配ForceGraph2D
+        const presetLayout = data.layout === 'ready';
         const formattedData = {
           nodes: data.nodes.map(node => ({
           ...node,
+            ...(presetLayout ? { x: node.x * LAYOUT_SCALE, y: node.y * LAYOUT_SCALE } : {}),
             name: node.label,
           color: getNodeColor(node.label, node.connections, false, false, node.is_search_result)
           })),
@@ -80,7 +92,8 @@ const KnowledgeGraph = () => {
             target: edge.target,
             label: edge.relation,
             color: '#999'
-          }))
+          })),
+          presetLayout
         };
       
         setGraphData(formattedData);
@@ -91,6 +104,14 @@ const KnowledgeGraph = () => {
       setFocusMode(false); // 重置焦点模式
       setFocusNode(null);
       setShowSearchResults(false); // 关闭搜索结果列表
+      setClusterView(null); // 退出聚类视图
+      if (presetLayout) {
+        setTimeout(() => {
+          if (graphRef.current) {
+            graphRef.current.zoomToFit(400);
+          }
+        }, 100);
+      }
     } catch (error) {
       console.error('获取图谱数据失败:', error);
       setError(error.message);
@@ -99,6 +120,62 @@ const KnowledgeGraph = () => {
     }
   };
 
+  // 获取聚类视图：不指定clusterId时为概览（最上层超节点），否则下钻到该簇
+  const fetchClusterView = async (clusterId = null) => {
+    setLoading(true);
+    setError(null);
+    try {
+      const url = clusterId
+        ? `${API_BASE_URL}/graph/clusters/${encodeURIComponent(clusterId)}`
+        : `${API_BASE_URL}/graph/clusters`;
+      const response = await fetch(url);
+      if (response.status === 202) {
+        throw new Error('聚类计算中，请稍后重试');
+      }
+      const data = await response.json();
+      if (!response.ok || data.error) {
+        throw new Error(data.error || `HTTP error! status: ${response.status}`);
+      }
+
+      // 超节点显示代表实体和簇大小；下钻到最细一层时返回的是实体
+      const formattedData = {
+        nodes: data.nodes.map(node => node.type === 'cluster' ? ({
+          ...node,
+          name: `${node.label} 等 ${node.size} 个实体`,
+          color: `rgba(116, 125, 255, ${0.4 + Math.min(node.size / 500, 1) * 0.6})`
+        }) : ({
+          ...node,
+          name: node.label,
+          color: getNodeColor(node.label, node.connections)
+        })),
+        links: data.edges.map(edge => ({
+          source: edge.source,
+          target: edge.target,
+          label: edge.relation || `${edge.weight} 条关系`,
+          color: '#999'
+        }))
+      };
+
+      setGraphData(formattedData);
+      setOriginalGraphData(formattedData);
+      setClusterView({ cluster: data.cluster || null, parent: data.parent || null });
+      setExpandedNodes(new Set());
+      setFocusMode(false);
+      setFocusNode(null);
+      setShowSearchResults(false);
+      setTimeout(() => {
+        if (graphRef.current) {
+          graphRef.current.zoomToFit(1000);
+        }
+      }, 100);
+    } catch (error) {
+      console.error('获取聚类视图失败:', error);
+      setError(error.message);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   // 根据节点连接数获取颜色
   const getNodeColor = (label, connections, isFocus = false, isNeighbor = false, isSearchResult = false) => {
     // 搜索结果特殊颜色
@@ -135,19 +212,35 @@ const KnowledgeGraph = () => {
     return `rgba(168, 230, 207, ${0.5 + intensity * 0.5})`;
   };
 
-  // 进入焦点模式
-  const enterFocusMode = async (nodeId) => {
+  // 批量获取多个节点合并去重后的邻域（一次请求代替逐个请求 /node/neighbors）
+  const fetchNeighborhood = async (nodeIds) => {
+    const response = await fetch(`${API_BASE_URL}/node/neighbors/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ids: nodeIds })
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    if (data.error) {
+      throw new Error(data.error);
+    }
+    if (data.center_nodes.length === 0) {
+      throw new Error('未找到指定的节点');
+    }
+    return data;
+  };
+
+  // 进入焦点模式（支持单个节点ID或节点ID数组，如AI回答涉及的多个实体）
+  const enterFocusMode = async (nodeIdOrIds) => {
+    const focusIds = Array.isArray(nodeIdOrIds) ? nodeIdOrIds : [nodeIdOrIds];
+    const nodeId = focusIds[0];
+    const focusIdSet = new Set(focusIds);
     setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/node/neighbors?id=${encodeURIComponent(nodeId)}`);
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data = await response.json();
-      if (data.error) {
-        throw new Error(data.error);
-      }
+      const data = await fetchNeighborhood(focusIds);
 
       // 转换数据格式
       const neighborNodeIds = new Set(data.nodes.map(n => n.id));
@@ -158,7 +251,7 @@ const KnowledgeGraph = () => {
           color: getNodeColor(
             node.label, 
             node.connections, 
-            node.id === nodeId, // 是否为焦点节点
+            focusIdSet.has(node.id), // 是否为焦点节点
             true // 都是邻居节点
           )
         })),
@@ -307,9 +400,68 @@ const KnowledgeGraph = () => {
     }
   };
 
+  // 输入联想：停止输入一小段时间后按前缀请求，新的输入会取消上一次请求
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (skipSuggestRef.current || !query) {
+      skipSuggestRef.current = false;
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `${API_BASE_URL}/suggest?q=${encodeURIComponent(query)}&limit=${SUGGEST_LIMIT}&page_size=${pageSize}`,
+          { signal: controller.signal }
+        );
+        if (!response.ok) return;
+        const data = await response.json();
+        setSuggestions(data.suggestions || []);
+        setActiveSuggestion(-1);
+        setShowSearchResults(false);
+      } catch (error) {
+        if (error.name !== 'AbortError') {
+          console.error('联想请求错误:', error);
+        }
+      }
+    }, SUGGEST_DEBOUNCE_MS);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [searchQuery, pageSize]);
+
+  // 选中联想项：填入搜索框并直接搜索
+  const selectSuggestion = (suggestion) => {
+    skipSuggestRef.current = true;
+    setSearchQuery(suggestion.label);
+    setSuggestions([]);
+    handleSearch(suggestion.label);
+  };
+
+  const handleSearchKeyDown = (e) => {
+    if (e.key === 'ArrowDown' && suggestions.length > 0) {
+      e.preventDefault();
+      setActiveSuggestion((activeSuggestion + 1) % suggestions.length);
+    } else if (e.key === 'ArrowUp' && suggestions.length > 0) {
+      e.preventDefault();
+      setActiveSuggestion(activeSuggestion <= 0 ? suggestions.length - 1 : activeSuggestion - 1);
+    } else if (e.key === 'Escape') {
+      setSuggestions([]);
+    } else if (e.key === 'Enter') {
+      if (activeSuggestion >= 0 && activeSuggestion < suggestions.length) {
+        selectSuggestion(suggestions[activeSuggestion]);
+      } else {
+        setSuggestions([]);
+        handleSearch();
+      }
+    }
+  };
+
   // 搜索实体
-  const handleSearch = async () => {
-    if (!searchQuery.trim()) {
+  const handleSearch = async (query = searchQuery) => {
+    if (!query.trim()) {
       setSearchResults([]);
       setShowSearchResults(false);
       return;
@@ -317,7 +469,7 @@ const KnowledgeGraph = () => {
 
     setError(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/search?q=${encodeURIComponent(searchQuery)}&page_size=${pageSize}`);
+      const response = await fetch(`${API_BASE_URL}/search?q=${encodeURIComponent(query)}&page_size=${pageSize}`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
@@ -408,14 +560,7 @@ const KnowledgeGraph = () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/node/neighbors?id=${encodeURIComponent(entityId)}`);
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data = await response.json();
-      if (data.error) {
-        throw new Error(data.error);
-      }
+      const data = await fetchNeighborhood([entityId]);
 
       // 转换焦点模式数据格式
       const formattedData = {
@@ -464,6 +609,12 @@ const KnowledgeGraph = () => {
   const handleNodeClick = (node) => {
     setSelectedNode(node);
     
+    // 聚类视图中点击超节点：下钻到该簇
+    if (node.type === 'cluster') {
+      fetchClusterView(node.id);
+      return;
+    }
+    
     if (focusMode) {
       // 在焦点模式下，双击可以切换焦点
       if (node.id === focusNode) {
@@ -523,19 +674,21 @@ const KnowledgeGraph = () => {
     fetchGraphData();
   }, []);
 
-  // AI助手回调函数
-  const handleEntityFocus = (entityId) => {
-    const node = graphData.nodes.find(n => n.id === entityId);
+  // AI助手回调函数（单个实体ID，或回答涉及的多个实体ID）
+  const handleEntityFocus = (entityIdOrIds) => {
+    const entityIds = Array.isArray(entityIdOrIds) ? entityIdOrIds : [entityIdOrIds];
+    const node = graphData.nodes.find(n => entityIds.includes(n.id));
     if (node && graphRef.current) {
-      setFocusNode(entityId);
+      setFocusNode(entityIds[0]);
       setFocusMode(true);
-      enterFocusMode(entityId);
+      enterFocusMode(entityIds);
     }
   };
 
   const handleEntitySearch = (entityLabel) => {
+    skipSuggestRef.current = true;
     setSearchQuery(entityLabel);
-    handleSearch();
+    handleSearch(entityLabel);
   };
 
   // 拖拽处理函数
@@ -748,12 +901,32 @@ const KnowledgeGraph = () => {
                   placeholder="搜索实体..."
                   value={searchQuery}
                   onChange={(e) => setSearchQuery(e.target.value)}
-                  onKeyPress={(e) => e.key === 'Enter' && handleSearch()}
+                  onKeyDown={handleSearchKeyDown}
+                  onBlur={() => setTimeout(() => setSuggestions([]), 150)}
                   className="w-full"
                 />
-                <Button onClick={handleSearch} size="sm">
+                <Button onClick={() => handleSearch()} size="sm">
                   <Search className="w-4 h-4" />
                 </Button>
+
+              {/* 输入联想下拉列表 */}
+              {suggestions.length > 0 && (
+                <div className="absolute top-full left-0 mt-1 bg-white border border-gray-200 rounded-md shadow-lg z-50 max-h-80 overflow-y-auto min-w-full w-auto max-w-md">
+                  {suggestions.map((suggestion, index) => (
+                    <div
+                      key={suggestion.id}
+                      className={`px-3 py-2 cursor-pointer text-sm flex items-center justify-between ${index === activeSuggestion ? 'bg-blue-50' : 'hover:bg-gray-50'}`}
+                      onMouseDown={(e) => {
+                        e.preventDefault();
+                        selectSuggestion(suggestion);
+                      }}
+                    >
+                      <span className="font-medium text-gray-900 break-words">{suggestion.label}</span>
+                      <span className="text-xs text-gray-500 ml-3 whitespace-nowrap">连接数: {suggestion.connections}</span>
+                    </div>
+                  ))}
+                </div>
+              )}
               
               {/* 搜索结果下拉列表 */}
               {showSearchResults && searchResults.length > 0 && (
@@ -875,6 +1048,39 @@ const KnowledgeGraph = () => {
                 </div>
               )}
 
+              {/* 聚类概览 */}
+              {!focusMode && (
+                <div className="mb-4">
+                  <label className="text-sm text-gray-600 block mb-2">聚类概览</label>
+                  {clusterView ? (
+                    <div className="space-y-2">
+                      {clusterView.cluster && (
+                        <div className="text-xs text-gray-600">
+                          当前簇: {clusterView.cluster.label}（{clusterView.cluster.size} 个实体）
+                        </div>
+                      )}
+                      <div className="grid grid-cols-2 gap-2">
+                        <Button
+                          onClick={() => fetchClusterView(clusterView.parent)}
+                          size="sm"
+                          variant="outline"
+                          disabled={!clusterView.cluster}
+                        >
+                          返回上一层
+                        </Button>
+                        <Button onClick={() => fetchGraphData(currentPage, pageSize)} size="sm" variant="outline">
+                          分页视图
+                        </Button>
+                      </div>
+                    </div>
+                  ) : (
+                    <Button onClick={() => fetchClusterView()} size="sm" variant="outline" className="w-full">
+                      显示聚类概览
+                    </Button>
+                  )}
+                </div>
+              )}
+
               {/* 缩放控制 */}
               <div className="mb-4">
                 <label className="text-sm text-gray-600 block mb-2">视图控制</label>
@@ -953,6 +1159,7 @@ const KnowledgeGraph = () => {
           <ForceGraph2D
             ref={graphRef}
             graphData={graphData}
+            cooldownTicks={graphData.presetLayout ? 0 : Infinity}
             nodeLabel="name"
             nodeColor="color"
             nodeRelSize={8}
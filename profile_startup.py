@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+后端启动导入耗时分析脚本
+使用 python -X importtime 导入 src.main，统计各模块的导入耗时，
+可保存为基线并在之后与基线比较，用于发现启动性能回退
+
+用法:
+    python profile_startup.py                         # 打印耗时最多的模块
+    python profile_startup.py --save startup_profile.json
+    python profile_startup.py --baseline startup_profile.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'knowledge_graph_backend')
+
+
+def run_importtime(module: str = 'src.main') -> List[Dict[str, Any]]:
+    """在子进程中导入模块并解析 -X importtime 的输出"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise RuntimeError(f'导入 {module} 失败')
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = [part.strip() for part in line.split(':', 1)[1].split('|')]
+            records.append({
+                'module': name,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    return records
+
+
+def summarize(records: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    """汇总总耗时、项目模块耗时和耗时最多的模块"""
+    total_ms = sum(record['self_ms'] for record in records)
+    project = {r['module']: r['cumulative_ms'] for r in records if r['module'].startswith('src')}
+    slowest = sorted(records, key=lambda r: r['cumulative_ms'], reverse=True)[:top]
+    return {
+        'total_ms': round(total_ms, 1),
+        'project_modules': {name: round(ms, 1) for name, ms in project.items()},
+        'slowest': [{'module': r['module'], 'cumulative_ms': round(r['cumulative_ms'], 1),
+                     'self_ms': round(r['self_ms'], 1)} for r in slowest],
+    }
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """与基线比较，返回超过阈值的回退项"""
+    regressions = []
+    if summary['total_ms'] > baseline['total_ms'] * (1 + threshold):
+        regressions.append(f"总导入耗时 {baseline['total_ms']}ms -> {summary['total_ms']}ms")
+    for module, ms in summary['project_modules'].items():
+        base_ms = baseline.get('project_modules', {}).get(module)
+        # 忽略绝对值很小的模块，避免计时抖动造成误报
+        if base_ms is not None and ms > 5 and ms > base_ms * (1 + threshold):
+            regressions.append(f"{module}: {base_ms}ms -> {ms}ms")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='分析后端启动导入耗时')
+    parser.add_argument('--top', type=int, default=20, help='显示耗时最多的模块数')
+    parser.add_argument('--runs', type=int, default=3, help='重复次数（取总耗时最小的一次）')
+    parser.add_argument('--save', help='将结果保存为基线JSON')
+    parser.add_argument('--baseline', help='与基线JSON比较')
+    parser.add_argument('--threshold', type=float, default=0.2, help='回退阈值（比例）')
+    args = parser.parse_args()
+
+    summaries = [summarize(run_importtime(), args.top) for _ in range(max(1, args.runs))]
+    summary = min(summaries, key=lambda s: s['total_ms'])
+
+    print(f"=== 启动导入耗时: {summary['total_ms']}ms ===")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for record in summary['slowest']:
+        print(f"{record['cumulative_ms']:>10} {record['self_ms']:>10}  {record['module']}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 基线已保存: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(summary, baseline, args.threshold)
+        if regressions:
+            print("\n❌ 检测到启动性能回退:")
+            for item in regressions:
+                print(f"  - {item}")
+            return 1
+        print("\n✅ 未检测到启动性能回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())